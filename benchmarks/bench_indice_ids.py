@@ -0,0 +1,101 @@
+"""
+Benchmark del chequeo de integridad referencial siniestro -> póliza:
+set de str de Python + isin de Arrow (implementación anterior) vs `IndiceIds`
+(UUID empaquetados en 128 bits). Genera n pólizas y n/5 siniestros con el
+generador (err_rate de 5%, incluye IDs `invalid-…`) y mide en un proceso aparte:
+- construcción del índice desde la columna poliza_id ya cargada
+- búsqueda de los poliza_id de los siniestros
+- memoria adicional pico
+
+Uso:
+python benchmarks/bench_indice_ids.py --n 1000000 10000000
+"""
+import multiprocessing as mp
+import os
+import queue
+import sys
+import tempfile
+import time
+from datetime import date
+
+# allow running directly
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from scripts import esquema, generar_datos, utils_auditoria
+from scripts.indice_ids import IndiceIds
+from scripts.instrumentacion import pico_rss_mb, rss_actual_mb
+
+
+def _set_python(pol_ids, sin_ids):
+    conjunto = set(pol_ids.astype(str).tolist())
+    construido = time.perf_counter()
+    return construido, esquema.pertenece(sin_ids, conjunto)
+
+
+def _indice(pol_ids, sin_ids):
+    indice = IndiceIds.desde(pol_ids)
+    indice.contiene(sin_ids[:1])  # consolida antes de medir la búsqueda
+    construido = time.perf_counter()
+    return construido, indice.contiene(sin_ids)
+
+
+IMPLEMENTACIONES = {"set_python": _set_python, "indice_ids": _indice}
+
+
+def _medir(nombre, pol_path, sin_path, cola):
+    pol_ids = esquema.leer_csv(pol_path, esquema.POLIZAS)["poliza_id"]
+    sin_ids = esquema.leer_csv(sin_path, esquema.SINIESTROS)["poliza_id"]
+    base = rss_actual_mb() or pico_rss_mb()
+    inicio = time.perf_counter()
+    construido, encontrados = IMPLEMENTACIONES[nombre](pol_ids, sin_ids)
+    fin = time.perf_counter()
+    cola.put((construido - inicio, fin - construido, pico_rss_mb() - base, int(encontrados.sum())))
+
+
+def medir(nombre, pol_path, sin_path):
+    """(construcción s, búsqueda s, MB adicionales pico, encontrados) o None si el proceso muere"""
+    ctx = mp.get_context("spawn")
+    cola = ctx.Queue()
+    proc = ctx.Process(target=_medir, args=(nombre, pol_path, sin_path, cola))
+    proc.start()
+    while True:
+        try:
+            resultado = cola.get(timeout=1)
+            break
+        except queue.Empty:
+            if not proc.is_alive():
+                resultado = None
+                break
+    proc.join()
+    return resultado
+
+
+def ejecutar(tamanios, seed=42):
+    filas = []
+    with tempfile.TemporaryDirectory() as tmp:
+        utils_auditoria.AUDITORIA_FILE = os.path.join(tmp, "auditoria.csv")
+        for n in tamanios:
+            pol_path, sin_path = generar_datos.generar_csvs(tmp, date=date(2025, 1, 1), seed=seed,
+                                                            n_polizas=n, n_siniestros=n // 5)
+            encontrados = set()
+            for nombre in IMPLEMENTACIONES:
+                r = medir(nombre, pol_path, sin_path)
+                filas.append((n, nombre, r))
+                if r is None:
+                    print(f"{n:>12,} {nombre:<11} falló (¿memoria insuficiente?)", flush=True)
+                    continue
+                encontrados.add(r[3])
+                print(f"{n:>12,} {nombre:<11} {r[0]:8.2f}s {r[1]:8.3f}s {r[2]:10.1f} MB", flush=True)
+            if len(encontrados) > 1:
+                raise AssertionError(f"Las implementaciones difieren con n={n}")
+    return filas
+
+
+if __name__ == "__main__":
+    import argparse
+    p = argparse.ArgumentParser(description="Benchmark del índice de poliza_id (set vs IndiceIds)")
+    p.add_argument("--n", type=int, nargs="+", default=[1_000_000, 10_000_000], help="Pólizas por corrida")
+    p.add_argument("--seed", type=int, default=42)
+    args = p.parse_args()
+
+    print(f"{'pólizas':>12} {'impl':<11} {'construir':>9} {'buscar':>9} {'mem. pico':>13}")
+    ejecutar(args.n, args.seed)
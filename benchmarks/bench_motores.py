@@ -0,0 +1,120 @@
+"""
+Benchmark de cruce entre motores de `transformaciones` (pandas vs PySpark local).
+Para cada tamaño genera datos sintéticos (1 siniestro cada 5 pólizas) y mide, en un
+proceso aparte por motor, lectura + agregación + escritura del resumen
+(`transformaciones.main`, sin caché de parseo). El arranque de la SparkSession se
+mide aparte: en un worker de larga vida se paga una vez. Verifica que ambos motores
+generen el mismo CSV e informa desde qué tamaño gana cada uno.
+
+Uso (en una máquina multinúcleo):
+python benchmarks/bench_motores.py --n 100000 1000000 10000000
+"""
+import contextlib
+import multiprocessing as mp
+import os
+import queue
+import sys
+import tempfile
+import time
+from datetime import date
+
+# allow running directly
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from scripts import generar_datos, transformaciones
+
+FECHA = "20250101"
+
+
+def _medir(motor, pol_path, sin_path, out_dir, cola):
+    try:
+        from scripts import cache_parseo, utils_auditoria
+        cache_parseo.CACHE_ACTIVA = False
+        utils_auditoria.configurar_auditoria(os.path.join(out_dir, "auditoria.csv"))
+        arranque = 0.0
+        if motor == "spark":
+            from scripts import motor_spark
+            inicio = time.perf_counter()
+            motor_spark.sesion()
+            arranque = time.perf_counter() - inicio
+        inicio = time.perf_counter()
+        with open(os.devnull, "w") as nulo, contextlib.redirect_stdout(nulo):
+            resumen_file = transformaciones.main(pol_path, sin_path, out_dir, fecha_tag=FECHA, engine=motor)
+        cola.put({"segundos": time.perf_counter() - inicio, "arranque": arranque, "resumen_file": resumen_file})
+    except Exception as e:  # p. ej. pyspark/Java no disponibles
+        cola.put({"error": f"{type(e).__name__}: {e}"})
+
+
+def medir(motor, pol_path, sin_path, out_dir):
+    """{'segundos', 'arranque', 'resumen_file'} del motor en un proceso limpio, o {'error': ...}"""
+    ctx = mp.get_context("spawn")
+    cola = ctx.Queue()
+    proc = ctx.Process(target=_medir, args=(motor, pol_path, sin_path, out_dir, cola))
+    proc.start()
+    while True:
+        try:
+            resultado = cola.get(timeout=1)
+            break
+        except queue.Empty:
+            if not proc.is_alive():
+                resultado = {"error": f"el proceso terminó con código {proc.exitcode} (¿memoria insuficiente?)"}
+                break
+    proc.join()
+    return resultado
+
+
+def cruce(filas):
+    """Menor tamaño desde el que spark es más rápido que pandas en todos los tamaños medidos (None si nunca)"""
+    tiempos = {}
+    for n, motor, r in filas:
+        if "error" not in r:
+            tiempos.setdefault(n, {})[motor] = r["segundos"]
+    comparables = sorted(n for n, t in tiempos.items() if len(t) == 2)
+    desde = None
+    for n in comparables:
+        if tiempos[n]["spark"] < tiempos[n]["pandas"]:
+            desde = n if desde is None else desde
+        else:
+            desde = None
+    return desde
+
+
+def ejecutar(tamanios, seed=42, motores=transformaciones.MOTORES):
+    filas = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for n in tamanios:
+            pol_path, sin_path = generar_datos.generar_csvs(tmp, date=date(2025, 1, 1), seed=seed,
+                                                            n_polizas=n, n_siniestros=n // 5)
+            salidas = {}
+            for motor in motores:
+                out_dir = os.path.join(tmp, motor)
+                r = medir(motor, pol_path, sin_path, out_dir)
+                filas.append((n, motor, r))
+                if "error" in r:
+                    print(f"{n:>12,} {motor:<8} ERROR {r['error']}", flush=True)
+                    continue
+                with open(r["resumen_file"], "rb") as f:
+                    salidas[motor] = f.read()
+                print(f"{n:>12,} {motor:<8} {r['segundos']:8.2f}s (arranque {r['arranque']:.2f}s)", flush=True)
+            if len(set(salidas.values())) > 1:
+                raise AssertionError(f"Los motores generan resúmenes distintos con n={n}")
+    return filas
+
+
+if __name__ == "__main__":
+    import argparse
+    p = argparse.ArgumentParser(description="Benchmark de cruce pandas vs PySpark local")
+    p.add_argument("--n", type=int, nargs="+", default=[100_000, 1_000_000, 10_000_000], help="Pólizas por corrida")
+    p.add_argument("--seed", type=int, default=42)
+    p.add_argument("--motores", nargs="+", choices=transformaciones.MOTORES, default=list(transformaciones.MOTORES))
+    args = p.parse_args()
+
+    print(f"Núcleos: {os.cpu_count()}")
+    print(f"{'pólizas':>12} {'motor':<8} {'tiempo':>9}")
+    filas = ejecutar(args.n, args.seed, tuple(args.motores))
+    desde = cruce(filas)
+    if not any(m == "spark" and "error" not in r for _, m, r in filas):
+        print("Sin mediciones de spark: no hay cruce que informar")
+    elif desde is None:
+        print("pandas gana (o empata) en todos los tamaños medidos")
+    else:
+        print(f"spark gana desde {desde:,} pólizas")
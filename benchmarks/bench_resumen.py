@@ -0,0 +1,99 @@
+"""
+Benchmark de `resumen_por_producto`: agregación sin join vs. left merge de referencia.
+Genera datos sintéticos (generar_datos, 1 siniestro cada 5 pólizas), los lee tipados
+con el esquema y mide cada implementación en un proceso aparte:
+- tiempo de la agregación
+- memoria adicional pico (RSS pico del proceso menos RSS con los datos ya cargados)
+
+Uso:
+python benchmarks/bench_resumen.py --n 1000000 10000000
+"""
+import multiprocessing as mp
+import os
+import queue
+import sys
+import tempfile
+import time
+from datetime import date
+
+# allow running directly
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from scripts import esquema, generar_datos, utils_auditoria, transformaciones
+from scripts.instrumentacion import pico_rss_mb
+
+IMPLEMENTACIONES = {
+    "sin_join": transformaciones.resumen_por_producto,
+    "merge": transformaciones.resumen_por_producto_merge,
+}
+
+
+def _rss_actual_mb():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1024**2
+    except (OSError, ValueError, AttributeError):  # fuera de Linux: se usa el pico como base
+        return pico_rss_mb()
+
+
+def _medir(nombre, pol_path, sin_path, cola):
+    pol = esquema.leer_csv(pol_path, esquema.POLIZAS)
+    sin = esquema.leer_csv(sin_path, esquema.SINIESTROS)
+    base = _rss_actual_mb()
+    inicio = time.perf_counter()
+    resumen = IMPLEMENTACIONES[nombre](pol, sin)
+    segundos = time.perf_counter() - inicio
+    cola.put((segundos, pico_rss_mb() - base, resumen))
+
+
+def medir(nombre, pol_path, sin_path):
+    """
+    (segundos, MB adicionales pico, resumen) de una implementación en un proceso limpio;
+    (None, None, None) si el proceso muere (p. ej. OOM).
+    """
+    ctx = mp.get_context("spawn")
+    cola = ctx.Queue()
+    proc = ctx.Process(target=_medir, args=(nombre, pol_path, sin_path, cola))
+    proc.start()
+    while True:
+        try:
+            resultado = cola.get(timeout=1)
+            break
+        except queue.Empty:
+            if not proc.is_alive():
+                resultado = (None, None, None)
+                break
+    proc.join()
+    return resultado
+
+
+def ejecutar(tamanios, seed=42, implementaciones=tuple(IMPLEMENTACIONES)):
+    filas = []
+    with tempfile.TemporaryDirectory() as tmp:
+        utils_auditoria.AUDITORIA_FILE = os.path.join(tmp, "auditoria.csv")
+        for n in tamanios:
+            pol_path, sin_path = generar_datos.generar_csvs(tmp, date=date(2025, 1, 1), seed=seed,
+                                                            n_polizas=n, n_siniestros=n // 5)
+            resumenes = {}
+            for nombre in implementaciones:
+                segundos, mb, resumenes[nombre] = medir(nombre, pol_path, sin_path)
+                filas.append((n, nombre, segundos, mb))
+                if segundos is None:
+                    print(f"{n:>12,} {nombre:<10} {'falló (¿memoria insuficiente?)':>24}", flush=True)
+                else:
+                    print(f"{n:>12,} {nombre:<10} {segundos:8.2f}s {mb:10.1f} MB", flush=True)
+            primero, *resto = [r for r in resumenes.values() if r is not None] or [None]
+            if any(not primero.equals(r) for r in resto):
+                raise AssertionError(f"Las implementaciones difieren con n={n}")
+    return filas
+
+
+if __name__ == "__main__":
+    import argparse
+    p = argparse.ArgumentParser(description="Benchmark de resumen_por_producto (sin join vs merge)")
+    p.add_argument("--n", type=int, nargs="+", default=[1_000_000, 10_000_000], help="Pólizas por corrida")
+    p.add_argument("--seed", type=int, default=42)
+    p.add_argument("--solo", choices=sorted(IMPLEMENTACIONES), default=None, help="Mide una sola implementación")
+    args = p.parse_args()
+
+    print(f"{'pólizas':>12} {'impl':<10} {'tiempo':>9} {'mem. pico':>13}")
+    ejecutar(args.n, args.seed, (args.solo,) if args.solo else tuple(IMPLEMENTACIONES))
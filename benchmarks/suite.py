@@ -0,0 +1,235 @@
+"""
+Suite de benchmarks del pipeline con control de regresiones (offline, sin Airflow).
+
+Por cada tamaño genera un dataset con semilla fija (1 siniestro cada 5 pólizas) y mide,
+cada etapa en un proceso limpio:
+- generar_csvs
+- validar_archivos (sin caché de parseo: mide el parseo real)
+- resumen_por_producto (datos ya cargados)
+- dag: los callables del DAG de punta a punta con un `ti` simulado
+  (tareas_dag.ejecutar_local), más el tiempo de cada tarea como dag:<task_id>
+
+Guarda tiempo, filas/s y memoria adicional pico en el archivo de resultados y, si hay
+baseline, falla (exit 1) cuando una etapa empeora más que la tolerancia.
+
+Uso:
+python benchmarks/suite.py --tamanios 10000 1000000 10000000
+python benchmarks/suite.py --tamanios 10000 1000000 --guardar-baseline
+"""
+import contextlib
+import json
+import multiprocessing as mp
+import os
+import platform
+import queue
+import sys
+import tempfile
+import time
+from datetime import date, datetime
+
+# allow running directly
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from scripts.instrumentacion import pico_rss_mb, rss_actual_mb
+
+DIR = os.path.dirname(os.path.abspath(__file__))
+BASELINE_FILE = os.path.join(DIR, "baseline.json")
+RESULTADOS_FILE = os.path.join(DIR, "resultados.json")
+TAMANIOS = (10_000, 1_000_000, 10_000_000)
+SINIESTROS_POR_POLIZA = 0.2
+ETAPAS = ("generar_csvs", "validar_archivos", "resumen_por_producto", "dag")
+SEMILLA = 42
+# tolerancias relativas (0.25 = 25% peor que la baseline)
+TOLERANCIA = 0.25
+TOLERANCIA_MEMORIA = 0.25
+# diferencias absolutas por debajo de esto son ruido (etapas de milisegundos / pocos MB)
+MIN_SEGUNDOS = 0.05
+MIN_MB = 16
+
+
+def _reiniciar_pico():
+    """En Linux reinicia el pico de RSS del proceso (VmHWM); en otras plataformas no hace nada"""
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        pass
+
+
+def _pico_mb():
+    try:
+        with open("/proc/self/status") as f:
+            for linea in f:
+                if linea.startswith("VmHWM:"):
+                    return int(linea.split()[1]) / 1024
+    except (OSError, ValueError):
+        pass
+    return pico_rss_mb()
+
+
+def _rutas(data_dir):
+    fecha = date.today().strftime("%Y%m%d")  # preparar_archivos del DAG busca los archivos del día
+    return os.path.join(data_dir, f"polizas_{fecha}.csv"), os.path.join(data_dir, f"siniestros_{fecha}.csv")
+
+
+def _correr_etapa(etapa, data_dir, n):
+    """Ejecuta la etapa en este proceso; devuelve (segundos, MB adicionales pico, detalle)"""
+    from scripts import cache_parseo, esquema, generar_datos, tareas_dag, transformaciones, validacion
+    pol, sin = _rutas(data_dir)
+    if etapa == "resumen_por_producto":
+        # entradas cargadas fuera de la medición
+        pol_df = esquema.leer_csv(pol, esquema.POLIZAS)
+        sin_df = esquema.leer_csv(sin, esquema.SINIESTROS)
+    _reiniciar_pico()
+    base = rss_actual_mb() or _pico_mb()
+    inicio = time.perf_counter()
+    detalle = {}
+    if etapa == "generar_csvs":
+        generar_datos.generar_csvs(data_dir, date=date.today(), seed=SEMILLA, n_polizas=n,
+                                   n_siniestros=int(n * SINIESTROS_POR_POLIZA), err_rate=0.01)
+    elif etapa == "validar_archivos":
+        cache_parseo.CACHE_ACTIVA = False
+        detalle["estado"] = validacion.validar_archivos(pol, sin)["estado"]
+    elif etapa == "resumen_por_producto":
+        transformaciones.resumen_por_producto(pol_df, sin_df)
+    elif etapa == "dag":
+        tareas_dag.DATA_DIR = data_dir
+        tareas_dag.QUARANTINE_DIR = os.path.join(data_dir, "quarantine")
+        _, detalle["tareas"] = tareas_dag.ejecutar_local()
+    else:
+        raise ValueError(f"Etapa desconocida: {etapa}")
+    return time.perf_counter() - inicio, round(_pico_mb() - base, 1), detalle
+
+
+def _medir(etapa, data_dir, n, cola):
+    from scripts import utils_auditoria
+    utils_auditoria.configurar_auditoria(os.path.join(data_dir, "auditoria_bench.csv"))
+    try:
+        with open(os.devnull, "w") as nulo, contextlib.redirect_stdout(nulo):
+            segundos, pico, detalle = _correr_etapa(etapa, data_dir, n)
+        cola.put({"segundos": segundos, "pico_rss_mb": pico, "detalle": detalle})
+    except Exception as e:
+        cola.put({"error": f"{type(e).__name__}: {e}"})
+
+
+def medir(etapa, data_dir, n):
+    """Mide la etapa en un proceso nuevo (memoria pico aislada); {'error': ...} si falla o muere"""
+    ctx = mp.get_context("spawn")
+    cola = ctx.Queue()
+    proc = ctx.Process(target=_medir, args=(etapa, data_dir, n, cola))
+    proc.start()
+    while True:
+        try:
+            resultado = cola.get(timeout=1)
+            break
+        except queue.Empty:
+            if not proc.is_alive():
+                resultado = {"error": f"el proceso terminó con código {proc.exitcode} (¿memoria insuficiente?)"}
+                break
+    proc.join()
+    return resultado
+
+
+def ejecutar(tamanios=TAMANIOS, etapas=ETAPAS):
+    """Corre la suite y devuelve el documento de resultados"""
+    filas = []
+    for n in tamanios:
+        registros = n + int(n * SINIESTROS_POR_POLIZA)
+        with tempfile.TemporaryDirectory() as data_dir:
+            # el dataset hace falta aunque no se mida la generación
+            for etapa in ("generar_csvs",) + tuple(e for e in etapas if e != "generar_csvs"):
+                r = medir(etapa, data_dir, n)
+                if etapa not in etapas:
+                    continue
+                fila = {"tamanio": n, "etapa": etapa, **r}
+                if "error" not in r:
+                    fila["filas_por_segundo"] = round(registros / r["segundos"], 1) if r["segundos"] else None
+                    for task_id, seg in fila.pop("detalle", {}).get("tareas", []):
+                        filas.append({"tamanio": n, "etapa": f"dag:{task_id}", "segundos": seg,
+                                      "filas_por_segundo": round(registros / seg, 1) if seg else None})
+                filas.append(fila)
+                _imprimir(fila)
+    return {
+        "fecha": datetime.now().isoformat(timespec="seconds"),
+        "entorno": _entorno(),
+        "resultados": filas,
+    }
+
+
+def _entorno():
+    import numpy
+    import pandas
+    import pyarrow
+    return {
+        "python": platform.python_version(),
+        "plataforma": platform.platform(),
+        "cpus": os.cpu_count(),
+        "numpy": numpy.__version__,
+        "pandas": pandas.__version__,
+        "pyarrow": pyarrow.__version__,
+    }
+
+
+def _imprimir(fila):
+    if "error" in fila:
+        print(f"{fila['tamanio']:>12,} {fila['etapa']:<22} ERROR {fila['error']}", flush=True)
+    else:
+        print(f"{fila['tamanio']:>12,} {fila['etapa']:<22} {fila['segundos']:9.3f}s "
+              f"{fila['filas_por_segundo'] or 0:>14,.0f} filas/s {fila['pico_rss_mb']:>9.1f} MB", flush=True)
+
+
+def comparar(resultados, baseline, tolerancia=TOLERANCIA, tolerancia_memoria=TOLERANCIA_MEMORIA):
+    """Lista de regresiones (texto) de `resultados` frente a `baseline` (mismo formato)"""
+    previos = {(r["tamanio"], r["etapa"]): r for r in baseline.get("resultados", []) if "error" not in r}
+    regresiones = []
+    for r in resultados["resultados"]:
+        base = previos.get((r["tamanio"], r["etapa"]))
+        if base is None:
+            continue
+        etiqueta = f"{r['etapa']} n={r['tamanio']:,}"
+        if "error" in r:
+            regresiones.append(f"{etiqueta}: falló ({r['error']})")
+            continue
+        limite = base["segundos"] + max(base["segundos"] * tolerancia, MIN_SEGUNDOS)
+        if r["segundos"] > limite:
+            regresiones.append(f"{etiqueta}: {r['segundos']:.3f}s vs baseline {base['segundos']:.3f}s")
+        if r.get("pico_rss_mb") is not None and base.get("pico_rss_mb") is not None:
+            limite = base["pico_rss_mb"] + max(base["pico_rss_mb"] * tolerancia_memoria, MIN_MB)
+            if r["pico_rss_mb"] > limite:
+                regresiones.append(f"{etiqueta}: {r['pico_rss_mb']} MB vs baseline {base['pico_rss_mb']} MB")
+    return regresiones
+
+
+def _guardar(doc, path):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(doc, f, indent=2, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    import argparse
+    p = argparse.ArgumentParser(description="Benchmarks del pipeline con control de regresiones")
+    p.add_argument("--tamanios", type=int, nargs="+", default=list(TAMANIOS), help="Pólizas por dataset")
+    p.add_argument("--etapas", nargs="+", choices=ETAPAS, default=list(ETAPAS))
+    p.add_argument("--resultados", default=RESULTADOS_FILE, help="Archivo JSON de resultados")
+    p.add_argument("--baseline", default=BASELINE_FILE, help="Baseline contra la que se compara")
+    p.add_argument("--tolerancia", type=float, default=TOLERANCIA, help="Regresión de tiempo tolerada (0.25 = 25%%)")
+    p.add_argument("--tolerancia-memoria", type=float, default=TOLERANCIA_MEMORIA)
+    p.add_argument("--guardar-baseline", action="store_true", help="Guarda estos resultados como nueva baseline")
+    args = p.parse_args()
+
+    print(f"{'pólizas':>12} {'etapa':<22} {'tiempo':>10} {'throughput':>22} {'mem. pico':>12}")
+    doc = ejecutar(args.tamanios, tuple(args.etapas))
+    _guardar(doc, args.resultados)
+    print(f"Resultados en {args.resultados}")
+    if args.guardar_baseline:
+        _guardar(doc, args.baseline)
+        print(f"Baseline actualizada: {args.baseline}")
+        exit(0)
+    if not os.path.exists(args.baseline):
+        print("Sin baseline: no se comparan regresiones (usa --guardar-baseline)")
+        exit(0)
+    with open(args.baseline, encoding="utf-8") as f:
+        regresiones = comparar(doc, json.load(f), args.tolerancia, args.tolerancia_memoria)
+    for r in regresiones:
+        print(f"❌ Regresión: {r}")
+    print("✅ Sin regresiones" if not regresiones else f"{len(regresiones)} regresiones")
+    exit(1 if regresiones else 0)
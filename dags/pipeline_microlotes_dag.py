@@ -0,0 +1,33 @@
+from datetime import datetime, timedelta
+from airflow import DAG
+from airflow.operators.python import PythonOperator
+import os
+
+from scripts import utils_auditoria, tareas_dag
+from scripts.tareas_dag import DATA_DIR, con_auditoria
+
+DEFAULT_ARGS = {
+    "owner": "data-engineer",
+    "depends_on_past": False,
+    "retries": 2,
+    "retry_delay": timedelta(minutes=1)
+}
+
+utils_auditoria.configurar_auditoria(
+    os.environ.get("PIPELINE_AUDITORIA_FILE", os.path.join(DATA_DIR, "auditoria", "")))
+
+# ingesta por micro-lotes: cada corrida procesa sólo las filas llegadas desde la anterior
+# (manifiesto de offsets en PIPELINE_INGESTA_DIR); una corrida a la vez. Lee su propia entrada
+# (PIPELINE_INGESTA_ENTRADA_DIR, por defecto <ingesta>/entrada) y carga resumen_producto_microlotes:
+# no comparte archivos, cuarentena ni particiones con pipeline_polizas
+with DAG(
+    "pipeline_microlotes",
+    start_date=datetime(2025, 1, 1),
+    schedule_interval="*/5 * * * *",
+    default_args=DEFAULT_ARGS,
+    catchup=False,
+    max_active_runs=1,
+    tags=["demo", "seguros"],
+) as dag:
+
+    ingestar = PythonOperator(task_id="ingestar", python_callable=con_auditoria(tareas_dag.ingestar_task))
@@ -0,0 +1,444 @@
+"""
+Agregación incremental por producto: aplica el delta diario (pólizas y siniestros
+nuevos) sobre un estado persistido en vez de recalcular todo el libro.
+
+Estado en `estado_dir/`:
+- estado.json: agregados por producto (enteros exactos: conteos y centavos) que
+  alimentan `transformaciones.armar_resumen`, lotes ya aplicados y segmentos vigentes.
+  Los lotes `<fuente>@<ini>-<fin>` (rango de bytes de un archivo, número de lote) se
+  guardan como rangos fusionados por fuente, así una ingesta continua no hace crecer
+  el estado con un ID por lote; el resto (fechas, pares de archivos) como conjunto.
+- seg_NNNNNN/: registros por poliza_id de los IDs tocados en un lote, como arreglos
+  .npy ordenados (memory-mapped al leer):
+    pol_id, pol_producto, pol_r (filas), pol_s (Σ prima en centavos)
+    sin_id, sin_k (siniestros), sin_c (siniestro_id no nulos), sin_m (Σ monto en centavos)
+  Los IDs son claves de 16 bytes: el UUID empaquetado (alto/bajo de
+  indice_ids.empaquetar, en big-endian) o, para los IDs no canónicos y los nulos, un
+  digest de 16 bytes; el producto es un código uint8 (0 = nulo) de la tabla
+  `codigos_producto` de estado.json. 33 bytes por póliza en vez de 144 con textos de
+  64 bytes, y sólo los IDs no canónicos pasan por Python.
+  El segmento más nuevo que contiene un ID tiene su registro vigente; se buscan por
+  búsqueda binaria, así el costo de cada lote es proporcional al delta.
+  Compactación por razón de tamaños: el segmento nuevo se fusiona con los anteriores
+  mientras el anterior no tenga más de RAZON_COMPACTACION veces las filas de lo ya
+  fusionado. Sólo se reescriben segmentos de tamaño parecido: los tamaños quedan
+  decrecientes en progresión geométrica (O(log n) segmentos por buscar) y cada
+  registro se reescribe O(log n) veces, no en cada compactación.
+
+El resultado es idéntico al de `resumen_por_producto` sobre todo el libro: un ID nulo
+se trata como una clave más (el merge de pandas une NaN con NaN) y una póliza con k
+siniestros aporta max(1, k) filas combinadas.
+"""
+import bisect
+import hashlib
+import json
+import os
+import re
+import shutil
+import sys
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+# allow running directly
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from scripts.indice_ids import empaquetar
+from scripts.utils_auditoria import registrar_evento_auditoria
+from scripts.transformaciones import a_centavos, armar_resumen
+
+ESTADO_FILE = "estado.json"
+# formato de los segmentos: 2 = claves de 16 bytes y productos uint8 (1: textos de ANCHO_ID_V1 bytes)
+FORMATO = 2
+ANCHO_ID = 16
+ANCHO_ID_V1 = 64
+NULO = b"\x01"  # texto de la clave de poliza_id / producto nulos
+RAZON_COMPACTACION = 1
+CAMPOS = ["filas_pol", "total_polizas", "total_siniestros", "monto_cent", "prima_cent", "filas"]
+_COLS_POL = ["pol_id", "pol_producto", "pol_r", "pol_s"]
+_COLS_SIN = ["sin_id", "sin_k", "sin_c", "sin_m"]
+_LOTE_RANGO = re.compile(r"^(.*)@(\d+)-(\d+)$")
+
+
+def _texto_clave(texto):
+    """Clave de texto de un ID no canónico (la del formato 1: los de más de ANCHO_ID_V1 bytes, resumidos)"""
+    e = NULO if texto is None else texto.encode("utf-8")
+    return e if len(e) <= ANCHO_ID_V1 else b"~" + hashlib.blake2b(e, digest_size=24).hexdigest().encode()
+
+
+def _digest(claves_texto):
+    """(alto, bajo) del digest de 16 bytes de cada clave de texto"""
+    d = b"".join(hashlib.blake2b(e, digest_size=ANCHO_ID).digest() for e in claves_texto)
+    par = np.frombuffer(d, dtype=">u8").reshape(-1, 2).astype(np.uint64)
+    return par[:, 0], par[:, 1]
+
+
+def _claves(s):
+    """
+    Serie de IDs -> (alto, bajo) uint64: UUID canónicos empaquetados; los demás (y los
+    nulos) por digest de su clave de texto, el único camino fila a fila
+    """
+    alto, bajo, canonico, arr = empaquetar(s)
+    otros = np.flatnonzero(~canonico)
+    if len(otros):
+        alto[otros], bajo[otros] = _digest([_texto_clave(t) for t in arr.take(pa.array(otros)).to_pylist()])
+    return alto, bajo
+
+
+NULO_ALTO, NULO_BAJO = (int(v[0]) for v in _digest([NULO]))  # clave de poliza_id nulo
+
+
+def _ids(alto, bajo):
+    """(alto, bajo) -> claves S16 big-endian: el orden de los bytes es el de los pares"""
+    par = np.empty((len(alto), 2), dtype=">u8")
+    par[:, 0], par[:, 1] = alto, bajo
+    return par.view(f"S{ANCHO_ID}").ravel()
+
+
+def _ids_de(df):
+    return _ids(df["alto"].to_numpy(dtype=np.uint64), df["bajo"].to_numpy(dtype=np.uint64))
+
+
+def _partes(ids):
+    """Claves S16 -> (alto, bajo) uint64"""
+    par = np.ascontiguousarray(ids).view(">u8").reshape(-1, 2).astype(np.uint64)
+    return par[:, 0], par[:, 1]
+
+
+def _codigos_producto(estado, s):
+    """Serie de productos -> códigos uint8 (0 = nulo); los productos nuevos se agregan a la tabla del estado"""
+    codigos, valores = pd.factorize(s)
+    tabla = estado["codigos_producto"]
+    mapa = {p: i + 1 for i, p in enumerate(tabla)}
+    for p in map(str, valores):
+        if p not in mapa:
+            tabla.append(p)
+            mapa[p] = len(tabla)
+    if len(tabla) > np.iinfo(np.uint8).max:
+        raise ValueError(f"Más de {np.iinfo(np.uint8).max} productos distintos: no entran en pol_producto (uint8)")
+    return np.array([0] + [mapa[str(p)] for p in valores], dtype=np.uint8)[codigos + 1]
+
+
+def _estado_vacio():
+    return {"productos": {}, "segmentos": [], "siguiente_segmento": 1, "formato": FORMATO,
+            "codigos_producto": [], "lotes_aplicados": {"ids": set(), "rangos": {}}}
+
+
+def _rango(lote):
+    """'<fuente>@<ini>-<fin>' -> (fuente, ini, fin); None si el lote no es un rango"""
+    m = _LOTE_RANGO.match(str(lote))
+    return (m.group(1), int(m.group(2)), int(m.group(3))) if m else None
+
+
+def _lote_aplicado(lotes, lote):
+    """True si el lote ya se aplicó (un rango, si queda dentro de los rangos de su fuente)"""
+    rango = _rango(lote)
+    if rango is None:
+        return lote in lotes["ids"]
+    fuente, ini, fin = rango
+    rangos = lotes["rangos"].get(fuente, [])
+    i = bisect.bisect_right([a for a, _ in rangos], ini) - 1
+    return i >= 0 and rangos[i][1] >= fin
+
+
+def _registrar_lote(lotes, lote):
+    """Agrega el lote; los rangos contiguos o solapados de una fuente se fusionan en uno"""
+    rango = _rango(lote)
+    if rango is None:
+        lotes["ids"].add(lote)
+        return
+    fuente, ini, fin = rango
+    fusionados = []
+    for a, b in sorted(lotes["rangos"].get(fuente, []) + [[ini, fin]]):
+        if fusionados and a <= fusionados[-1][1]:
+            fusionados[-1][1] = max(fusionados[-1][1], b)
+        else:
+            fusionados.append([a, b])
+    lotes["rangos"][fuente] = fusionados
+
+
+def cargar_estado(estado_dir):
+    try:
+        with open(os.path.join(estado_dir, ESTADO_FILE), encoding="utf-8") as f:
+            estado = json.load(f)
+    except (OSError, ValueError):
+        return _estado_vacio()
+    guardados = estado.get("lotes_aplicados", [])
+    if isinstance(guardados, list):  # formato anterior: lista con un ID por lote
+        estado["lotes_aplicados"] = {"ids": set(), "rangos": {}}
+        for lote in guardados:
+            _registrar_lote(estado["lotes_aplicados"], lote)
+    else:
+        guardados["ids"] = set(guardados["ids"])
+    # formato anterior: sólo el nombre de cada segmento
+    estado["segmentos"] = [s if isinstance(s, dict) else {"nombre": s, "filas": _filas_segmento(estado_dir, s)}
+                           for s in estado["segmentos"]]
+    estado.setdefault("formato", 1)
+    estado.setdefault("codigos_producto", [])
+    return estado
+
+
+def _guardar_estado(estado_dir, estado):
+    destino = os.path.join(estado_dir, ESTADO_FILE)
+    tmp = f"{destino}.tmp"
+    lotes = estado["lotes_aplicados"]
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(dict(estado, lotes_aplicados={"ids": sorted(lotes["ids"]), "rangos": lotes["rangos"]}),
+                  f, indent=2, sort_keys=True)
+    os.replace(tmp, destino)
+
+
+def _cargar_segmento(estado_dir, nombre):
+    base = os.path.join(estado_dir, nombre)
+    return {c: np.load(os.path.join(base, f"{c}.npy"), mmap_mode="r") for c in _COLS_POL + _COLS_SIN}
+
+
+def _filas_segmento(estado_dir, nombre):
+    seg = _cargar_segmento(estado_dir, nombre)
+    return len(seg["pol_id"]) + len(seg["sin_id"])
+
+
+def _escribir_segmento(estado_dir, nombre, pol, sin):
+    """Escribe el segmento en un directorio temporal y lo publica con un rename atómico"""
+    destino = os.path.join(estado_dir, nombre)
+    tmp = f"{destino}.tmp"
+    for path in (tmp, destino):
+        if os.path.exists(path):
+            shutil.rmtree(path)  # restos de una ejecución interrumpida
+    os.makedirs(tmp)
+    pol_id = _ids_de(pol)
+    pol_producto = pol["producto"].to_numpy(dtype=np.uint8)
+    sin_id = _ids_de(sin)
+    # orden sobre bytes de ancho fijo (mucho más rápido que ordenar objetos)
+    orden_pol = np.lexsort((pol_producto, pol_id))
+    orden_sin = np.argsort(sin_id, kind="stable")
+    arreglos = {
+        "pol_id": pol_id[orden_pol],
+        "pol_producto": pol_producto[orden_pol],
+        "pol_r": pol["r"].to_numpy(dtype=np.int64)[orden_pol],
+        "pol_s": pol["s"].to_numpy(dtype=np.int64)[orden_pol],
+        "sin_id": sin_id[orden_sin],
+        "sin_k": sin["k"].to_numpy(dtype=np.int64)[orden_sin],
+        "sin_c": sin["c"].to_numpy(dtype=np.int64)[orden_sin],
+        "sin_m": sin["m"].to_numpy(dtype=np.int64)[orden_sin],
+    }
+    for c, arr in arreglos.items():
+        np.save(os.path.join(tmp, f"{c}.npy"), arr)
+    os.replace(tmp, destino)
+
+
+def _rangos(ini, fin):
+    """Índices de todas las posiciones [ini_j, fin_j) concatenadas (vectorizado)"""
+    largos = fin - ini
+    return np.arange(largos.sum()) + np.repeat(ini - (np.cumsum(largos) - largos), largos)
+
+
+def _vacio(enteros, producto=False):
+    return pd.DataFrame({"alto": pd.Series(dtype=np.uint64), "bajo": pd.Series(dtype=np.uint64),
+                         **({"producto": pd.Series(dtype=np.uint8)} if producto else {}),
+                         **{c: pd.Series(dtype=np.int64) for c in enteros}})
+
+
+def _registros_pol(seg, idx=slice(None)):
+    alto, bajo = _partes(seg["pol_id"][idx])
+    return pd.DataFrame({"alto": alto, "bajo": bajo, "producto": seg["pol_producto"][idx],
+                         "r": seg["pol_r"][idx], "s": seg["pol_s"][idx]})
+
+
+def _registros_sin(seg, idx=slice(None)):
+    alto, bajo = _partes(seg["sin_id"][idx])
+    return pd.DataFrame({"alto": alto, "bajo": bajo, "k": seg["sin_k"][idx], "c": seg["sin_c"][idx],
+                         "m": seg["sin_m"][idx]})
+
+
+def _buscar(estado_dir, segmentos, ids):
+    """Registros vigentes (pol, sin) de los `ids` ordenados, del segmento más nuevo al más viejo"""
+    pol, sin = [], []
+    falta_pol = np.ones(len(ids), dtype=bool)
+    falta_sin = np.ones(len(ids), dtype=bool)
+    for nombre in reversed([s["nombre"] for s in segmentos]):
+        if not (falta_pol.any() or falta_sin.any()):
+            break
+        seg = _cargar_segmento(estado_dir, nombre)
+        q = ids[falta_pol]
+        ini = np.searchsorted(seg["pol_id"], q, "left")
+        fin = np.searchsorted(seg["pol_id"], q, "right")
+        hallado = fin > ini
+        if hallado.any():
+            pol.append(_registros_pol(seg, _rangos(ini[hallado], fin[hallado])))
+            falta_pol[np.flatnonzero(falta_pol)[hallado]] = False
+        q = ids[falta_sin]
+        pos = np.searchsorted(seg["sin_id"], q, "left")
+        dentro = pos < len(seg["sin_id"])
+        hallado = np.zeros(len(q), dtype=bool)
+        hallado[dentro] = seg["sin_id"][pos[dentro]] == q[dentro]
+        if hallado.any():
+            sin.append(_registros_sin(seg, pos[hallado]))
+            falta_sin[np.flatnonzero(falta_sin)[hallado]] = False
+    pol = pd.concat(pol, ignore_index=True) if pol else _vacio(["r", "s"], producto=True)
+    sin = pd.concat(sin, ignore_index=True) if sin else _vacio(["k", "c", "m"])
+    return pol, sin
+
+
+def _contribucion(pol, sin):
+    """Aporte por producto de un conjunto de registros (misma fórmula que el merge completo)"""
+    j = pol.merge(sin, on=["alto", "bajo"], how="left")
+    k = j["k"].fillna(0).to_numpy(dtype=np.int64)
+    c = j["c"].fillna(0).to_numpy(dtype=np.int64)
+    m = j["m"].fillna(0).to_numpy(dtype=np.int64)
+    r = j["r"].to_numpy(dtype=np.int64)
+    s = j["s"].to_numpy(dtype=np.int64)
+    w = np.maximum(1, k)  # una póliza sin siniestros igual aporta una fila combinada
+    aporte = pd.DataFrame({
+        "producto": j["producto"].to_numpy(),
+        "filas_pol": r,
+        "total_polizas": ((j["alto"] != NULO_ALTO) | (j["bajo"] != NULO_BAJO)).to_numpy(dtype=np.int64),
+        "total_siniestros": r * c,
+        "monto_cent": r * m,
+        "prima_cent": s * w,
+        "filas": r * w,
+    })
+    aporte = aporte[aporte["producto"] != 0]
+    return aporte.groupby("producto")[CAMPOS].sum()
+
+
+def _delta(estado, polizas_df, siniestros_df):
+    """Agregados del lote por (poliza_id, producto) y por poliza_id"""
+    alto, bajo = _claves(polizas_df["poliza_id"])
+    pol = pd.DataFrame({
+        "alto": alto,
+        "bajo": bajo,
+        "producto": _codigos_producto(estado, polizas_df["producto"]),
+        "r": 1,
+        "s": a_centavos(polizas_df["prima_mensual"]),
+    })
+    alto, bajo = _claves(siniestros_df["poliza_id"])
+    sin = pd.DataFrame({
+        "alto": alto,
+        "bajo": bajo,
+        "k": 1,
+        "c": siniestros_df["siniestro_id"].notna().to_numpy(dtype=np.int64),
+        "m": a_centavos(siniestros_df["monto_reclamado"]),
+    })
+    pol = pol.groupby(["alto", "bajo", "producto"], as_index=False, sort=False)[["r", "s"]].sum()
+    sin = sin.groupby(["alto", "bajo"], as_index=False, sort=False)[["k", "c", "m"]].sum()
+    return pol, sin
+
+
+def _a_compactar(segmentos):
+    """Desde qué segmento se fusionan los más nuevos (len(segmentos) si ninguno)"""
+    desde = len(segmentos) - 1
+    fusionadas = segmentos[desde]["filas"]
+    while desde > 0 and segmentos[desde - 1]["filas"] <= RAZON_COMPACTACION * fusionadas:
+        desde -= 1
+        fusionadas += segmentos[desde]["filas"]
+    return desde if desde < len(segmentos) - 1 else len(segmentos)
+
+
+def _compactar(estado_dir, estado, desde):
+    """Fusiona los segmentos desde `desde` en uno (registro del segmento más nuevo por ID)"""
+    pol, sin = [], []
+    for rango, nombre in enumerate(reversed([s["nombre"] for s in estado["segmentos"][desde:]])):
+        seg = _cargar_segmento(estado_dir, nombre)
+        pol.append(_registros_pol(seg).assign(rango=rango))
+        sin.append(_registros_sin(seg).assign(rango=rango))
+    pol = pd.concat(pol, ignore_index=True)
+    pol = pol[pol["rango"] == pol.groupby(["alto", "bajo"])["rango"].transform("min")]
+    sin = pd.concat(sin, ignore_index=True).sort_values("rango", kind="stable").drop_duplicates(["alto", "bajo"])
+    nombre = f"seg_{estado['siguiente_segmento']:06d}"
+    _escribir_segmento(estado_dir, nombre, pol.drop(columns="rango"), sin.drop(columns="rango"))
+    viejos = estado["segmentos"][desde:]
+    estado["segmentos"] = estado["segmentos"][:desde] + [{"nombre": nombre, "filas": len(pol) + len(sin)}]
+    estado["siguiente_segmento"] += 1
+    _guardar_estado(estado_dir, estado)
+    for viejo in viejos:
+        shutil.rmtree(os.path.join(estado_dir, viejo["nombre"]), ignore_errors=True)
+
+
+def _migrar(estado_dir, estado):
+    """Reescribe los segmentos del formato 1 (textos de ANCHO_ID_V1 bytes) con claves de 16 bytes"""
+    for i, segmento in enumerate(estado["segmentos"]):
+        seg = _cargar_segmento(estado_dir, segmento["nombre"])
+        if seg["pol_id"].dtype.itemsize == ANCHO_ID and seg["pol_producto"].dtype == np.uint8:
+            continue  # migrado por una ejecución interrumpida
+        claves = {}
+        for c in ("pol_id", "sin_id"):
+            textos = [None if e == NULO else e.decode("utf-8") for e in seg[c].tolist()]
+            # _claves de cada texto: sus claves de texto del formato 1 son los mismos bytes
+            claves[c] = _claves(pd.Series(textos, dtype=object))
+        productos = pd.Series([None if e == NULO else e.decode("utf-8") for e in seg["pol_producto"].tolist()],
+                              dtype=object)
+        pol = pd.DataFrame({"alto": claves["pol_id"][0], "bajo": claves["pol_id"][1],
+                            "producto": _codigos_producto(estado, productos),
+                            "r": np.asarray(seg["pol_r"]), "s": np.asarray(seg["pol_s"])})
+        sin = pd.DataFrame({"alto": claves["sin_id"][0], "bajo": claves["sin_id"][1], "k": np.asarray(seg["sin_k"]),
+                            "c": np.asarray(seg["sin_c"]), "m": np.asarray(seg["sin_m"])})
+        nombre = f"seg_{estado['siguiente_segmento']:06d}"
+        _escribir_segmento(estado_dir, nombre, pol, sin)
+        estado["segmentos"][i] = {"nombre": nombre, "filas": segmento["filas"]}
+        estado["siguiente_segmento"] += 1
+        _guardar_estado(estado_dir, estado)
+        shutil.rmtree(os.path.join(estado_dir, segmento["nombre"]), ignore_errors=True)
+    estado["formato"] = FORMATO
+    _guardar_estado(estado_dir, estado)
+
+
+def aplicar_delta(estado_dir, polizas_df, siniestros_df, lote=None):
+    """
+    Actualiza el estado con el delta del día y devuelve el resumen por producto.
+    - lote: identificador opcional (p. ej. la fecha, o `<fuente>@<ini>-<fin>` para
+      tramos de una misma fuente); si ya se aplicó, no se repite
+    """
+    inicio = datetime.now()
+    os.makedirs(estado_dir, exist_ok=True)
+    estado = cargar_estado(estado_dir)
+    if lote is not None and _lote_aplicado(estado["lotes_aplicados"], lote):
+        registrar_evento_auditoria("agregado_incremental", archivo=str(lote), registros=0, inicio=inicio,
+                                   estado="OK", mensaje="Lote ya aplicado: se omite")
+        return resumen_desde_estado(estado)
+
+    if estado["formato"] != FORMATO:
+        _migrar(estado_dir, estado)
+    d_pol, d_sin = _delta(estado, polizas_df, siniestros_df)
+    ids = np.unique(np.concatenate([_ids_de(d_pol), _ids_de(d_sin)]))
+    viejo_pol, viejo_sin = _buscar(estado_dir, estado["segmentos"], ids)
+
+    nuevo_pol = pd.concat([viejo_pol, d_pol], ignore_index=True).groupby(["alto", "bajo", "producto"], as_index=False, sort=False)[["r", "s"]].sum()
+    nuevo_sin = pd.concat([viejo_sin, d_sin], ignore_index=True).groupby(["alto", "bajo"], as_index=False, sort=False)[["k", "c", "m"]].sum()
+
+    # agregados: se quita el aporte viejo de los IDs tocados y se suma el nuevo
+    nuevo = _contribucion(nuevo_pol, nuevo_sin)
+    viejo = _contribucion(viejo_pol, viejo_sin)
+    productos = nuevo.index.union(viejo.index)
+    cambio = nuevo.reindex(productos, fill_value=0) - viejo.reindex(productos, fill_value=0)
+    for producto, fila in cambio.iterrows():
+        acumulado = estado["productos"].setdefault(estado["codigos_producto"][producto - 1], dict.fromkeys(CAMPOS, 0))
+        for campo in CAMPOS:
+            acumulado[campo] += int(fila[campo])
+
+    if len(nuevo_pol) or len(nuevo_sin):
+        nombre = f"seg_{estado['siguiente_segmento']:06d}"
+        _escribir_segmento(estado_dir, nombre, nuevo_pol, nuevo_sin)
+        estado["segmentos"].append({"nombre": nombre, "filas": len(nuevo_pol) + len(nuevo_sin)})
+        estado["siguiente_segmento"] += 1
+    if lote is not None:
+        _registrar_lote(estado["lotes_aplicados"], lote)
+    _guardar_estado(estado_dir, estado)
+    if estado["segmentos"]:
+        desde = _a_compactar(estado["segmentos"])
+        if desde < len(estado["segmentos"]):
+            _compactar(estado_dir, estado, desde)
+
+    registrar_evento_auditoria("agregado_incremental", archivo=str(lote or ""),
+                               registros=len(polizas_df) + len(siniestros_df), inicio=inicio, estado="OK",
+                               mensaje=f"IDs tocados: {len(ids)} segmentos: {len(estado['segmentos'])}")
+    return resumen_desde_estado(estado)
+
+
+def resumen_desde_estado(estado):
+    """Resumen por producto (mismas columnas y tipos que resumen_por_producto)"""
+    productos = {p: v for p, v in estado["productos"].items() if v["filas_pol"] > 0}
+    agg = pd.DataFrame([dict(v, producto=p) for p, v in productos.items()],
+                       columns=["producto"] + CAMPOS)
+    return armar_resumen(agg)
@@ -0,0 +1,214 @@
+"""
+Backend `segmentos` de la auditoría: eventos en segmentos CSV rotados y particionados
+por fecha, con un índice chico, así las lecturas habituales no recorren todo el historial.
+
+Layout en el directorio destino (PIPELINE_AUDITORIA_FILE terminado en "/"):
+    indice.json                        un registro por segmento: fecha, filas, bytes,
+                                       primer/último evento y por etapa eventos,
+                                       registros y duración acumulada
+    fecha=YYYY-MM-DD/segmento-00000.csv
+    .lock                              lock de escritura (segmento + índice juntos)
+
+- Un segmento se rota al pasar SEGMENTO_MAX_BYTES; cada día empieza uno nuevo.
+- `ultimos` recorre los segmentos del más nuevo al más viejo y salta los que según
+  el índice no tienen la etapa pedida: normalmente lee sólo el último.
+- `latencias` lee sólo cuatro columnas de los segmentos de la ventana de fechas que
+  según el índice tienen las etapas pedidas.
+- El índice se reemplaza de forma atómica; si un proceso muere entre el segmento y el
+  índice, `reindexar` lo reconstruye desde los segmentos.
+"""
+import csv
+import json
+import os
+import sys
+from datetime import datetime
+
+import pandas as pd
+
+# allow running directly
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from scripts.utils_auditoria import CAMPOS, _bloquear
+
+SEGMENTO_MAX_BYTES = int(os.environ.get("PIPELINE_AUDITORIA_SEGMENTO_BYTES", 4 * 1024**2))
+INDICE = "indice.json"
+LOCK = ".lock"
+PERCENTILES = (50, 90, 99)
+
+
+def leer_indice(destino):
+    try:
+        with open(os.path.join(destino, INDICE), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {"segmentos": []}
+
+
+def _escribir_indice(destino, indice):
+    path = os.path.join(destino, INDICE)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(indice, f, indent=1)
+    os.replace(tmp, path)
+
+
+def _acumular(segmento, registros):
+    for r in registros:
+        momento = str(r["fecha_proceso"])
+        segmento["desde"] = min(segmento["desde"] or momento, momento)
+        segmento["hasta"] = max(segmento["hasta"] or momento, momento)
+        etapa = segmento["etapas"].setdefault(r["etapa"], {"eventos": 0, "registros": 0, "duracion": 0.0})
+        etapa["eventos"] += 1
+        etapa["registros"] += int(float(r.get("registros") or 0))
+        etapa["duracion"] = round(etapa["duracion"] + float(r.get("duracion_segundos") or 0), 6)
+    segmento["filas"] += len(registros)
+
+
+def _nuevo_segmento(destino, indice, fecha):
+    n = sum(s["fecha"] == fecha for s in indice["segmentos"])
+    ruta = os.path.join(f"fecha={fecha}", f"segmento-{n:05d}.csv")
+    os.makedirs(os.path.join(destino, f"fecha={fecha}"), exist_ok=True)
+    segmento = {"ruta": ruta, "fecha": fecha, "filas": 0, "bytes": 0, "desde": None, "hasta": None, "etapas": {}}
+    indice["segmentos"].append(segmento)
+    return segmento
+
+
+def _segmento_abierto(destino, indice, fecha):
+    """Último segmento de la fecha si todavía no llegó al tamaño de rotación; si no, uno nuevo"""
+    for segmento in reversed(indice["segmentos"]):
+        if segmento["fecha"] == fecha:
+            if segmento["bytes"] < SEGMENTO_MAX_BYTES:
+                return segmento
+            break
+    return _nuevo_segmento(destino, indice, fecha)
+
+
+def escribir(destino, registros):
+    """Agrega los eventos a los segmentos de su fecha y actualiza el índice (bajo lock)"""
+    os.makedirs(destino, exist_ok=True)
+    por_fecha = {}
+    for r in registros:
+        por_fecha.setdefault(str(r["fecha_proceso"])[:10], []).append(r)
+    with open(os.path.join(destino, LOCK), "a") as lock:
+        _bloquear(lock)  # se libera al cerrar
+        indice = leer_indice(destino)
+        for fecha, grupo in por_fecha.items():
+            segmento = _segmento_abierto(destino, indice, fecha)
+            path = os.path.join(destino, segmento["ruta"])
+            with open(path, "a", newline="", encoding="utf-8") as f:
+                writer = csv.DictWriter(f, fieldnames=CAMPOS, extrasaction="ignore")
+                if f.tell() == 0:
+                    writer.writeheader()
+                writer.writerows(grupo)
+                segmento["bytes"] = f.tell()
+            _acumular(segmento, grupo)
+        indice["actualizado"] = datetime.now().isoformat(timespec="seconds")
+        _escribir_indice(destino, indice)
+
+
+def reindexar(destino):
+    """Reconstruye el índice leyendo todos los segmentos (recuperación)"""
+    with open(os.path.join(destino, LOCK), "a") as lock:
+        _bloquear(lock)
+        segmentos = []
+        for particion in sorted(d for d in os.listdir(destino) if d.startswith("fecha=")):
+            for nombre in sorted(os.listdir(os.path.join(destino, particion))):
+                ruta = os.path.join(particion, nombre)
+                segmento = {"ruta": ruta, "fecha": particion[len("fecha="):], "filas": 0,
+                            "bytes": os.path.getsize(os.path.join(destino, ruta)),
+                            "desde": None, "hasta": None, "etapas": {}}
+                with open(os.path.join(destino, ruta), newline="", encoding="utf-8") as f:
+                    _acumular(segmento, list(csv.DictReader(f)))
+                segmentos.append(segmento)
+        indice = {"segmentos": segmentos, "actualizado": datetime.now().isoformat(timespec="seconds")}
+        _escribir_indice(destino, indice)
+    return indice
+
+
+def _segmentos(destino, fechas=None, desde=None, hasta=None, etapas=None):
+    """Segmentos del índice (en orden de fecha y rotación) que pueden tener eventos pedidos"""
+    elegidos = []
+    for segmento in leer_indice(destino)["segmentos"]:
+        if fechas is not None and segmento["fecha"] not in fechas:
+            continue
+        if (desde and segmento["fecha"] < desde) or (hasta and segmento["fecha"] > hasta):
+            continue
+        if etapas is not None and not set(etapas) & set(segmento["etapas"]):
+            continue
+        elegidos.append(segmento)
+    return sorted(elegidos, key=lambda s: (s["fecha"], s["ruta"]))
+
+
+def _leer(destino, segmentos, columnas=None):
+    partes = [pd.read_csv(os.path.join(destino, s["ruta"]), usecols=columnas,
+                          dtype={"archivo": str, "mensaje": str}, keep_default_na=False)
+              for s in segmentos]
+    if not partes:
+        return pd.DataFrame(columns=columnas or CAMPOS)
+    return pd.concat(partes, ignore_index=True)
+
+
+def leer(destino, fechas=None):
+    """Eventos de `fechas` ('YYYY-MM-DD'; por defecto todas) en orden de fecha"""
+    return _leer(destino, _segmentos(destino, fechas=fechas))
+
+
+def ultimos(destino, n=5, etapa=None):
+    """Los últimos `n` eventos (de `etapa` si se pide), leyendo desde el segmento más nuevo"""
+    partes, faltan = [], n
+    for segmento in reversed(_segmentos(destino, etapas=[etapa] if etapa else None)):
+        df = _leer(destino, [segmento])
+        if etapa:
+            df = df[df["etapa"] == etapa]
+        partes.insert(0, df.tail(faltan))
+        faltan -= len(partes[0])
+        if faltan <= 0:
+            break
+    if not partes:
+        return pd.DataFrame(columns=CAMPOS)
+    return pd.concat(partes, ignore_index=True)
+
+
+def latencias_de(df, desde=None, hasta=None, etapas=None, percentiles=PERCENTILES):
+    """
+    Por etapa, en la ventana de fechas [desde, hasta] ('YYYY-MM-DD', inclusivas): eventos,
+    percentiles de duracion_segundos (p50, p90, ...), registros y registros por segundo.
+    """
+    dia = df["fecha_proceso"].astype(str).str[:10]
+    df = df[dia.between(desde or "", hasta or "9999-12-31")]
+    if etapas is not None:
+        df = df[df["etapa"].isin(etapas)]
+    df = df.astype({"registros": "int64", "duracion_segundos": "float64"})  # vacío -> object
+    grupos = df.groupby("etapa")
+    res = grupos.agg(eventos=("etapa", "size"), registros=("registros", "sum"), duracion=("duracion_segundos", "sum"))
+    columnas = [f"p{p}" for p in percentiles]
+    for p, columna in zip(percentiles, columnas):
+        res[columna] = grupos["duracion_segundos"].quantile(p / 100)
+    res["registros_por_segundo"] = (res["registros"] / res["duracion"].where(res["duracion"] > 0)).round(2)
+    return res.reset_index()[["etapa", "eventos", *columnas, "registros", "registros_por_segundo"]]
+
+
+def latencias(destino, desde=None, hasta=None, etapas=None, percentiles=PERCENTILES):
+    """`latencias_de` leyendo sólo los segmentos de la ventana que tienen las etapas pedidas"""
+    segmentos = _segmentos(destino, desde=desde, hasta=hasta, etapas=etapas)
+    df = _leer(destino, segmentos, columnas=["fecha_proceso", "etapa", "registros", "duracion_segundos"])
+    return latencias_de(df, desde, hasta, etapas, percentiles)
+
+
+if __name__ == "__main__":
+    import argparse
+    p = argparse.ArgumentParser(description="Consultas sobre la auditoría segmentada")
+    p.add_argument("--destino", required=True, help="Directorio de la auditoría segmentada")
+    p.add_argument("--ultimos", type=int, default=None, help="Muestra los últimos N eventos")
+    p.add_argument("--etapa", default=None, help="Filtra por etapa (con --ultimos o --latencias)")
+    p.add_argument("--latencias", action="store_true", help="Percentiles de duración y throughput por etapa")
+    p.add_argument("--desde", default=None, help="Fecha inicial YYYY-MM-DD (inclusive)")
+    p.add_argument("--hasta", default=None, help="Fecha final YYYY-MM-DD (inclusive)")
+    p.add_argument("--reindexar", action="store_true", help="Reconstruye el índice desde los segmentos")
+    args = p.parse_args()
+    if args.reindexar:
+        print(f"Segmentos indexados: {len(reindexar(args.destino)['segmentos'])}")
+    if args.ultimos:
+        print(ultimos(args.destino, args.ultimos, args.etapa).to_string(index=False))
+    if args.latencias:
+        print(latencias(args.destino, args.desde, args.hasta, [args.etapa] if args.etapa else None)
+              .to_string(index=False))
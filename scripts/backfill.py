@@ -0,0 +1,147 @@
+"""
+Backfill multi-día: valida, transforma y escribe el resumen de cada fecha de
+un rango (polizas_YYYYMMDD.csv / siniestros_YYYYMMDD.csv, también comprimidos o en
+partes) en un pool de procesos.
+- Aislamiento: el fallo de una fecha no detiene las demás.
+- Reanudación: las fechas ya resueltas quedan en `backfill_estado.json` y se saltan.
+- Auditoría: cada fecha audita a su propio CSV; al final se fusionan, en orden de
+  fecha, en el archivo de auditoría principal.
+"""
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime, timedelta
+
+# allow running directly
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from scripts import entradas, utils_auditoria, validacion, transformaciones, instrumentacion
+from scripts.utils_auditoria import registrar_evento_auditoria, fusionar_auditorias, vaciar_auditoria
+
+ESTADO_FILE = "backfill_estado.json"
+# estados finales: no se reprocesan al reanudar (ERROR/SIN_ARCHIVOS sí)
+ESTADOS_FINALES = ("OK", "CORRUPTO")
+
+
+def rango_fechas(desde, hasta):
+    """Fechas YYYYMMDD entre desde y hasta (inclusive); acepta date o 'YYYY-MM-DD'"""
+    if isinstance(desde, str):
+        desde = datetime.strptime(desde, "%Y-%m-%d").date()
+    if isinstance(hasta, str):
+        hasta = datetime.strptime(hasta, "%Y-%m-%d").date()
+    if desde > hasta:
+        raise ValueError(f"Rango de fechas vacío: desde {desde} es posterior a hasta {hasta}")
+    return [(desde + timedelta(days=i)).strftime("%Y%m%d") for i in range((hasta - desde).days + 1)]
+
+
+def _cargar_estado(path):
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _guardar_estado(path, estado):
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(estado, f, indent=2, sort_keys=True)
+    os.replace(tmp, path)
+
+
+def procesar_fecha(date_str, data_dir, out_dir, umbral, audit_dir):
+    """Pipeline completo de una fecha (corre en un proceso del pool)"""
+    # auditoría propia de la fecha: sin escrituras concurrentes al CSV principal
+    utils_auditoria.AUDITORIA_FILE = os.path.join(audit_dir, f"auditoria_{date_str}.csv")
+    if os.path.exists(utils_auditoria.AUDITORIA_FILE):
+        os.remove(utils_auditoria.AUDITORIA_FILE)  # restos de un intento anterior
+    inicio = datetime.now()
+    pol = entradas.buscar(data_dir, "polizas", date_str)
+    sin = entradas.buscar(data_dir, "siniestros", date_str)
+    res = {"fecha": date_str, "estado": "OK", "mensaje": "", "resumen_file": None}
+    try:
+        if not (pol and sin):
+            res.update(estado="SIN_ARCHIVOS", mensaje="Archivos de entrada no encontrados")
+        else:
+            val = validacion.validar_archivos(pol, sin, umbral=umbral,
+                                              validos_dir=os.path.join(out_dir, "validacion"))
+            if val["estado"] != "VALIDO":
+                res.update(estado="CORRUPTO",
+                           mensaje=f"Inválidos pol:{val['pol_invalidos']} sin:{val['sin_invalidos']}")
+            else:
+                # el resumen sale sólo de las filas válidas, sin volver a parsear los CSV
+                res["resumen_file"] = transformaciones.main(val["valid_pol_path"], val["valid_sin_path"], out_dir,
+                                                            fecha_tag=date_str)
+    except Exception as e:  # aislamiento por fecha
+        res.update(estado="ERROR", mensaje=f"{type(e).__name__}: {e}")
+    registrar_evento_auditoria("backfill_fecha", archivo=date_str, registros=0, inicio=inicio,
+                               estado=res["estado"], mensaje=res["mensaje"])
+    vaciar_auditoria()  # el padre fusiona el archivo de la fecha apenas terminan los workers
+    return res
+
+
+def ejecutar_backfill(desde, hasta, data_dir="data", out_dir="data", workers=None, umbral=0.10, forzar=False):
+    """
+    Procesa el rango de fechas en paralelo y devuelve un resultado por fecha (ordenado).
+    - workers: procesos del pool (None -> núcleos disponibles)
+    - forzar: reprocesa también las fechas ya resueltas
+    """
+    inicio = datetime.now()
+    fechas = rango_fechas(desde, hasta)  # rango inválido: falla antes de crear directorios o el pool
+    os.makedirs(out_dir, exist_ok=True)
+    audit_dir = os.path.join(out_dir, "backfill_auditoria")
+    os.makedirs(audit_dir, exist_ok=True)
+    estado_path = os.path.join(out_dir, ESTADO_FILE)
+    estado = _cargar_estado(estado_path)
+
+    pendientes = [f for f in fechas if forzar or estado.get(f, {}).get("estado") not in ESTADOS_FINALES]
+    resultados = {f: dict(estado[f], omitida=True) for f in fechas if f not in pendientes}
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futuros = {pool.submit(procesar_fecha, f, data_dir, out_dir, umbral, audit_dir): f for f in pendientes}
+        for fut in as_completed(futuros):
+            fecha = futuros[fut]
+            try:
+                res = fut.result()
+            except Exception as e:  # el proceso murió (p. ej. OOM)
+                res = {"fecha": fecha, "estado": "ERROR", "mensaje": f"{type(e).__name__}: {e}", "resumen_file": None}
+            resultados[fecha] = res
+            estado[fecha] = res
+            _guardar_estado(estado_path, estado)  # reanudable aunque se corte a mitad
+
+    # fusión de auditorías en orden de fecha
+    paths = [os.path.join(audit_dir, f"auditoria_{f}.csv") for f in sorted(pendientes)]
+    fusionar_auditorias(paths)
+    for path in paths:
+        if os.path.exists(path):
+            os.remove(path)
+
+    ordenados = [resultados[f] for f in fechas]
+    conteo = {}
+    for r in ordenados:
+        conteo[r["estado"]] = conteo.get(r["estado"], 0) + 1
+    registrar_evento_auditoria("backfill", archivo=f"{fechas[0]}-{fechas[-1]}", registros=len(fechas),
+                               inicio=inicio, estado="OK" if "ERROR" not in conteo else "ERROR",
+                               mensaje=f"Procesadas: {len(pendientes)} omitidas: {len(fechas) - len(pendientes)} {conteo}")
+    return ordenados
+
+
+if __name__ == "__main__":
+    import argparse
+    p = argparse.ArgumentParser(description="Backfill paralelo de un rango de fechas")
+    p.add_argument("--desde", required=True, help="Fecha inicial YYYY-MM-DD")
+    p.add_argument("--hasta", required=True, help="Fecha final YYYY-MM-DD (inclusive)")
+    p.add_argument("--data", default="data", help="Directorio con polizas_/siniestros_YYYYMMDD.csv")
+    p.add_argument("--out", default="data", help="Directorio de salida")
+    p.add_argument("--workers", type=int, default=None, help="Procesos del pool (default: núcleos)")
+    p.add_argument("--umbral", type=float, default=0.10)
+    p.add_argument("--forzar", action="store_true", help="Reprocesa fechas ya completadas")
+    instrumentacion.agregar_argumento(p)
+    args = p.parse_args()
+    instrumentacion.desde_argumentos(args)
+
+    resultados = ejecutar_backfill(args.desde, args.hasta, args.data, args.out, args.workers, args.umbral, args.forzar)
+    for r in resultados:
+        sufijo = " (omitida)" if r.get("omitida") else ""
+        print(f"{r['fecha']}: {r['estado']}{sufijo} {r.get('mensaje') or ''}")
+    exit(0 if all(r["estado"] in ESTADOS_FINALES for r in resultados) else 2)
@@ -0,0 +1,190 @@
+"""
+Caché de CSVs ya parseados, compartida por validación y transformaciones.
+Guarda cada DataFrame en Feather sin comprimir (Arrow IPC, memory-mappable)
+en una carpeta `.cache_parseo/` junto a los datos. Cada entrada tiene su propio
+JSON de metadatos, así varios procesos (backfill) pueden usar la misma carpeta
+sin pisarse un índice global.
+
+Una entrada es válida si coincide la ruta + opciones de lectura y:
+- tamaño y mtime del archivo no cambiaron, o
+- cambiaron pero el hash del contenido es el mismo (p. ej. archivo re-copiado).
+"""
+import hashlib
+import json
+import os
+import time
+from datetime import datetime
+
+import pandas as pd
+import pyarrow.feather as feather
+
+from scripts.utils_auditoria import registrar_evento_auditoria
+from scripts import esquema as esquema_mod, instrumentacion
+
+CACHE_DIRNAME = ".cache_parseo"
+# tope de espacio por carpeta de caché; se desalojan las entradas menos usadas (LRU)
+CACHE_MAX_BYTES = int(os.environ.get("PIPELINE_CACHE_MAX_BYTES", 2 * 1024**3))
+CACHE_ACTIVA = os.environ.get("PIPELINE_CACHE_PARSEO", "1") != "0"
+
+ESTADISTICAS = {"hit": 0, "miss": 0}
+
+
+def hash_contenido(path, bloque=8 * 1024**2):
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(bloque), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _cache_dir(path):
+    return os.path.join(os.path.dirname(os.path.abspath(path)), CACHE_DIRNAME)
+
+
+def _meta_path(cache_dir, clave):
+    return os.path.join(cache_dir, hashlib.blake2b(clave.encode("utf-8"), digest_size=16).hexdigest() + ".json")
+
+
+def _cargar_indice(cache_dir):
+    """{clave: entrada} a partir de los JSON de metadatos de la carpeta"""
+    indice = {}
+    for nombre in os.listdir(cache_dir) if os.path.isdir(cache_dir) else []:
+        if nombre.endswith(".json"):
+            try:
+                with open(os.path.join(cache_dir, nombre), encoding="utf-8") as f:
+                    entrada = json.load(f)
+                indice[entrada["clave"]] = entrada
+            except (OSError, ValueError, KeyError):
+                continue  # escrito a medias por otro proceso o ya desalojado
+    return indice
+
+
+def _leer_entrada(cache_dir, clave):
+    try:
+        with open(_meta_path(cache_dir, clave), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _guardar_entrada(cache_dir, entrada):
+    # escritura atómica: otros procesos nunca ven metadatos a medias
+    destino = _meta_path(cache_dir, entrada["clave"])
+    tmp = f"{destino}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(entrada, f)
+    os.replace(tmp, destino)
+
+
+def _borrar_entrada(cache_dir, entrada):
+    for path in (_meta_path(cache_dir, entrada["clave"]), os.path.join(cache_dir, entrada["feather"])):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def _desalojar(cache_dir, max_bytes):
+    """Elimina entradas LRU hasta que el total quede bajo max_bytes"""
+    indice = _cargar_indice(cache_dir)
+    total = sum(e["bytes"] for e in indice.values())
+    for entrada in sorted(indice.values(), key=lambda e: e["ultimo_uso"]):
+        if total <= max_bytes:
+            break
+        _borrar_entrada(cache_dir, entrada)
+        total -= entrada["bytes"]
+
+
+def _registrar(resultado, path, registros, inicio):
+    ESTADISTICAS[resultado] += 1
+    registrar_evento_auditoria(
+        etapa="cache_parseo",
+        archivo=os.path.basename(path),
+        registros=registros,
+        inicio=inicio,
+        estado="OK",
+        mensaje=f"{resultado.upper()} (hits:{ESTADISTICAS['hit']} misses:{ESTADISTICAS['miss']})"
+    )
+
+
+def _parsear(path, esquema, read_kwargs):
+    """Con esquema se cachea la tabla Arrow tipada; sin él, el DataFrame de pd.read_csv"""
+    if esquema is not None:
+        return esquema_mod.leer_tabla(path, esquema)
+    return pd.read_csv(path, **read_kwargs)
+
+
+def _a_pandas(datos, esquema):
+    return esquema_mod.a_pandas(datos) if esquema is not None else datos
+
+
+def leer_csv(path, esquema=None, max_bytes=None, **read_kwargs):
+    """
+    Equivalente a pd.read_csv(path, **read_kwargs) (o a esquema.leer_csv si se pasa
+    un esquema) pero sirviendo desde la caché cuando el archivo no cambió.
+    El esquema y las opciones de lectura forman parte de la clave.
+    """
+    with instrumentacion.etapa("lectura", archivo=os.path.basename(path)) as medicion:
+        df = _leer_csv(path, esquema, max_bytes, read_kwargs)
+        medicion.registros = len(df)
+    return df
+
+
+def _leer_csv(path, esquema, max_bytes, read_kwargs):
+    if not CACHE_ACTIVA:
+        return _a_pandas(_parsear(path, esquema, read_kwargs), esquema)
+
+    inicio = datetime.now()
+    cache_dir = _cache_dir(path)
+    os.makedirs(cache_dir, exist_ok=True)
+
+    st = os.stat(path)
+    opciones = repr((esquema, sorted(read_kwargs.items())))
+    clave = f"{os.path.abspath(path)}|{hashlib.blake2b(opciones.encode('utf-8'), digest_size=8).hexdigest()}"
+    entrada = _leer_entrada(cache_dir, clave)
+    contenido = None
+    if entrada and (entrada["size"], entrada["mtime_ns"]) != (st.st_size, st.st_mtime_ns):
+        # stat distinto: sólo es válida si el contenido es idéntico
+        contenido = hash_contenido(path)
+        if contenido == entrada["hash"]:
+            entrada.update(size=st.st_size, mtime_ns=st.st_mtime_ns)
+        else:
+            _borrar_entrada(cache_dir, entrada)
+            entrada = None
+
+    if entrada:
+        try:
+            tabla = feather.read_table(os.path.join(cache_dir, entrada["feather"]), memory_map=True)
+            df = esquema_mod.a_pandas(tabla) if esquema is not None else tabla.to_pandas()
+            entrada["ultimo_uso"] = time.time()
+            _guardar_entrada(cache_dir, entrada)
+            _registrar("hit", path, len(df), inicio)
+            return df
+        except (OSError, ValueError):
+            _borrar_entrada(cache_dir, entrada)  # archivo de caché perdido o corrupto
+
+    datos = _parsear(path, esquema, read_kwargs)
+    df = _a_pandas(datos, esquema)
+    contenido = contenido or hash_contenido(path)
+    nombre = hashlib.blake2b(clave.encode("utf-8") + contenido.encode(), digest_size=16).hexdigest() + ".feather"
+    destino = os.path.join(cache_dir, nombre)
+    try:
+        tmp = f"{destino}.{os.getpid()}.tmp"
+        feather.write_feather(datos, tmp, compression="uncompressed")
+        os.replace(tmp, destino)
+    except (OSError, ValueError, TypeError) as e:
+        # columnas no serializables a Arrow: se usa el parseo sin cachear
+        print(f"⚠️ No se pudo cachear {path}: {e}")
+    else:
+        _guardar_entrada(cache_dir, {
+            "clave": clave,
+            "feather": nombre,
+            "size": st.st_size,
+            "mtime_ns": st.st_mtime_ns,
+            "hash": contenido,
+            "bytes": os.path.getsize(destino),
+            "ultimo_uso": time.time(),
+        })
+        _desalojar(cache_dir, CACHE_MAX_BYTES if max_bytes is None else max_bytes)
+    _registrar("miss", path, len(df), inicio)
+    return df
@@ -0,0 +1,312 @@
+"""
+Carga de `resumen_producto_diario`, `resumen_producto_microlotes` (el resumen del día
+que mantiene la ingesta por micro-lotes), los cubos (`cubo_polizas_diario`,
+`cubo_siniestros_diario`) y `auditoria_proceso` (sql/create_tables.sql).
+
+- Idempotente: cada carga reemplaza por completo las particiones que escribe
+  (process_date / DATE(fecha_proceso)), así reintentos y re-ejecuciones no duplican.
+- Destinos:
+  - "bigquery://proyecto.dataset": carga con WRITE_TRUNCATE sobre el decorador de
+    partición (tabla$YYYYMMDD); requiere google-cloud-bigquery.
+  - cualquier otra ruta: SQLite local que replica las tablas (pruebas y desarrollo
+    sin red); borrado e inserción por lotes de la partición en una transacción,
+    con índice por partición para que el costo dependa de la partición y no de la tabla.
+- Los clientes se reutilizan entre cargas del mismo proceso (`almacen`).
+"""
+import os
+import sqlite3
+import sys
+import threading
+from datetime import date, datetime
+from decimal import Decimal
+
+import pandas as pd
+
+# allow running directly
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from scripts import utils_auditoria
+from scripts.cubo import CUBO_POLIZAS, CUBO_SINIESTROS
+from scripts.cuarentena import fecha_de_archivo
+from scripts.utils_auditoria import registrar_evento_auditoria, leer_auditoria
+
+CARGA_DESTINO = os.environ.get("PIPELINE_CARGA_DESTINO", os.path.join("data", "warehouse.db"))
+PREFIJO_BIGQUERY = "bigquery://"
+LOTE_FILAS = 10_000
+
+RESUMEN = "resumen_producto_diario"
+RESUMEN_MICROLOTES = "resumen_producto_microlotes"
+AUDITORIA = utils_auditoria.TABLA_SQLITE
+
+# columnas (tipo SQLite, tipo BigQuery) y columna de partición de cada tabla
+TABLAS = {
+    RESUMEN: {
+        "columnas": {
+            "process_date": ("TEXT", "DATE"),
+            "producto": ("TEXT", "STRING"),
+            "total_polizas": ("INTEGER", "INT64"),
+            "total_siniestros": ("INTEGER", "INT64"),
+            "monto_total": ("REAL", "NUMERIC"),
+            "prima_promedio": ("REAL", "NUMERIC"),
+        },
+        "particion": "process_date",
+    },
+    CUBO_POLIZAS: {
+        "columnas": {
+            "process_date": ("TEXT", "DATE"),
+            "agrupacion": ("TEXT", "STRING"),
+            "producto": ("TEXT", "STRING"),
+            "region": ("TEXT", "STRING"),
+            "estado": ("TEXT", "STRING"),
+            "mes": ("TEXT", "DATE"),
+            "total_polizas": ("INTEGER", "INT64"),
+            "total_siniestros": ("INTEGER", "INT64"),
+            "monto_total": ("REAL", "NUMERIC"),
+            "prima_promedio": ("REAL", "NUMERIC"),
+        },
+        "particion": "process_date",
+    },
+    CUBO_SINIESTROS: {
+        "columnas": {
+            "process_date": ("TEXT", "DATE"),
+            "agrupacion": ("TEXT", "STRING"),
+            "producto": ("TEXT", "STRING"),
+            "region": ("TEXT", "STRING"),
+            "tipo_siniestro": ("TEXT", "STRING"),
+            "mes": ("TEXT", "DATE"),
+            "total_siniestros": ("INTEGER", "INT64"),
+            "monto_total": ("REAL", "NUMERIC"),
+        },
+        "particion": "process_date",
+    },
+    AUDITORIA: {
+        "columnas": {
+            "fecha_proceso": ("TEXT", "DATETIME"),
+            "etapa": ("TEXT", "STRING"),
+            "archivo": ("TEXT", "STRING"),
+            "registros": ("INTEGER", "INT64"),
+            "estado": ("TEXT", "STRING"),
+            "mensaje": ("TEXT", "STRING"),
+            "duracion_segundos": ("REAL", "FLOAT64"),
+        },
+        "particion": "fecha_proceso",  # particionada por DATE(fecha_proceso)
+    },
+}
+# el resumen de la ingesta por micro-lotes: mismas columnas y partición que el diario
+TABLAS[RESUMEN_MICROLOTES] = TABLAS[RESUMEN]
+
+
+def _particion(valor):
+    """'YYYY-MM-DD' de una fecha o fecha-hora (date, datetime, 'YYYYMMDD' o ISO)"""
+    if isinstance(valor, (date, datetime)):
+        return valor.strftime("%Y-%m-%d")
+    valor = str(valor)
+    if len(valor) == 8 and valor.isdigit():
+        return f"{valor[:4]}-{valor[4:6]}-{valor[6:]}"
+    return valor[:10]
+
+
+def particiones_de(tabla, df):
+    return sorted(df[TABLAS[tabla]["particion"]].map(_particion).unique())
+
+
+class AlmacenSQLite:
+    """Sustituto local del warehouse: una conexión por hilo, reutilizada entre cargas"""
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+
+    def _con(self):
+        con = getattr(self._local, "con", None)
+        if con is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            con = sqlite3.connect(self.path, timeout=60)
+            con.execute("PRAGMA journal_mode=WAL")
+            with con:
+                for tabla, spec in TABLAS.items():
+                    columnas = ", ".join(f"{c} {t}" for c, (t, _) in spec["columnas"].items())
+                    con.execute(f"CREATE TABLE IF NOT EXISTS {tabla} ({columnas})")
+                    con.execute(f"CREATE INDEX IF NOT EXISTS ix_{tabla}_particion "
+                                f"ON {tabla} ({self._expr(tabla)})")
+            self._local.con = con
+        return con
+
+    @staticmethod
+    def _expr(tabla):
+        return f"substr({TABLAS[tabla]['particion']}, 1, 10)"
+
+    def reemplazar_particiones(self, tabla, df):
+        """Borra e inserta las particiones presentes en `df` en una sola transacción"""
+        columnas = list(TABLAS[tabla]["columnas"])
+        particiones = particiones_de(tabla, df)
+        filas = list(df[columnas].astype(object).where(df[columnas].notna(), None).itertuples(index=False, name=None))
+        con = self._con()
+        with con:  # la partición queda entera (vieja o nueva), nunca a medias
+            con.execute(f"DELETE FROM {tabla} WHERE {self._expr(tabla)} IN ({', '.join('?' * len(particiones))})",
+                        particiones)
+            insert = f"INSERT INTO {tabla} ({', '.join(columnas)}) VALUES ({', '.join('?' * len(columnas))})"
+            for i in range(0, len(filas), LOTE_FILAS):
+                con.executemany(insert, filas[i:i + LOTE_FILAS])
+        return particiones
+
+    def leer(self, tabla, particion=None):
+        consulta, params = f"SELECT * FROM {tabla}", ()
+        if particion is not None:
+            consulta, params = f"{consulta} WHERE {self._expr(tabla)} = ?", (_particion(particion),)
+        return pd.read_sql_query(consulta, self._con(), params=params)
+
+    def cerrar(self):
+        con = getattr(self._local, "con", None)
+        if con is not None:
+            con.close()
+            self._local.con = None
+
+
+class AlmacenBigQuery:
+    """BigQuery: un cliente por proyecto; cada partición se carga con WRITE_TRUNCATE"""
+
+    def __init__(self, proyecto, dataset):
+        from google.cloud import bigquery  # opcional: sólo con destino bigquery://
+        self.bigquery = bigquery
+        self.proyecto, self.dataset = proyecto, dataset
+        self.cliente = bigquery.Client(project=proyecto)
+
+    def _config(self, tabla):
+        bq = self.bigquery
+        return bq.LoadJobConfig(
+            write_disposition=bq.WriteDisposition.WRITE_TRUNCATE,
+            schema=[bq.SchemaField(c, t) for c, (_, t) in TABLAS[tabla]["columnas"].items()],
+        )
+
+    @staticmethod
+    def _tipar(tabla, df):
+        df = df[list(TABLAS[tabla]["columnas"])].copy()
+        for c, (_, tipo) in TABLAS[tabla]["columnas"].items():
+            if tipo == "NUMERIC":
+                df[c] = df[c].map(lambda v: None if pd.isna(v) else Decimal(str(v)))
+            elif tipo == "DATE":
+                df[c] = pd.to_datetime(df[c]).dt.date
+            elif tipo == "DATETIME":
+                df[c] = pd.to_datetime(df[c])
+        return df
+
+    def reemplazar_particiones(self, tabla, df):
+        particion = df[TABLAS[tabla]["particion"]].map(_particion)
+        for p, filas in df.groupby(particion):
+            destino = f"{self.proyecto}.{self.dataset}.{tabla}${p.replace('-', '')}"
+            self.cliente.load_table_from_dataframe(self._tipar(tabla, filas), destino,
+                                                   job_config=self._config(tabla)).result()
+        return sorted(particion.unique())
+
+    def leer(self, tabla, particion=None):
+        consulta = f"SELECT * FROM `{self.proyecto}.{self.dataset}.{tabla}`"
+        if particion is not None:
+            consulta += f" WHERE DATE({TABLAS[tabla]['particion']}) = '{_particion(particion)}'"
+        return self.cliente.query(consulta).to_dataframe()
+
+    def cerrar(self):
+        self.cliente.close()
+
+
+_almacenes = {}
+_almacenes_lock = threading.Lock()
+
+
+def almacen(destino=None):
+    """Cliente del destino, reutilizado (pool por proceso)"""
+    destino = destino or CARGA_DESTINO
+    with _almacenes_lock:
+        if destino not in _almacenes:
+            if destino.startswith(PREFIJO_BIGQUERY):
+                proyecto, dataset = destino[len(PREFIJO_BIGQUERY):].split(".", 1)
+                _almacenes[destino] = AlmacenBigQuery(proyecto, dataset)
+            else:
+                _almacenes[destino] = AlmacenSQLite(os.path.abspath(destino))
+        return _almacenes[destino]
+
+
+def cerrar_almacenes():
+    with _almacenes_lock:
+        for a in _almacenes.values():
+            a.cerrar()
+        _almacenes.clear()
+
+
+def _reiniciar_en_hijo():
+    # las conexiones no se comparten entre procesos: el hijo abre las suyas
+    global _almacenes_lock
+    _almacenes_lock = threading.Lock()
+    _almacenes.clear()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reiniciar_en_hijo)
+
+
+def cargar_resumen(resumen_file, process_date=None, destino=None, tabla=RESUMEN):
+    """
+    Carga resumen_producto_<YYYYMMDD>.csv en la partición `process_date` de `tabla`
+    (por defecto la fecha del nombre del archivo). Devuelve las filas cargadas.
+    """
+    inicio = datetime.now()
+    process_date = _particion(process_date or fecha_de_archivo(resumen_file))
+    df = pd.read_csv(resumen_file)
+    df.insert(0, "process_date", process_date)
+    almacen(destino).reemplazar_particiones(tabla, df)
+    registrar_evento_auditoria("carga_resumen", archivo=os.path.basename(resumen_file), registros=len(df),
+                               inicio=inicio, estado="OK", mensaje=f"Partición {process_date} de {tabla} reemplazada")
+    return len(df)
+
+
+def cargar_cubo(cubo_file, tabla, process_date=None, destino=None):
+    """
+    Carga un cubo (Parquet de `cubo.escribir`) en la partición `process_date` de `tabla`
+    (por defecto la fecha del nombre del archivo). Devuelve las filas cargadas.
+    """
+    inicio = datetime.now()
+    process_date = _particion(process_date or fecha_de_archivo(cubo_file))
+    df = pd.read_parquet(cubo_file)
+    df.insert(0, "process_date", process_date)
+    almacen(destino).reemplazar_particiones(tabla, df)
+    registrar_evento_auditoria("carga_cubo", archivo=os.path.basename(cubo_file), registros=len(df),
+                               inicio=inicio, estado="OK", mensaje=f"Partición {process_date} de {tabla} reemplazada")
+    return len(df)
+
+
+def cargar_auditoria(fechas=None, origen=None, destino=None):
+    """
+    Carga los eventos de auditoría de `fechas` (por defecto, todas las del origen),
+    reemplazando esas particiones. Devuelve las filas cargadas.
+    """
+    inicio = datetime.now()
+    # con auditoría segmentada sólo se leen las particiones de `fechas`
+    df = leer_auditoria(origen, fechas=None if fechas is None else {_particion(f) for f in fechas})
+    if fechas is not None:
+        df = df[df["fecha_proceso"].map(_particion).isin({_particion(f) for f in fechas})]
+    if len(df):
+        particiones = almacen(destino).reemplazar_particiones(AUDITORIA, df)
+        mensaje = f"Particiones {', '.join(particiones)} reemplazadas"
+    else:
+        mensaje = "Sin eventos para cargar"
+    registrar_evento_auditoria("carga_auditoria", archivo=os.path.basename(origen or utils_auditoria.AUDITORIA_FILE),
+                               registros=len(df), inicio=inicio, estado="OK", mensaje=mensaje)
+    return len(df)
+
+
+if __name__ == "__main__":
+    import argparse
+    p = argparse.ArgumentParser(description="Carga idempotente (por partición) al warehouse")
+    p.add_argument("--resumen", help="CSV resumen_producto_YYYYMMDD.csv a cargar")
+    p.add_argument("--fecha", help="process_date (default: la del nombre del resumen)")
+    p.add_argument("--cubo", nargs=2, action="append", default=[], metavar=("TABLA", "PARQUET"),
+                   help="Cubo a cargar (cubo_polizas_diario | cubo_siniestros_diario); repetible")
+    p.add_argument("--auditoria", action="store_true", help="Carga también la auditoría de --fecha")
+    p.add_argument("--destino", default=CARGA_DESTINO, help="Ruta SQLite o bigquery://proyecto.dataset")
+    args = p.parse_args()
+    if args.resumen:
+        print(f"Resumen: {cargar_resumen(args.resumen, args.fecha, args.destino)} filas")
+    for tabla, path in args.cubo:
+        print(f"{tabla}: {cargar_cubo(path, tabla, args.fecha, args.destino)} filas")
+    if args.auditoria:
+        fechas = [args.fecha or fecha_de_archivo(args.resumen or "")]
+        print(f"Auditoría: {cargar_auditoria(fechas, destino=args.destino)} filas")
@@ -0,0 +1,159 @@
+"""
+Cuarentena de filas rechazadas por la validación.
+
+Layout en `raiz/`:
+    tabla=<polizas|siniestros>/fecha=YYYYMMDD/motivo=<regla>/<lote>.parquet
+    _manifiestos/<tabla>_<fecha>_<lote>.json
+- Cada fila va a la partición de su primera regla incumplida (bit más bajo) y
+  conserva la máscara completa en la columna `motivos`.
+- Parquet comprimido con zstd.
+- El manifiesto de cada lote guarda las reglas (orden de bit), las particiones
+  escritas y el conteo por regla (una fila cuenta en todas las que incumple):
+  `conteos` responde sólo con los manifiestos, sin releer filas.
+- Idempotente por lote (archivo de origen, o archivo + nº de chunk): un reintento
+  reemplaza los archivos del lote y corridas de lotes distintos no se pisan.
+"""
+import glob
+import json
+import os
+import re
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from scripts import entradas, esquema
+
+COLUMNA_MOTIVOS = "motivos"
+MANIFIESTOS_DIR = "_manifiestos"
+SIN_MOTIVO = "sin_motivo"
+COMPRESION = "zstd"
+
+
+def fecha_de_archivo(path):
+    """YYYYMMDD del nombre del archivo de origen (polizas_20251027.csv); hoy si no tiene"""
+    m = re.search(r"(\d{8})", os.path.basename(path))
+    return m.group(1) if m else datetime.now().strftime("%Y%m%d")
+
+
+def lote_de_archivo(path, parte=None):
+    base = entradas.nombre_base(path)
+    return base if parte is None else f"{base}-{parte:05d}"
+
+
+def _manifiesto_path(raiz, tabla, fecha, lote):
+    return os.path.join(raiz, MANIFIESTOS_DIR, f"{tabla}_{fecha}_{lote}.json")
+
+
+def _escribir_atomico(path, escribir):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    escribir(tmp)
+    os.replace(tmp, path)
+
+
+def _motivo_primario(motivos):
+    """Índice del bit más bajo encendido de cada máscara (-1 si no hay)"""
+    motivos = motivos.astype(np.int64)
+    aislado = motivos & -motivos
+    primario = np.full(len(motivos), -1, dtype=np.int64)
+    con = aislado > 0
+    primario[con] = np.log2(aislado[con]).astype(np.int64)
+    return primario
+
+
+def guardar(raiz, tabla, invalidos, reglas, fecha, lote):
+    """
+    Escribe las filas rechazadas `invalidos` (con columna `motivos`) del lote y devuelve
+    su manifiesto. `reglas` son los nombres en orden de bit.
+    """
+    motivos = invalidos[COLUMNA_MOTIVOS].to_numpy(dtype=np.uint32)
+    primario = _motivo_primario(motivos)
+    previo = leer_manifiesto(raiz, tabla, fecha, lote)
+
+    particiones = {}
+    for codigo in np.unique(primario):
+        regla = reglas[codigo] if codigo >= 0 else SIN_MOTIVO
+        rel = os.path.join(f"tabla={tabla}", f"fecha={fecha}", f"motivo={regla}", f"{lote}.parquet")
+        filas = invalidos[primario == codigo]
+        tabla_arrow = pa.Table.from_pandas(filas, preserve_index=False)
+        _escribir_atomico(os.path.join(raiz, rel),
+                          lambda tmp: pq.write_table(tabla_arrow, tmp, compression=COMPRESION))
+        particiones[regla] = {"archivo": rel, "filas": len(filas)}
+
+    # un reintento con menos motivos no deja particiones viejas del mismo lote
+    for regla, part in (previo or {}).get("particiones", {}).items():
+        if regla not in particiones:
+            try:
+                os.remove(os.path.join(raiz, part["archivo"]))
+            except OSError:
+                pass
+
+    manifiesto = {
+        "tabla": tabla,
+        "fecha": fecha,
+        "lote": lote,
+        "reglas": list(reglas),
+        "filas": len(invalidos),
+        "particiones": particiones,
+        "conteos": esquema.conteo_por_regla(motivos, reglas),
+        "creado": datetime.now().isoformat(timespec="seconds"),
+    }
+
+    def escribir(tmp):
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(manifiesto, f, indent=2)
+    _escribir_atomico(_manifiesto_path(raiz, tabla, fecha, lote), escribir)
+    return manifiesto
+
+
+def leer_manifiesto(raiz, tabla, fecha, lote):
+    try:
+        with open(_manifiesto_path(raiz, tabla, fecha, lote), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def manifiestos(raiz, tabla=None, fecha=None):
+    patron = f"{tabla or '*'}_{fecha or '*'}_*.json"
+    res = []
+    for path in sorted(glob.glob(os.path.join(raiz, MANIFIESTOS_DIR, patron))):
+        try:
+            with open(path, encoding="utf-8") as f:
+                m = json.load(f)
+        except (OSError, ValueError):
+            continue  # escrito a medias
+        # el glob de tabla/fecha puede cruzar '_' de los nombres de lote
+        if (tabla is None or m["tabla"] == tabla) and (fecha is None or m["fecha"] == fecha):
+            res.append(m)
+    return res
+
+
+def conteos(raiz, tabla=None, fecha=None):
+    """{regla: filas que la incumplen} sumando los manifiestos (no lee filas)"""
+    total = {}
+    for m in manifiestos(raiz, tabla, fecha):
+        for regla, n in m["conteos"].items():
+            total[regla] = total.get(regla, 0) + n
+    return total
+
+
+def leer(raiz, tabla, fecha=None, motivo=None):
+    """
+    Filas en cuarentena de la tabla (y fecha). Con `motivo`, las que incumplen esa
+    regla aunque no sea la primera (filtra por la máscara de bits).
+    """
+    partes = []
+    for m in manifiestos(raiz, tabla, fecha):
+        for part in m["particiones"].values():
+            df = esquema.a_pandas(pq.read_table(os.path.join(raiz, part["archivo"])))
+            if motivo is not None:
+                if motivo not in m["reglas"]:
+                    continue
+                bit = np.uint32(1 << m["reglas"].index(motivo))
+                df = df[(df[COLUMNA_MOTIVOS].to_numpy(dtype=np.uint32) & bit) > 0]
+            partes.append(df)
+    return pd.concat(partes, ignore_index=True) if partes else pd.DataFrame()
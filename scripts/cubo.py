@@ -0,0 +1,249 @@
+"""
+Cubo de resúmenes por dimensiones (grouping sets) en una sola pasada.
+
+Dos tablas, ambas con todas las combinaciones (CUBE) de sus dimensiones:
+- cubo_polizas_diario: producto × region × estado (de la póliza) × mes de fecha_inicio;
+  mismas medidas que el resumen por producto (siniestros proyectados sobre las
+  pólizas como en el left merge), así el grupo `producto` coincide con
+  resumen_producto_YYYYMMDD.csv.
+- cubo_siniestros_diario: producto × region (de la póliza) × tipo_siniestro × mes de
+  fecha_siniestro; total_siniestros y monto_total. Un siniestro toma las dimensiones
+  de la primera póliza con su poliza_id (nulas si no hay).
+
+Cada dimensión se factoriza una vez; las filas se agregan a la celda más fina
+(códigos combinados en radix mixto) con un único groupby y cada grouping set se
+arma desde esas celdas, que son pocas: los archivos crudos se recorren una vez.
+`agrupacion` indica el grouping set de la fila ("producto+region", ..., "total");
+las dimensiones fuera del grupo quedan nulas. `mes` es el primer día del mes (YYYY-MM-01).
+
+Salida particionada junto al resumen (Parquet zstd, como la cuarentena):
+    <out_dir>/cubos/tabla=<tabla>/fecha=YYYYMMDD/<tabla>_YYYYMMDD.parquet
+"""
+import itertools
+import os
+import sys
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# allow running directly
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from scripts import esquema, instrumentacion
+from scripts.transformaciones import a_centavos, codigos_poliza, motor, proyectar_siniestros
+from scripts.utils_auditoria import registrar_evento_auditoria
+
+CUBO_POLIZAS = "cubo_polizas_diario"
+CUBO_SINIESTROS = "cubo_siniestros_diario"
+DIMENSIONES = {
+    CUBO_POLIZAS: ("producto", "region", "estado", "mes"),
+    CUBO_SINIESTROS: ("producto", "region", "tipo_siniestro", "mes"),
+}
+MEDIDAS = {
+    CUBO_POLIZAS: ("total_polizas", "total_siniestros", "monto_total", "prima_promedio"),
+    CUBO_SINIESTROS: ("total_siniestros", "monto_total"),
+}
+CUBOS_DIR = "cubos"
+TOTAL = "total"
+COMPRESION = "zstd"
+
+
+def grupos(dimensiones):
+    """Todos los grouping sets (CUBE) de las dimensiones, del más agregado al más fino"""
+    return [g for r in range(len(dimensiones) + 1) for g in itertools.combinations(dimensiones, r)]
+
+
+def agrupacion(grupo):
+    return "+".join(grupo) or TOTAL
+
+
+def _dimension(s):
+    """Serie -> (códigos int64, etiquetas str/None por código); nulo es un valor más"""
+    codigos, valores = pd.factorize(s, use_na_sentinel=False)
+    etiquetas = np.array([None if pd.isna(v) else str(v) for v in valores], dtype=object)
+    return codigos.astype(np.int64, copy=False), etiquetas
+
+
+def _mes(s):
+    """Fechas -> (códigos, 'YYYY-MM-01') del mes; no fechas -> nulo"""
+    if not pd.api.types.is_datetime64_any_dtype(s):
+        s = pd.to_datetime(s, format="%Y-%m-%d", errors="coerce")
+    meses = s.to_numpy(dtype="datetime64[ns]").astype("datetime64[M]").astype("datetime64[ns]")
+    codigos, valores = pd.factorize(meses, use_na_sentinel=False)
+    etiquetas = np.array([None if pd.isna(v) else str(v)[:10] for v in valores], dtype=object)
+    return codigos.astype(np.int64, copy=False), etiquetas
+
+
+def _de_poliza(dim, fila):
+    """Dimensión de pólizas llevada a siniestros por `fila` (-1: sin póliza -> nulo)"""
+    codigos, etiquetas = dim
+    sin_poliza = len(etiquetas)
+    return np.where(fila >= 0, codigos[np.maximum(fila, 0)], sin_poliza), np.append(etiquetas, None)
+
+
+def _celdas(dims):
+    """
+    {dimensión: (códigos, etiquetas)} -> (celda por fila 0..k-1, códigos por dimensión de
+    cada celda, forma): la celda combina los códigos en radix mixto
+    """
+    forma = tuple(len(e) for _, e in dims.values())
+    combinada = np.ravel_multi_index([c for c, _ in dims.values()], forma)
+    celda, usadas = pd.factorize(combinada)
+    return celda, np.unravel_index(usadas, forma), forma
+
+
+def _rollup(dims, partes, forma, sumas, distintas=None):
+    """
+    Un DataFrame con todos los grouping sets a partir de las sumas por celda.
+    `distintas`: (celda, código, nº de códigos) de los pares celda-póliza únicos, para
+    contar pólizas distintas por grupo.
+    """
+    nombres = list(dims)
+    aditivo = False
+    if distintas is not None:
+        celdas_pol, cod_pol, base = distintas
+        # cada póliza en una sola celda (lo normal): las distintas se suman como las demás medidas
+        aditivo = len(pd.unique(cod_pol)) == len(cod_pol)
+        if aditivo:
+            sumas = sumas.assign(total_polizas=np.bincount(celdas_pol, minlength=len(sumas)))
+    salidas = []
+    for grupo in grupos(nombres):
+        idx = [nombres.index(d) for d in grupo]
+        forma_grupo = [forma[i] for i in idx]
+        if idx:
+            clave = np.ravel_multi_index([partes[i] for i in idx], forma_grupo)
+        else:
+            clave = np.zeros(len(sumas), dtype=np.int64)
+        g, claves = pd.factorize(clave, sort=True)
+        agg = sumas.groupby(pd.Index(g)).sum()
+        out = pd.DataFrame({"agrupacion": agrupacion(grupo)}, index=agg.index)
+        codigos_grupo = np.unravel_index(claves, forma_grupo) if idx else ()
+        for d in nombres:
+            out[d] = dims[d][1][codigos_grupo[grupo.index(d)]] if d in grupo else None
+        if distintas is not None and not aditivo:
+            # pares (grupo, póliza) sin repetir: una póliza en varias celdas del grupo cuenta una vez
+            pares = pd.unique(g[celdas_pol].astype(np.int64) * base + cod_pol)
+            out["total_polizas"] = np.bincount(pares // base, minlength=len(agg))
+        salidas.append(pd.concat([out, agg], axis=1))
+    return pd.concat(salidas, ignore_index=True)
+
+
+def cubo_polizas(polizas_df, siniestros_df, codigos=None):
+    """
+    Grouping sets de producto × region × estado × mes(fecha_inicio) con las medidas del resumen.
+    `codigos`: los de `codigos_poliza` si ya se calcularon (se comparten entre ambos cubos).
+    """
+    cod_pol, cod_sin, n, nulo = codigos or codigos_poliza(polizas_df["poliza_id"], siniestros_df["poliza_id"])
+    c, m, w = proyectar_siniestros(siniestros_df, cod_pol, cod_sin, n)
+    dims = {
+        "producto": _dimension(polizas_df["producto"]),
+        "region": _dimension(polizas_df["region"]),
+        "estado": _dimension(polizas_df["estado"]),
+        "mes": _mes(polizas_df["fecha_inicio"]),
+    }
+    celda, partes, forma = _celdas(dims)
+    sumas = pd.DataFrame({
+        "total_siniestros": c.astype(np.int64),
+        "monto_cent": m,
+        "prima_cent": a_centavos(polizas_df["prima_mensual"]) * w,
+        "filas": w,
+    }).groupby(pd.Index(celda)).sum()
+    # pólizas distintas: pares (celda, poliza_id) únicos, sin la clave nula (como nunique)
+    no_nulo = cod_pol != nulo
+    pares = pd.unique(celda[no_nulo].astype(np.int64) * n + cod_pol[no_nulo])
+    cubo = _rollup(dims, partes, forma, sumas, distintas=(pares // n, pares % n, n))
+    cubo["monto_total"] = cubo.pop("monto_cent").to_numpy(dtype=np.int64) / 100
+    cubo["prima_promedio"] = (cubo.pop("prima_cent").to_numpy(dtype=np.int64)
+                              / cubo.pop("filas").to_numpy(dtype=np.int64) / 100).round(2)
+    return _ordenar(cubo, CUBO_POLIZAS)
+
+
+def cubo_siniestros(polizas_df, siniestros_df, codigos=None):
+    """Grouping sets de producto × region × tipo_siniestro × mes(fecha_siniestro)"""
+    cod_pol, cod_sin, n, _ = codigos or codigos_poliza(polizas_df["poliza_id"], siniestros_df["poliza_id"])
+    # fila de la primera póliza de cada clave (recorrido inverso: gana la primera escritura)
+    primera = np.full(n, -1, dtype=np.int64)
+    primera[cod_pol[::-1]] = np.arange(len(cod_pol) - 1, -1, -1)
+    fila = primera[cod_sin]
+    dims = {
+        "producto": _de_poliza(_dimension(polizas_df["producto"]), fila),
+        "region": _de_poliza(_dimension(polizas_df["region"]), fila),
+        "tipo_siniestro": _dimension(siniestros_df["tipo_siniestro"]),
+        "mes": _mes(siniestros_df["fecha_siniestro"]),
+    }
+    celda, partes, forma = _celdas(dims)
+    sumas = pd.DataFrame({
+        "total_siniestros": siniestros_df["siniestro_id"].notna().to_numpy(dtype=np.int64),
+        "monto_cent": a_centavos(siniestros_df["monto_reclamado"]),
+    }).groupby(pd.Index(celda)).sum()
+    cubo = _rollup(dims, partes, forma, sumas)
+    cubo["monto_total"] = cubo.pop("monto_cent").to_numpy(dtype=np.int64) / 100
+    return _ordenar(cubo, CUBO_SINIESTROS)
+
+
+def _ordenar(cubo, tabla):
+    columnas = ["agrupacion", *DIMENSIONES[tabla], *MEDIDAS[tabla]]
+    for d in DIMENSIONES[tabla]:  # las etiquetas pueden venir vacías en todo un grupo
+        cubo[d] = cubo[d].astype(object)
+    return cubo[columnas].sort_values(list(columnas[:len(DIMENSIONES[tabla]) + 1]), na_position="first",
+                                      ignore_index=True)
+
+
+def calcular(polizas_df, siniestros_df):
+    """{tabla: DataFrame del cubo}"""
+    with instrumentacion.etapa("codigos_poliza", registros=len(polizas_df) + len(siniestros_df)):
+        codigos = codigos_poliza(polizas_df["poliza_id"], siniestros_df["poliza_id"])
+    with instrumentacion.etapa("cubo_polizas", registros=len(polizas_df)):
+        polizas = cubo_polizas(polizas_df, siniestros_df, codigos)
+    with instrumentacion.etapa("cubo_siniestros", registros=len(siniestros_df)):
+        siniestros = cubo_siniestros(polizas_df, siniestros_df, codigos)
+    return {CUBO_POLIZAS: polizas, CUBO_SINIESTROS: siniestros}
+
+
+def ruta(out_dir, tabla, fecha_tag):
+    return os.path.join(out_dir, CUBOS_DIR, f"tabla={tabla}", f"fecha={fecha_tag}", f"{tabla}_{fecha_tag}.parquet")
+
+
+def escribir(cubos, out_dir, fecha_tag):
+    """Escribe cada cubo en su partición (atómico: un reintento la reemplaza); {tabla: ruta}"""
+    rutas = {}
+    for tabla, df in cubos.items():
+        path = ruta(out_dir, tabla, fecha_tag)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        pq.write_table(pa.Table.from_pandas(df, preserve_index=False), tmp, compression=COMPRESION)
+        os.replace(tmp, path)
+        rutas[tabla] = path
+    return rutas
+
+
+def leer(path):
+    return pq.read_table(path).to_pandas()
+
+
+def main(pol_path, sin_path, out_dir="data", fecha_tag=None):
+    """Calcula y escribe los cubos del día desde los archivos (CSV o .arrow de filas válidas)"""
+    inicio = datetime.now()
+    fecha_tag = fecha_tag or inicio.strftime("%Y%m%d")
+    leer_tabla, _ = motor("pandas")
+    (pol, _), (sin, _) = leer_tabla(pol_path, esquema.POLIZAS), leer_tabla(sin_path, esquema.SINIESTROS)
+    rutas = escribir(calcular(pol, sin), out_dir, fecha_tag)
+    registrar_evento_auditoria("cubos", archivo=os.path.basename(pol_path), registros=len(pol) + len(sin),
+                               inicio=inicio, estado="OK", mensaje=f"Cubos {', '.join(rutas)} ({fecha_tag})")
+    return rutas
+
+
+if __name__ == "__main__":
+    import argparse
+    p = argparse.ArgumentParser(description="Cubo de resúmenes (grouping sets) por producto, región, estado y mes")
+    p.add_argument("--pol", required=True, help="Ruta del archivo de pólizas")
+    p.add_argument("--sin", required=True, help="Ruta del archivo de siniestros")
+    p.add_argument("--out", default="data", help="Directorio de salida")
+    p.add_argument("--fecha", default=None, help="YYYYMMDD de la partición (default: hoy)")
+    instrumentacion.agregar_argumento(p)
+    args = p.parse_args()
+    instrumentacion.desde_argumentos(args)
+    for tabla, path in main(args.pol, args.sin, args.out, args.fecha).items():
+        print(f"{tabla}: {path}")
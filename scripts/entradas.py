@@ -0,0 +1,137 @@
+"""
+Entradas diarias comprimidas y/o partidas en varios archivos.
+
+Donde el pipeline recibe un CSV también acepta:
+- un CSV comprimido: polizas_20251027.csv.gz / .csv.zst
+- un patrón de partes (glob), cada una con su encabezado: polizas_20251027-*.csv.gz
+  (el orden de las filas es el de las partes ordenadas por nombre)
+
+Las partes se descomprimen y parsean en paralelo en un pool de hilos: Arrow suelta el
+GIL al descomprimir y al parsear, así no hace falta copiar tablas entre procesos. Cada
+parte se descomprime a un único buffer que el lector CSV consume sin copiarlo, y las
+tablas se concatenan como chunks (sin copia). Se audita por lectura (etapa
+`lectura_partes`) las partes, los bytes leídos de disco, los descomprimidos y el ratio.
+
+Un archivo compuesto no pasa por la caché de parseo (la clave es por archivo) ni por
+los caminos que necesitan acceso aleatorio a los bytes (muestreo, validación por tramos).
+"""
+import glob
+import os
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pacsv
+
+from scripts import esquema, instrumentacion
+from scripts.utils_auditoria import registrar_evento_auditoria
+
+# extensión -> códec de Arrow
+COMPRESIONES = {".gz": "gzip", ".zst": "zstd"}
+EXTENSIONES = {codec: ext for ext, codec in COMPRESIONES.items()}
+# hilos de lectura de partes; por defecto, los núcleos
+LECTURA_WORKERS = int(os.environ.get("PIPELINE_LECTURA_WORKERS", os.cpu_count() or 1))
+
+
+def compresion_de(path):
+    """Códec de Arrow según la extensión (None si es un CSV plano)"""
+    return COMPRESIONES.get(os.path.splitext(str(path))[1])
+
+
+def es_compuesta(path):
+    """True si `path` es un patrón de partes o un CSV comprimido"""
+    return glob.has_magic(str(path)) or compresion_de(path) is not None
+
+
+def partes(patron):
+    """Archivos del patrón ordenados por nombre ([patron] si no es un glob y existe)"""
+    if glob.has_magic(patron):
+        return sorted(p for p in glob.glob(patron) if not p.endswith(".tmp"))
+    return [patron] if os.path.exists(patron) else []
+
+
+def nombre_base(path):
+    """
+    Nombre sin directorio, compresión ni .csv; en un patrón, sin la parte variable:
+    polizas_20251027-*.csv.gz -> polizas_20251027
+    """
+    base = os.path.basename(str(path))
+    if compresion_de(base):
+        base = os.path.splitext(base)[0]
+    base = os.path.splitext(base)[0]
+    if glob.has_magic(base):
+        base = base[:min(base.find(c) for c in "*?[" if c in base)].rstrip("-_.")
+    return base
+
+
+def buscar(directorio, tabla, fecha):
+    """
+    Entrada del día en `directorio`: el CSV plano, el comprimido o el patrón de sus partes
+    (<tabla>_<fecha>-*.csv[.gz|.zst]); None si no llegó.
+    """
+    for ext in ("", *COMPRESIONES):
+        path = os.path.join(directorio, f"{tabla}_{fecha}.csv{ext}")
+        if os.path.exists(path):
+            return path
+        patron = os.path.join(directorio, f"{tabla}_{fecha}-*.csv{ext}")
+        if partes(patron):
+            return patron
+    return None
+
+
+def _leer_parte(path, esq):
+    """(tabla Arrow, bytes en disco, bytes descomprimidos) de una parte"""
+    with pa.input_stream(path, compression=compresion_de(path)) as f:
+        contenido = f.read_buffer()
+    try:
+        tabla = pacsv.read_csv(pa.BufferReader(contenido), convert_options=esquema.opciones_lectura(esq))
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        tabla = esquema.leer_tabla(contenido.to_pybytes(), esq)  # valores no convertibles: relectura sin tipos
+    return tabla, os.path.getsize(path), contenido.size
+
+
+def _concatenar(tablas, esq):
+    """Concatena sin copia si todas las partes tienen el mismo esquema; si no, vía pandas"""
+    if all(t.schema == tablas[0].schema for t in tablas):
+        return pa.concat_tables(tablas)
+    df = pd.concat([esquema.a_pandas(t) for t in tablas], ignore_index=True)
+    return pa.Table.from_pandas(esquema.aplicar_tipos(df, esq), preserve_index=False)
+
+
+def leer_tabla(patron, esq, workers=None):
+    """Tabla Arrow tipada con las filas de todas las partes de `patron` (ver esquema.leer_tabla)"""
+    inicio = datetime.now()
+    archivos = partes(patron)
+    if not archivos:
+        raise FileNotFoundError(f"No hay archivos para {patron}")
+    workers = max(1, min(workers or LECTURA_WORKERS, len(archivos)))
+    with instrumentacion.etapa("lectura_partes", archivo=os.path.basename(patron)) as medicion:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            leidas = list(pool.map(lambda p: _leer_parte(p, esq), archivos))
+        tabla = _concatenar([t for t, _, _ in leidas], esq)
+        medicion.registros = tabla.num_rows
+    en_disco = sum(b for _, b, _ in leidas)
+    descomprimidos = sum(d for _, _, d in leidas)
+    registrar_evento_auditoria(
+        etapa="lectura_partes",
+        archivo=os.path.basename(patron),
+        registros=tabla.num_rows,
+        inicio=inicio,
+        estado="OK",
+        mensaje=f"Partes: {len(archivos)}; bytes leídos: {en_disco}; descomprimidos: {descomprimidos}; "
+                f"ratio: {descomprimidos / max(1, en_disco):.2f}; hilos: {workers}"
+    )
+    return tabla
+
+
+def leer_csv(patron, esq, workers=None):
+    """DataFrame tipado según el esquema con las filas de todas las partes"""
+    return esquema.a_pandas(leer_tabla(patron, esq, workers))
+
+
+def leer_csv_chunks(patron, esq, chunksize):
+    """`esquema.leer_csv_chunks` parte por parte, descomprimiendo en streaming (memoria acotada)"""
+    for path in partes(patron):
+        with pa.input_stream(path, compression=compresion_de(path)) as f:
+            yield from esquema.leer_csv_chunks(f, esq, chunksize)
@@ -0,0 +1,243 @@
+"""
+Esquema declarativo de los CSV de entrada.
+Cada columna declara tipo, dominio de categorías y nulabilidad; de aquí salen
+los dtypes de `read_csv` (la coerción ocurre una sola vez, al parsear) y las
+máscaras de validación de `validacion.py`.
+"""
+import io
+import os
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pacsv
+import pyarrow.feather as feather
+
+from scripts import instrumentacion
+
+# tipo declarado -> tipo Arrow al parsear
+TIPOS_ARROW = {
+    "texto": pa.string(),
+    "entero": pa.int32(),
+    "decimal": pa.float64(),
+    "categoria": pa.dictionary(pa.int32(), pa.string()),
+    "fecha": pa.date32(),
+}
+
+# tipo declarado -> dtype pandas (lecturas por chunks / coerción de DataFrames)
+DTYPES = {
+    "texto": "string[pyarrow]",
+    "entero": "Int32",
+    "decimal": "float64",
+    "categoria": "category",
+}
+
+# Arrow -> pandas: strings siguen respaldados por Arrow y enteros con nulos no pasan a float
+_MAPEO_PANDAS = {
+    pa.string(): pd.StringDtype("pyarrow"),
+    pa.large_string(): pd.StringDtype("pyarrow"),
+    pa.int32(): pd.Int32Dtype(),
+}
+
+
+@dataclass(frozen=True)
+class Columna:
+    nombre: str
+    tipo: str                 # texto | entero | decimal | categoria | fecha
+    nulable: bool = True
+    categorias: tuple = ()    # dominio permitido (sólo tipo categoria)
+    positivo: bool = False    # regla de validación: valor > 0
+
+
+POLIZAS = (
+    Columna("poliza_id", "texto", nulable=False),
+    Columna("cliente_id", "entero"),
+    Columna("producto", "categoria", categorias=("AUTO", "VIDA", "HOGAR")),
+    Columna("suma_asegurada", "decimal", nulable=False, positivo=True),
+    Columna("prima_mensual", "decimal", nulable=False, positivo=True),
+    Columna("fecha_inicio", "fecha"),
+    Columna("estado", "categoria", categorias=("ACTIVA", "CANCELADA")),
+    Columna("region", "categoria", categorias=("CDMX", "GDL", "MTY")),
+)
+
+SINIESTROS = (
+    Columna("siniestro_id", "texto", nulable=False),
+    Columna("poliza_id", "texto", nulable=False),
+    Columna("fecha_siniestro", "fecha"),
+    Columna("tipo_siniestro", "categoria", categorias=("CHOQUE", "ROBO", "INCENDIO")),
+    Columna("monto_reclamado", "decimal", nulable=False, positivo=True),
+    Columna("estado", "categoria", categorias=("PENDIENTE", "APROBADO", "RECHAZADO")),
+)
+
+
+def columnas(esquema):
+    return [c.nombre for c in esquema]
+
+
+def opciones_lectura(esquema):
+    """ConvertOptions del lector CSV de Arrow: tipos compactos, vacío -> nulo"""
+    return pacsv.ConvertOptions(
+        column_types={c.nombre: TIPOS_ARROW[c.tipo] for c in esquema},
+        strings_can_be_null=True,
+    )
+
+
+def numerico(s):
+    """Columna numérica; sólo coerciona si no llegó tipada desde el parseo"""
+    return s if pd.api.types.is_numeric_dtype(s) else pd.to_numeric(s, errors="coerce")
+
+
+def aplicar_tipos(df, esquema):
+    """Coerción vectorizada al esquema (para lecturas sin dtype o con datos sucios)"""
+    for c in esquema:
+        if c.nombre not in df.columns:
+            continue
+        s = df[c.nombre]
+        if c.tipo == "texto":
+            df[c.nombre] = s.astype(DTYPES["texto"])
+        elif c.tipo == "decimal":
+            df[c.nombre] = numerico(s).astype("float64")
+        elif c.tipo == "entero":
+            s = numerico(s)
+            # enteros con decimales se dejan como float en vez de truncarlos
+            if s.dropna().mod(1).eq(0).all():
+                df[c.nombre] = s.astype(DTYPES["entero"])
+            else:
+                df[c.nombre] = s
+        elif c.tipo == "categoria":
+            df[c.nombre] = s.astype("category")
+        elif c.tipo == "fecha":
+            df[c.nombre] = pd.to_datetime(s, format="%Y-%m-%d", errors="coerce")
+    return df
+
+
+def leer_tabla(path, esquema):
+    """
+    Parsea el CSV directo a una tabla Arrow tipada según el esquema (multihilo).
+    Si algún valor no es convertible (p. ej. un monto 'abc'), relee sin tipos y
+    coerciona: el valor queda nulo y la validación rechaza la fila, igual que antes.
+    `path` también puede ser el contenido del CSV en bytes (p. ej. una muestra de filas).
+    """
+    fuente = (lambda: io.BytesIO(path)) if isinstance(path, bytes) else (lambda: path)
+    try:
+        return pacsv.read_csv(fuente(), convert_options=opciones_lectura(esquema))
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        df = aplicar_tipos(pd.read_csv(fuente(), dtype=str), esquema)
+        return pa.Table.from_pandas(df, preserve_index=False)
+
+
+def a_pandas(tabla):
+    return tabla.to_pandas(types_mapper=_MAPEO_PANDAS.get, date_as_object=False, ignore_metadata=True)
+
+
+def leer_csv(path, esquema):
+    """DataFrame tipado según el esquema (ver `leer_tabla`)"""
+    return a_pandas(leer_tabla(path, esquema))
+
+
+# extensión de las tablas Arrow IPC (Feather v2 sin comprimir) que pasan de validación a transformación
+EXTENSION_ARROW = ".arrow"
+
+
+def es_arrow(path):
+    return str(path).endswith(EXTENSION_ARROW)
+
+
+def escribir_arrow(df, path):
+    """Guarda el DataFrame como Arrow IPC sin comprimir (memory-mappable); escritura atómica"""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    feather.write_feather(pa.Table.from_pandas(df, preserve_index=False), tmp, compression="uncompressed")
+    os.replace(tmp, path)
+    return path
+
+
+def leer_arrow(path):
+    """DataFrame de una tabla de `escribir_arrow`, mapeada en memoria (sin parseo)"""
+    return a_pandas(feather.read_table(path, memory_map=True))
+
+
+def leer_csv_chunks(path, esquema, chunksize):
+    """Lectura por chunks: texto/categorías tipados al parsear, numéricos coercionados por chunk"""
+    seguros = {c.nombre: DTYPES[c.tipo] for c in esquema if c.tipo in ("texto", "categoria")}
+    for chunk in pd.read_csv(path, dtype=seguros, chunksize=chunksize):
+        yield aplicar_tipos(chunk, esquema)
+
+
+def _no_vacio(s):
+    if not isinstance(s.dtype, pd.StringDtype):
+        s = s.astype("string")
+    return (s.str.len() > 0).to_numpy(dtype=bool, na_value=False)
+
+
+def pertenece(s, valores):
+    """
+    isin vectorizado como numpy bool. Para columnas string[pyarrow] usa el hash
+    set de Arrow: el isin de pandas 2.2 sobre ArrowStringArray es órdenes más lento.
+    """
+    if isinstance(s.dtype, pd.StringDtype) and s.dtype.storage == "pyarrow":
+        if not isinstance(valores, (pa.Array, pa.ChunkedArray)):
+            valores = pa.array(list(valores), type=pa.string())
+        return pc.is_in(pa.array(s.array), value_set=valores).fill_null(False).to_numpy(zero_copy_only=False)
+    return s.isin(valores).to_numpy(dtype=bool)
+
+
+def reglas(esquema):
+    """Nombres de las reglas de validación del esquema, en orden de bit (ver `motivos_rechazo`)"""
+    nombres = []
+    for c in esquema:
+        if not c.nulable:
+            nombres.append(f"{c.nombre}_vacio")
+        if c.positivo:
+            nombres.append(f"{c.nombre}_no_positivo")
+        if c.categorias:
+            nombres.append(f"{c.nombre}_fuera_de_dominio")
+    return nombres
+
+
+def motivos_rechazo(df, esquema):
+    """
+    Máscara de bits (numpy uint32) por fila con las reglas que incumple; 0 = válida.
+    El bit i corresponde a reglas(esquema)[i]:
+    - no nulables: presentes y no vacíos
+    - positivos: numéricos y > 0
+    - categorías: dentro del dominio (o nulas si la columna es nulable)
+    """
+    motivos = np.zeros(len(df), dtype=np.uint32)
+    n = len(df)
+    bit = 0
+    for c in esquema:
+        s = df[c.nombre]
+        if not c.nulable:
+            with instrumentacion.etapa(f"regla_no_nulo_{c.nombre}", registros=n):
+                ok = _no_vacio(s) if c.tipo == "texto" else s.notna().to_numpy()
+                motivos |= (~ok).astype(np.uint32) << bit
+            bit += 1
+        if c.positivo:
+            with instrumentacion.etapa(f"regla_positivo_{c.nombre}", registros=n):
+                ok = (numerico(s) > 0).to_numpy(dtype=bool, na_value=False)
+                motivos |= (~ok).astype(np.uint32) << bit
+            bit += 1
+        if c.categorias:
+            with instrumentacion.etapa(f"regla_categoria_{c.nombre}", registros=n):
+                ok = (s.isin(c.categorias) | s.isna()).to_numpy(dtype=bool)
+                motivos |= (~ok).astype(np.uint32) << bit
+            bit += 1
+    return motivos
+
+
+def mascara_validos(df, esquema):
+    """Máscara booleana (numpy) de filas que cumplen todas las reglas del esquema"""
+    return motivos_rechazo(df, esquema) == 0
+
+
+def conteo_por_regla(motivos, nombres):
+    """{regla: nº de filas que la incumplen} a partir de la máscara de bits"""
+    return {nombre: int(np.count_nonzero(motivos & np.uint32(1 << i))) for i, nombre in enumerate(nombres)}
+
+
+def decodificar(motivo, nombres):
+    """Máscara de una fila -> lista de reglas incumplidas"""
+    return [nombre for i, nombre in enumerate(nombres) if int(motivo) >> i & 1]
@@ -0,0 +1,243 @@
+"""
+Detección de IDs duplicados entre días (poliza_id, siniestro_id) sin releer el historial.
+
+Layout en `historial_dir/<entidad>/`:
+    bloom.npy           filtro de Bloom por bloques (uint64, memory-mapped)
+    filtro.json         parámetros (bloques, k, capacidad), IDs insertados por fecha y en total
+    .lock               lock de escritura (fcntl) que toma `registrar`
+    fecha=YYYYMMDD/     IndiceIds de los IDs del día (.npy mapeables): confirmación exacta
+
+- Filtro de Bloom por bloques de 512 bits (una línea de caché): cada ID cae en un
+  bloque y enciende k bits dentro de él, así sondear es una lectura por ID y todo
+  se hace vectorizado por bloques de filas. El archivo se dimensiona por capacidad
+  y tasa de falsos positivos (CAPACIDAD, FPR): la memoria no crece con el historial.
+- Sólo los candidatos del filtro (duplicados reales + ~FPR falsos positivos) se
+  confirman buscando en los índices diarios mapeados de fechas anteriores.
+- `registrar` se llama tras una corrida exitosa; re-registrar una fecha reemplaza su
+  índice exacto y su conteo (los bits viejos del filtro sólo pueden sumar falsos
+  positivos, que la confirmación descarta).
+- Concurrencia: `registrar` toma un lock exclusivo del directorio de la entidad durante
+  toda la actualización (bits, índice y metadata), así dos corridas (workers del
+  backfill, DAG diario y micro-lotes) no pisan los bits ni los conteos de la otra:
+  perder bits daría falsos negativos.
+"""
+import json
+import os
+import shutil
+from contextlib import contextmanager
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pacsv
+import pyarrow.feather as feather
+
+from scripts import esquema, indice_ids
+from scripts.indice_ids import IndiceIds
+
+try:
+    import fcntl
+except ImportError:  # Windows: sin lock entre procesos
+    fcntl = None
+
+# entidad -> columna de ID (también el nombre del subdirectorio)
+ENTIDADES = {"polizas": "poliza_id", "siniestros": "siniestro_id"}
+CAPACIDAD = int(os.environ.get("PIPELINE_HISTORIAL_CAPACIDAD", 100_000_000))
+FPR = 0.01
+PALABRAS_BLOQUE = 8  # 8 x 64 = 512 bits por bloque
+BITS_POR_K = 9       # log2(512): cada índice de bit dentro del bloque
+K_MAX = 64 // BITS_POR_K
+BLOQUE = 1_000_000   # filas por tanda al hashear/sondear (acota los temporales)
+FILTRO = "bloom.npy"
+META = "filtro.json"
+LOCK = ".lock"
+_M1 = np.uint64(0xBF58476D1CE4E5B9)
+_M2 = np.uint64(0x94D049BB133111EB)
+_SAL = np.uint64(0x9E3779B97F4A7C15)
+
+
+def _mezclar(x):
+    """Finalizador de splitmix64 (vectorizado; el producto de uint64 desborda a propósito)"""
+    x = (x ^ (x >> np.uint64(30))) * _M1
+    x = (x ^ (x >> np.uint64(27))) * _M2
+    return x ^ (x >> np.uint64(31))
+
+
+def hashes(valores):
+    """
+    (hash uint64, arreglo Arrow de textos, no nulo) por valor. Los UUID canónicos se
+    hashean empaquetados (sin objetos Python); el resto, con el hash de pandas del texto.
+    """
+    alto, bajo, canonico, arr = indice_ids.empaquetar(valores)
+    h = _mezclar(alto ^ _mezclar(bajo))
+    otros = np.flatnonzero(~canonico)
+    no_nulo = ~arr.is_null().to_numpy(zero_copy_only=False)
+    if len(otros):
+        textos = arr.take(pa.array(otros)).to_pandas().fillna("").to_numpy(dtype=object)
+        h[otros] = pd.util.hash_array(textos)
+    return h, arr, no_nulo
+
+
+class FiltroBloom:
+    """Filtro de Bloom por bloques sobre un arreglo uint64 (en memoria o mapeado)"""
+
+    def __init__(self, palabras, k):
+        self.palabras = palabras
+        self.k = k
+        self.bloques = len(palabras) // PALABRAS_BLOQUE
+
+    @staticmethod
+    def dimensionar(capacidad, fpr=FPR):
+        """(bloques, k) para `capacidad` IDs con tasa de falsos positivos ~`fpr`"""
+        bits = -capacidad * np.log(fpr) / np.log(2) ** 2
+        k = int(min(K_MAX, max(1, round(bits / max(1, capacidad) * np.log(2)))))
+        return max(1, int(np.ceil(bits / (PALABRAS_BLOQUE * 64)))), k
+
+    def _posiciones(self, h):
+        """(índice de palabra, máscara) de los k bits de cada hash: matrices (n, k)"""
+        bloque = (h % np.uint64(self.bloques)).astype(np.int64)
+        h2 = _mezclar(h ^ _SAL)
+        desplazamientos = np.arange(self.k, dtype=np.uint64) * np.uint64(BITS_POR_K)
+        bit = (h2[:, None] >> desplazamientos) & np.uint64(PALABRAS_BLOQUE * 64 - 1)
+        palabra = bloque[:, None] * PALABRAS_BLOQUE + (bit >> np.uint64(6)).astype(np.int64)
+        return palabra, np.uint64(1) << (bit & np.uint64(63))
+
+    def agregar(self, h):
+        for ini in range(0, len(h), BLOQUE):
+            palabra, mascara = self._posiciones(h[ini:ini + BLOQUE])
+            np.bitwise_or.at(self.palabras, palabra.ravel(), mascara.ravel())
+
+    def contiene(self, h):
+        res = np.empty(len(h), dtype=bool)
+        for ini in range(0, len(h), BLOQUE):
+            palabra, mascara = self._posiciones(h[ini:ini + BLOQUE])
+            res[ini:ini + BLOQUE] = ((self.palabras[palabra] & mascara) != 0).all(axis=1)
+        return res
+
+
+def _dir(historial_dir, entidad):
+    return os.path.join(historial_dir, entidad)
+
+
+@contextmanager
+def _bloqueo(historial_dir, entidad):
+    """Lock exclusivo de escritura sobre el directorio de la entidad (se libera al cerrar)"""
+    os.makedirs(_dir(historial_dir, entidad), exist_ok=True)
+    with open(os.path.join(_dir(historial_dir, entidad), LOCK), "a") as f:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        yield
+
+
+def leer_meta(historial_dir, entidad):
+    try:
+        with open(os.path.join(_dir(historial_dir, entidad), META), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _escribir_meta(historial_dir, entidad, meta):
+    path = os.path.join(_dir(historial_dir, entidad), META)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=2)
+    os.replace(tmp, path)
+
+
+def abrir(historial_dir, entidad, escritura=False, capacidad=None, fpr=FPR):
+    """FiltroBloom mapeado de la entidad (None si no existe y no es para escritura)"""
+    meta = leer_meta(historial_dir, entidad)
+    path = os.path.join(_dir(historial_dir, entidad), FILTRO)
+    if meta is None:
+        if not escritura:
+            return None
+        os.makedirs(_dir(historial_dir, entidad), exist_ok=True)
+        capacidad = capacidad or CAPACIDAD
+        bloques, k = FiltroBloom.dimensionar(capacidad, fpr)
+        # archivo disperso: el disco se ocupa a medida que se encienden bits
+        palabras = np.lib.format.open_memmap(path, mode="w+", dtype=np.uint64, shape=(bloques * PALABRAS_BLOQUE,))
+        meta = {"entidad": entidad, "capacidad": capacidad, "fpr": fpr, "bloques": bloques, "k": k,
+                "insertados": 0, "fechas": [], "por_fecha": {}}
+        _escribir_meta(historial_dir, entidad, meta)
+        return FiltroBloom(palabras, k)
+    return FiltroBloom(np.load(path, mmap_mode="r+" if escritura else "r"), meta["k"])
+
+
+def fechas(historial_dir, entidad):
+    """Fechas (YYYYMMDD) con índice exacto registrado"""
+    base = _dir(historial_dir, entidad)
+    if not os.path.isdir(base):
+        return []
+    return sorted(d[len("fecha="):] for d in os.listdir(base) if d.startswith("fecha=") and "." not in d)
+
+
+def _reemplazar_dir(tmp, destino):
+    viejo = f"{destino}.viejo"
+    if os.path.exists(destino):
+        os.replace(destino, viejo)
+    os.replace(tmp, destino)
+    shutil.rmtree(viejo, ignore_errors=True)
+
+
+def registrar(historial_dir, entidad, valores, fecha, capacidad=None):
+    """
+    Agrega los IDs del día al filtro y guarda su índice exacto en fecha=`fecha`, bajo
+    el lock de la entidad. Devuelve la metadata del filtro (con `insertados` >
+    `capacidad` la tasa de falsos positivos supera FPR: conviene un filtro más grande).
+    """
+    h, arr, no_nulo = hashes(valores)
+    with _bloqueo(historial_dir, entidad):
+        filtro = abrir(historial_dir, entidad, escritura=True, capacidad=capacidad)
+        filtro.agregar(h[no_nulo])
+        filtro.palabras.flush()
+
+        destino = os.path.join(_dir(historial_dir, entidad), f"fecha={fecha}")
+        tmp = f"{destino}.{os.getpid()}.tmp"
+        shutil.rmtree(tmp, ignore_errors=True)
+        IndiceIds.desde(arr.filter(pa.array(no_nulo))).guardar(tmp)
+        _reemplazar_dir(tmp, destino)
+
+        meta = leer_meta(historial_dir, entidad)
+        if "por_fecha" not in meta:  # metadata anterior: sólo el total, se rehace desde los índices
+            meta["por_fecha"] = {dia: len(IndiceIds.cargar(os.path.join(_dir(historial_dir, entidad), f"fecha={dia}")))
+                                 for dia in meta["fechas"] if dia != fecha}
+        # re-registrar una fecha reemplaza su conteo: ni se cuenta dos veces ni queda el viejo
+        meta["por_fecha"][fecha] = int(no_nulo.sum())
+        meta["fechas"] = sorted(meta["por_fecha"])
+        meta["insertados"] = sum(meta["por_fecha"].values())
+        meta["actualizado"] = datetime.now().isoformat(timespec="seconds")
+        _escribir_meta(historial_dir, entidad, meta)
+    return meta
+
+
+def duplicados(historial_dir, entidad, valores, fecha):
+    """
+    (bool numpy por valor: el ID ya llegó en una fecha anterior a `fecha`, nº de candidatos
+    del filtro). Sólo los candidatos se buscan en los índices diarios (mapeados).
+    """
+    h, arr, no_nulo = hashes(valores)
+    confirmados = np.zeros(len(arr), dtype=bool)
+    filtro = abrir(historial_dir, entidad)
+    if filtro is None:
+        return confirmados, 0
+    candidatos = np.flatnonzero(filtro.contiene(h) & no_nulo)
+    pendientes = candidatos
+    for dia in fechas(historial_dir, entidad):
+        if dia >= fecha or not len(pendientes):
+            continue
+        indice = IndiceIds.cargar(os.path.join(_dir(historial_dir, entidad), f"fecha={dia}"))
+        encontrado = indice.contiene(arr.take(pa.array(pendientes)))
+        confirmados[pendientes[encontrado]] = True
+        pendientes = pendientes[~encontrado]
+    return confirmados, len(candidatos)
+
+
+def ids_de_archivo(path, columna):
+    """Columna de IDs de un archivo de filas válidas (.arrow o CSV), sin leer el resto"""
+    if esquema.es_arrow(path):
+        return feather.read_table(path, columns=[columna], memory_map=True).column(columna)
+    opciones = pacsv.ConvertOptions(include_columns=[columna], column_types={columna: pa.string()},
+                                    strings_can_be_null=True)
+    return pacsv.read_csv(path, convert_options=opciones).column(columna)
@@ -1,78 +1,240 @@
-
 import os
 import sys
-from datetime import datetime, date, timedelta
-import csv
-import uuid
-import random
+from datetime import datetime
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.csv as pacsv
 
 # Fix: allow running as script (python scripts/generar_datos.py)
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from faker import Faker
 from scripts.utils_auditoria import registrar_evento_auditoria
+from scripts import entradas, indice_ids, instrumentacion
+
+POL_COLS = ["poliza_id","cliente_id","producto","suma_asegurada","prima_mensual","fecha_inicio","estado","region"]
+SIN_COLS = ["siniestro_id","poliza_id","fecha_siniestro","tipo_siniestro","monto_reclamado","estado"]
+
+PRODUCTOS = np.array(["AUTO", "VIDA", "HOGAR"])
+ESTADOS_POL = np.array(["ACTIVA", "CANCELADA"])
+REGIONES = np.array(["CDMX", "GDL", "MTY"])
+TIPOS_SIN = np.array(["CHOQUE", "ROBO", "INCENDIO"])
+ESTADOS_SIN = np.array(["PENDIENTE", "APROBADO", "RECHAZADO"])
+
+# filas por lote: acota la memoria y permite escribir millones de filas en bloque
+CHUNK_FILAS = 1_000_000
+
+def _uuid4(rng, n):
+    """Genera n UUID v4 en texto como arreglo 'S36' (sin objetos Python por fila)"""
+    raw = rng.integers(0, 256, size=(n, 16), dtype=np.uint8)
+    raw[:, 6] = (raw[:, 6] & 0x0F) | 0x40  # versión 4
+    raw[:, 8] = (raw[:, 8] & 0x3F) | 0x80  # variante RFC 4122
+    return indice_ids.formatear_bytes(raw)
+
+
+def _texto(valores, vacios=None):
+    """Arreglo de bytes -> columna Arrow string; `vacios` se escribe como campo vacío"""
+    return pa.array(valores, mask=vacios).cast(pa.string())
+
+
+def _categoria(opciones, rng, n):
+    return pa.DictionaryArray.from_arrays(
+        rng.integers(0, len(opciones), size=n, dtype=np.int8), pa.array(opciones)
+    ).cast(pa.string())
 
-fake = Faker()
 
-def generar_polizas(out_dir, date_str, n=10000, err_rate=0.05):
+def _fechas(rng, fecha_base, n):
+    """Fechas entre fecha_base-365 y fecha_base (date32 -> ISO en el CSV)"""
+    return pa.array(np.datetime64(fecha_base, "D") - rng.integers(0, 366, size=n))
+
+
+def _fecha_de(date_str):
+    return datetime.strptime(date_str, "%Y%m%d").date()
+
+
+def lotes_polizas(n, fecha_base, err_rate=0.05, rng=None, chunk_size=CHUNK_FILAS):
+    """
+    Genera pólizas sintéticas en lotes columnares (pyarrow.Table de hasta chunk_size filas).
+    Inyecta los mismos errores que la versión fila a fila:
+    - err_rate: suma negativa o prima 0 (50/50)
+    - err_rate/2: poliza_id vacío
+    """
+    rng = rng if rng is not None else np.random.default_rng()
+    for ini in range(0, n, chunk_size):
+        m = min(chunk_size, n - ini)
+        ids = _uuid4(rng, m)
+        suma = rng.uniform(1000, 50000, m).round(2)
+        prima = rng.uniform(50, 2000, m).round(2)
+        # errores intencionales
+        err = rng.random(m) < err_rate
+        mitad = rng.random(m) < 0.5
+        suma[err & mitad] = -np.abs(suma[err & mitad])
+        prima[err & ~mitad] = 0
+        id_vacio = rng.random(m) < err_rate / 2
+        yield pa.table({
+            "poliza_id": _texto(ids, id_vacio),
+            "cliente_id": rng.integers(0, 10**6, size=m),
+            "producto": _categoria(PRODUCTOS, rng, m),
+            "suma_asegurada": suma,
+            "prima_mensual": prima,
+            "fecha_inicio": _fechas(rng, fecha_base, m),
+            "estado": _categoria(ESTADOS_POL, rng, m),
+            "region": _categoria(REGIONES, rng, m),
+        })
+
+
+def lotes_siniestros(n, fecha_base, poliza_ids, err_rate=0.05, rng=None, chunk_size=CHUNK_FILAS):
+    """
+    Genera siniestros sintéticos en lotes columnares referenciando `poliza_ids` (lista, arreglo
+    o `IndiceIds`, p. ej. el de pólizas de días anteriores: 16 bytes por ID en vez de 36).
+    Errores: err_rate póliza inexistente, err_rate monto negativo, err_rate/10 siniestro_id vacío.
+    """
+    rng = rng if rng is not None else np.random.default_rng()
+    if isinstance(poliza_ids, indice_ids.IndiceIds):
+        len(poliza_ids)  # consolida los IDs agregados (muestra sólo toma de los ya ordenados)
+    else:
+        poliza_ids = np.asarray(poliza_ids, dtype="S44")
+    for ini in range(0, n, chunk_size):
+        m = min(chunk_size, n - ini)
+        if isinstance(poliza_ids, indice_ids.IndiceIds) and len(poliza_ids.alto):
+            pol = poliza_ids.muestra(rng, m).astype("S44")
+        elif not isinstance(poliza_ids, indice_ids.IndiceIds) and len(poliza_ids):
+            pol = poliza_ids[rng.integers(0, len(poliza_ids), size=m)]
+        else:
+            pol = np.full(m, b"", dtype="S44")
+        # en err_rate pequeñas referenciamos poliza inexistente
+        inexistente = rng.random(m) < err_rate
+        pol[inexistente] = np.char.add(b"invalid-", _uuid4(rng, int(inexistente.sum())))
+        monto = rng.uniform(100, 20000, m).round(2)
+        neg = rng.random(m) < err_rate
+        monto[neg] = -np.abs(monto[neg])
+        sin_vacio = rng.random(m) < err_rate / 10
+        yield pa.table({
+            "siniestro_id": _texto(_uuid4(rng, m), sin_vacio),
+            "poliza_id": _texto(pol, pol == b""),
+            "fecha_siniestro": _fechas(rng, fecha_base, m),
+            "tipo_siniestro": _categoria(TIPOS_SIN, rng, m),
+            "monto_reclamado": monto,
+            "estado": _categoria(ESTADOS_SIN, rng, m),
+        })
+
+
+def _nombres(out_dir, tabla, date_str, partes=1, compresion=None):
+    """
+    (archivos a escribir, ruta a devolver): un único CSV, o con `partes` > 1 las partes
+    <tabla>_<fecha>-NNNNN.csv[.gz|.zst] y su patrón (ver scripts/entradas.py)
+    """
+    if compresion is not None and compresion not in entradas.EXTENSIONES:
+        raise ValueError(f"Compresión desconocida: {compresion} (disponibles: {sorted(entradas.EXTENSIONES)})")
+    ext = ".csv" + (entradas.EXTENSIONES[compresion] if compresion else "")
+    if partes <= 1:
+        fname = os.path.join(out_dir, f"{tabla}_{date_str}{ext}")
+        return [fname], fname
+    return ([os.path.join(out_dir, f"{tabla}_{date_str}-{i:05d}{ext}") for i in range(partes)],
+            os.path.join(out_dir, f"{tabla}_{date_str}-*{ext}"))
+
+
+def _escribir_lotes(fnames, columnas, lotes, al_escribir=None, filas_por_parte=None, compresion=None):
+    """
+    Escribe los lotes en bloque (mismo layout que csv.writer, sin comillas) repartidos en
+    `fnames`: `filas_por_parte` filas en cada una (la última se lleva el resto), cada una
+    con encabezado y comprimida en streaming con `compresion`. Los lotes se cortan con
+    slices (sin copia), así las filas son las mismas que en un único archivo.
+    """
+    total = 0
+    opciones = pacsv.WriteOptions(include_header=False, quoting_style="none")
+    encabezado = (",".join(columnas) + "\n").encode("utf-8")
+    salida = writer = None
+    parte, restantes = -1, 0
+
+    def abrir(schema):
+        nonlocal salida, writer, parte, restantes
+        cerrar()
+        parte += 1
+        salida = pa.output_stream(fnames[parte], compression=compresion)
+        salida.write(encabezado)
+        writer = pacsv.CSVWriter(salida, schema, write_options=opciones) if schema is not None else None
+        restantes = filas_por_parte or 0
+
+    def cerrar():
+        nonlocal salida, writer
+        if writer is not None:
+            writer.close()
+        if salida is not None:
+            salida.close()
+        salida = writer = None
+
+    try:
+        for lote in lotes:
+            ini = 0
+            while ini < lote.num_rows:
+                if writer is None or (restantes <= 0 and parte + 1 < len(fnames)):
+                    abrir(lote.schema)
+                ultima = parte + 1 == len(fnames)
+                m = lote.num_rows - ini if ultima else min(restantes, lote.num_rows - ini)
+                writer.write_table(lote.slice(ini, m))
+                ini += m
+                restantes -= m
+            if al_escribir:
+                al_escribir(lote)
+            total += lote.num_rows
+        # partes sin filas (menos filas que partes): sólo el encabezado
+        while parte + 1 < len(fnames):
+            abrir(None)
+    finally:
+        cerrar()
+    return total
+
+
+def _generar_polizas(out_dir, date_str, n, err_rate, seed, chunk_size, partes=1, compresion=None):
+    """Escribe el CSV de pólizas y devuelve (ruta o patrón de partes, ids no vacíos como arreglo 'S36')"""
     inicio = datetime.now()
     os.makedirs(out_dir, exist_ok=True)
-    fname = os.path.join(out_dir, f"polizas_{date_str}.csv")
-    with open(fname, "w", newline="", encoding="utf-8") as f:
-        w = csv.writer(f)
-        w.writerow(["poliza_id","cliente_id","producto","suma_asegurada","prima_mensual","fecha_inicio","estado","region"])
-        for i in range(n):
-            poliza_id = str(uuid.uuid4())
-            cliente_id = fake.random_number(digits=6)
-            producto = random.choice(["AUTO", "VIDA", "HOGAR"])
-            suma = round(random.uniform(1000, 50000), 2)
-            prima = round(random.uniform(50, 2000), 2)
-            fecha_inicio = (date.today() - timedelta(days=random.randint(0,365))).isoformat()
-            estado = random.choice(["ACTIVA", "CANCELADA"])
-            region = random.choice(["CDMX","GDL","MTY"])
-            # errores intencionales
-            if random.random() < err_rate:
-                if random.random() < 0.5:
-                    suma = -abs(suma)
-                else:
-                    prima = 0
-            if random.random() < err_rate/2:
-                poliza_id = ""
-            w.writerow([poliza_id, cliente_id, producto, suma, prima, fecha_inicio, estado, region])
+    fnames, fname = _nombres(out_dir, "polizas", date_str, partes, compresion)
+    rng = np.random.default_rng(seed)
+    ids = []
+
+    def recolectar(lote):
+        # binario de ancho fijo: el cast falla si algún ID no mide 36 y el buffer queda denso
+        col = lote.column("poliza_id").combine_chunks().drop_null().cast(pa.binary())
+        col = col.cast(pa.binary(indice_ids.LARGO_UUID))
+        ids.append(np.frombuffer(col.buffers()[1], dtype="S36", count=len(col),
+                                 offset=col.offset * indice_ids.LARGO_UUID).copy())
+
+    lotes = lotes_polizas(n, _fecha_de(date_str), err_rate, rng, chunk_size)
+    with instrumentacion.etapa("generar_polizas", archivo=os.path.basename(fname), registros=n):
+        _escribir_lotes(fnames, POL_COLS, lotes, recolectar, -(-n // len(fnames)), compresion)
     registrar_evento_auditoria("generar_polizas", archivo=os.path.basename(fname), registros=n, inicio=inicio)
+    return fname, (np.concatenate(ids) if ids else np.array([], dtype="S36"))
+
+
+def generar_polizas(out_dir, date_str, n=10000, err_rate=0.05, seed=None, chunk_size=CHUNK_FILAS, partes=1,
+                    compresion=None):
+    fname, _ = _generar_polizas(out_dir, date_str, n, err_rate, seed, chunk_size, partes, compresion)
     return fname
 
-def generar_siniestros(out_dir, date_str, poliza_ids, n=2000, err_rate=0.05):
+def generar_siniestros(out_dir, date_str, poliza_ids, n=2000, err_rate=0.05, seed=None, chunk_size=CHUNK_FILAS,
+                       partes=1, compresion=None):
     inicio = datetime.now()
     os.makedirs(out_dir, exist_ok=True)
-    fname = os.path.join(out_dir, f"siniestros_{date_str}.csv")
-    with open(fname, "w", newline="", encoding="utf-8") as f:
-        w = csv.writer(f)
-        w.writerow(["siniestro_id","poliza_id","fecha_siniestro","tipo_siniestro","monto_reclamado","estado"])
-        for i in range(n):
-            sin_id = str(uuid.uuid4())
-            # en err_rate pequeñas referenciamos poliza inexistente
-            if random.random() < err_rate:
-                pol_id = "invalid-" + str(uuid.uuid4())
-            else:
-                pol_id = random.choice(poliza_ids) if poliza_ids else ""
-            fecha_siniestro = (date.today() - timedelta(days=random.randint(0,365))).isoformat()
-            tipo = random.choice(["CHOQUE","ROBO","INCENDIO"])
-            monto = round(random.uniform(100,20000), 2)
-            estado = random.choice(["PENDIENTE","APROBADO","RECHAZADO"])
-            if random.random() < err_rate:
-                monto = -abs(monto)
-            if random.random() < err_rate/10:
-                sin_id = ""
-            w.writerow([sin_id, pol_id, fecha_siniestro, tipo, monto, estado])
+    fnames, fname = _nombres(out_dir, "siniestros", date_str, partes, compresion)
+    rng = np.random.default_rng(seed)
+    lotes = lotes_siniestros(n, _fecha_de(date_str), poliza_ids, err_rate, rng, chunk_size)
+    with instrumentacion.etapa("generar_siniestros", archivo=os.path.basename(fname), registros=n):
+        _escribir_lotes(fnames, SIN_COLS, lotes, filas_por_parte=-(-n // len(fnames)), compresion=compresion)
     registrar_evento_auditoria("generar_siniestros", archivo=os.path.basename(fname), registros=n, inicio=inicio)
     return fname
 
-def generar_csvs(out_dir="data", date=None):
+def generar_csvs(out_dir="data", date=None, seed=None, n_polizas=10000, n_siniestros=2000,
+                 err_rate=0.05, chunk_size=CHUNK_FILAS, partes=1, compresion=None):
     """
     Wrapper que genera polizas (n grandes) y siniestros (m) y devuelve (pol_file, sin_file)
     - out_dir: carpeta donde escribe
     - date: datetime.date o None -> hoy
+    - seed: semilla para salida reproducible (None -> aleatoria)
+    - err_rate: tasa base de errores inyectados en ambos archivos
+    - partes / compresion (gzip | zstd): entradas como las del upstream, para pruebas de carga;
+      con partes > 1 devuelve los patrones de las partes. Misma semilla, mismas filas.
     """
     if date is None:
         date = date or datetime.today().date()
@@ -80,19 +242,30 @@ def generar_csvs(out_dir="data", date=None):
         date = date.date()
     date_str = date.strftime("%Y%m%d")
 
-    pol_file = generar_polizas(out_dir, date_str, n=10000, err_rate=0.05)
+    # una semilla hija por archivo: reproducible y sin correlación entre ambos
+    seed_pol, seed_sin = np.random.SeedSequence(seed).spawn(2)
 
-    # leer IDs válidos
-    poliza_ids = []
-    with open(pol_file, encoding="utf-8") as f:
-        next(f)  # header
-        for row in csv.reader(f):
-            if row and row[0]:
-                poliza_ids.append(row[0])
-
-    sin_file = generar_siniestros(out_dir, date_str, poliza_ids, n=2000, err_rate=0.05)
+    # los IDs válidos salen del propio generador, sin releer el CSV
+    pol_file, poliza_ids = _generar_polizas(out_dir, date_str, n_polizas, err_rate, seed_pol, chunk_size,
+                                            partes, compresion)
+    sin_file = generar_siniestros(out_dir, date_str, poliza_ids, n=n_siniestros, err_rate=err_rate,
+                                  seed=seed_sin, chunk_size=chunk_size, partes=partes, compresion=compresion)
     return pol_file, sin_file
 
 if __name__ == "__main__":
-    p, s = generar_csvs("data")
+    import argparse
+    p = argparse.ArgumentParser(description="Generación de CSVs sintéticos de pólizas y siniestros")
+    p.add_argument("--out", default="data", help="Directorio de salida")
+    p.add_argument("--n-polizas", type=int, default=10000)
+    p.add_argument("--n-siniestros", type=int, default=2000)
+    p.add_argument("--seed", type=int, default=None, help="Semilla para salida reproducible")
+    p.add_argument("--err-rate", type=float, default=0.05, help="Tasa base de errores inyectados")
+    p.add_argument("--partes", type=int, default=1, help="Archivos por tabla (<tabla>_<fecha>-NNNNN.csv)")
+    p.add_argument("--compresion", choices=sorted(entradas.EXTENSIONES), default=None)
+    instrumentacion.agregar_argumento(p)
+    args = p.parse_args()
+    instrumentacion.desde_argumentos(args)
+
+    p, s = generar_csvs(args.out, seed=args.seed, n_polizas=args.n_polizas, n_siniestros=args.n_siniestros,
+                        err_rate=args.err_rate, partes=args.partes, compresion=args.compresion)
     print(f"Generados:\n - {p}\n - {s}")
@@ -0,0 +1,246 @@
+"""
+Índice compacto de IDs UUID para la integridad referencial (siniestro -> póliza).
+
+Cada UUID canónico (36 caracteres, hex en minúsculas, guiones en 8/13/18/23) se
+empaqueta en dos uint64 (alto, bajo) y el índice es un par de arreglos ordenados:
+16 bytes por ID en vez de ~100 de un str de Python en un set, y la pertenencia
+es un searchsorted vectorizado. Los IDs que no son UUID canónicos (p. ej. el
+prefijo `invalid-` del generador, mayúsculas) van a un conjunto aparte, así el
+resultado es el mismo que comparar los textos.
+
+Se usa en validación (pólizas válidas), en el generador (muestreo de pólizas
+para los siniestros) y se guarda por día para confirmar duplicados entre días
+(ver filtro_duplicados.py).
+"""
+import os
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from scripts import esquema
+
+LARGO_UUID = 36
+_POS_HEX = np.setdiff1d(np.arange(LARGO_UUID), [8, 13, 18, 23])
+_HEX = np.frombuffer(b"0123456789abcdef", dtype=np.uint8)
+# byte ASCII -> nibble; 0x100 = no es hex en minúsculas
+_NIBBLE = np.full(256, 0x100, dtype=np.uint16)
+_NIBBLE[_HEX] = np.arange(16, dtype=np.uint16)
+# par de caracteres (uint16 little-endian: el primero en el byte bajo) -> byte del UUID, 0x100 si no es hex
+_primero, _segundo = _NIBBLE[np.arange(65536) & 0xFF], _NIBBLE[np.arange(65536) >> 8]
+_PAR = np.where((_primero < 16) & (_segundo < 16), (_primero << 4) | _segundo, 0x100).astype("<u2")
+del _primero, _segundo
+# bits altos de 4 entradas de _PAR vistas como uint64: alguno encendido = carácter no hex
+_INVALIDO = np.uint64(0xFF00FF00FF00FF00)
+# filas por bloque al parsear: acota los temporales (~200 MB por bloque)
+BLOQUE = 1_000_000
+
+
+def _a_arrow(valores):
+    """Serie pandas / arreglo numpy 'S' / lista / Arrow -> arreglo Arrow string contiguo"""
+    if isinstance(valores, (pd.Series, pd.Index)):
+        valores = pa.Array.from_pandas(valores)
+    elif isinstance(valores, np.ndarray) and valores.dtype.kind == "S":
+        valores = pa.array(valores, type=pa.binary())
+    elif isinstance(valores, (set, frozenset)):
+        valores = list(valores)
+    arr = valores if isinstance(valores, (pa.Array, pa.ChunkedArray)) else pa.array(valores)
+    if isinstance(arr, pa.ChunkedArray):
+        arr = arr.combine_chunks()
+    if pa.types.is_dictionary(arr.type):
+        arr = arr.cast(arr.type.value_type)
+    return arr.cast(pa.string())
+
+
+def _matriz(arr):
+    """Arreglo Arrow de textos de 36 bytes -> matriz (n, 36) uint8 sin objetos Python"""
+    try:
+        fijo = arr.cast(pa.binary()).cast(pa.binary(LARGO_UUID))
+        return np.frombuffer(fijo.buffers()[1], dtype=np.uint8, count=len(fijo) * LARGO_UUID,
+                             offset=fijo.offset * LARGO_UUID).reshape(-1, LARGO_UUID)
+    except (pa.ArrowNotImplementedError, pa.ArrowInvalid):  # pyarrow sin el cast a binario fijo
+        return np.array(arr.to_pylist(), dtype=f"S{LARGO_UUID}").view(np.uint8).reshape(-1, LARGO_UUID)
+
+
+def _empaquetar_matriz(m):
+    """(n, 36) uint8 -> (alto, bajo, canónico); alto/bajo valen 0 donde no es canónico"""
+    guion = ord("-")
+    ok = (m[:, 8] == guion) & (m[:, 13] == guion) & (m[:, 18] == guion) & (m[:, 23] == guion)
+    # los 32 hex contiguos, de a pares: una consulta a tabla por byte del UUID
+    hexa = np.concatenate([m[:, 0:8], m[:, 9:13], m[:, 14:18], m[:, 19:23], m[:, 24:36]], axis=1)
+    pares = _PAR[hexa.view("<u2")]                        # (n, 16)
+    ok &= ~(pares.view("<u8") & _INVALIDO).any(axis=1)
+    crudo = pares.astype(np.uint8)
+    crudo[~ok] = 0
+    partes = crudo.view(">u8").astype(np.uint64)
+    return partes[:, 0], partes[:, 1], ok
+
+
+def empaquetar(valores):
+    """
+    (alto, bajo, canónico, arr) de cada valor: alto/bajo uint64 del UUID donde `canónico`,
+    y el arreglo Arrow de textos para el camino de respaldo (nulos: no canónicos).
+    """
+    arr = _a_arrow(valores)
+    n = len(arr)
+    alto = np.zeros(n, dtype=np.uint64)
+    bajo = np.zeros(n, dtype=np.uint64)
+    canonico = np.zeros(n, dtype=bool)
+    largos = pc.binary_length(arr).to_numpy(zero_copy_only=False)
+    es_candidato = np.nan_to_num(largos, nan=0) == LARGO_UUID
+    for ini in range(0, n, BLOQUE):
+        fin = min(ini + BLOQUE, n)
+        bloque = es_candidato[ini:fin]
+        if bloque.all():  # caso común: todos de 36, sin copiar con take
+            alto[ini:fin], bajo[ini:fin], canonico[ini:fin] = _empaquetar_matriz(_matriz(arr.slice(ini, fin - ini)))
+        elif bloque.any():
+            idx = ini + np.flatnonzero(bloque)
+            alto[idx], bajo[idx], canonico[idx] = _empaquetar_matriz(_matriz(arr.take(pa.array(idx))))
+    return alto, bajo, canonico, arr
+
+
+def formatear(alto, bajo):
+    """Inverso de `empaquetar`: uint64 alto/bajo -> arreglo 'S36' de UUID en texto"""
+    crudo = np.empty((len(alto), 2), dtype=">u8")  # big-endian: bytes en el orden del texto
+    crudo[:, 0], crudo[:, 1] = alto, bajo
+    return formatear_bytes(crudo.view(np.uint8).reshape(-1, 16))
+
+
+def formatear_bytes(crudo):
+    """(n, 16) uint8 -> arreglo 'S36' con el texto canónico del UUID"""
+    n = len(crudo)
+    hexa = np.empty((n, 32), dtype=np.uint8)
+    hexa[:, 0::2] = _HEX[crudo >> 4]
+    hexa[:, 1::2] = _HEX[crudo & 0x0F]
+    out = np.full((n, LARGO_UUID), ord("-"), dtype=np.uint8)
+    out[:, _POS_HEX] = hexa
+    return out.view(f"S{LARGO_UUID}").ravel()
+
+
+class IndiceIds:
+    """
+    Conjunto de IDs con pertenencia vectorizada. Se construye de una vez (`desde`) o
+    por partes (`agregar`, p. ej. por chunk); se consolida al primer uso.
+    """
+
+    def __init__(self):
+        self._partes = []          # (alto, bajo) pendientes de consolidar
+        self.alto = np.empty(0, dtype=np.uint64)
+        self.bajo = np.empty(0, dtype=np.uint64)
+        self.otros = set()         # IDs no canónicos (camino de respaldo)
+        self._altos_repetidos = np.empty(0, dtype=np.uint64)
+
+    @classmethod
+    def desde(cls, valores):
+        indice = cls()
+        indice.agregar(valores)
+        return indice
+
+    def agregar(self, valores):
+        alto, bajo, canonico, arr = empaquetar(valores)
+        self._partes.append((alto[canonico], bajo[canonico]))
+        resto = arr.filter(pa.array(~canonico)).drop_null()
+        if len(resto):
+            self.otros.update(resto.to_pylist())
+        return self
+
+    def _consolidar(self):
+        if not self._partes:
+            return
+        alto = np.concatenate([self.alto] + [a for a, _ in self._partes])
+        bajo = np.concatenate([self.bajo] + [b for _, b in self._partes])
+        self._partes = []
+        # orden por la mitad alta (un argsort de una clave es mucho más rápido que lexsort);
+        # los tramos con la misma mitad alta, raros con UUID v4, se ordenan por la baja aparte
+        orden = np.argsort(alto)
+        alto, bajo = alto[orden], bajo[orden]
+        del orden
+        repetido = np.zeros(len(alto), dtype=bool)
+        repetido[1:] = alto[1:] == alto[:-1]
+        altos_repetidos = np.unique(alto[repetido])
+        for a in altos_repetidos:
+            ini, fin = np.searchsorted(alto, a), np.searchsorted(alto, a, side="right")
+            bajo[ini:fin] = np.sort(bajo[ini:fin])
+        if len(altos_repetidos):  # duplicados exactos (el mismo ID agregado dos veces)
+            nuevo = np.ones(len(alto), dtype=bool)
+            nuevo[1:] = ~repetido[1:] | (bajo[1:] != bajo[:-1])
+            alto, bajo = alto[nuevo], bajo[nuevo]
+            repetido = np.zeros(len(alto), dtype=bool)
+            repetido[1:] = alto[1:] == alto[:-1]
+            altos_repetidos = np.unique(alto[repetido])
+        self.alto, self.bajo = alto, bajo
+        self._altos_repetidos = altos_repetidos
+
+    def __len__(self):
+        self._consolidar()
+        return len(self.alto) + len(self.otros)
+
+    def nbytes(self):
+        self._consolidar()
+        return self.alto.nbytes + self.bajo.nbytes
+
+    def _contiene_empaquetados(self, alto, bajo):
+        n = len(self.alto)
+        if n == 0:
+            return np.zeros(len(alto), dtype=bool)
+        # consultas ordenadas: la búsqueda binaria recorre el índice en orden (localidad de caché)
+        orden = np.argsort(alto)
+        i = np.empty(len(alto), dtype=np.intp)
+        i[orden] = np.searchsorted(self.alto, alto[orden])
+        j = np.minimum(i, n - 1)
+        res = (self.alto[j] == alto) & (self.bajo[j] == bajo)
+        if len(self._altos_repetidos):
+            # varias entradas con la misma mitad alta: están ordenadas por la baja
+            for k in np.flatnonzero(~res & np.isin(alto, self._altos_repetidos)):
+                fin = np.searchsorted(self.alto, alto[k], side="right")
+                p = i[k] + np.searchsorted(self.bajo[i[k]:fin], bajo[k])
+                res[k] = p < fin and self.bajo[p] == bajo[k]
+        return res
+
+    def contiene(self, valores):
+        """bool numpy por valor; nulos -> False"""
+        self._consolidar()
+        alto, bajo, canonico, arr = empaquetar(valores)
+        res = np.zeros(len(arr), dtype=bool)
+        res[canonico] = self._contiene_empaquetados(alto[canonico], bajo[canonico])
+        if self.otros and not canonico.all():
+            resto = ~canonico
+            res[resto] = esquema.pertenece(pd.Series(arr.filter(pa.array(resto)), dtype="string[pyarrow]"),
+                                           self.otros)
+        return res
+
+    def muestra(self, rng, n):
+        """n IDs canónicos al azar (con reposición) como arreglo 'S36'"""
+        self._consolidar()
+        idx = rng.integers(0, len(self.alto), size=n)
+        return formatear(self.alto[idx], self.bajo[idx])
+
+    def unir(self, otro):
+        """Agrega los IDs de otro índice (p. ej. el de días anteriores)"""
+        otro._consolidar()
+        self._partes.append((otro.alto, otro.bajo))
+        self.otros |= otro.otros
+        return self
+
+    def guardar(self, path):
+        """Persiste el índice en el directorio `path` (.npy sin comprimir: `cargar` los mapea)"""
+        self._consolidar()
+        os.makedirs(path, exist_ok=True)
+        for nombre, arr in (("alto", self.alto), ("bajo", self.bajo), ("altos_repetidos", self._altos_repetidos),
+                            ("otros", np.array(sorted(self.otros), dtype=str))):
+            np.save(os.path.join(path, f"{nombre}.npy"), arr)
+
+    @classmethod
+    def cargar(cls, path, mmap=True):
+        """
+        Índice de `guardar`. Con `mmap` los arreglos quedan mapeados: una búsqueda sólo lee
+        las páginas que toca (útil para confirmar pocos IDs contra índices de días anteriores).
+        """
+        modo = "r" if mmap else None
+        indice = cls()
+        indice.alto = np.load(os.path.join(path, "alto.npy"), mmap_mode=modo)
+        indice.bajo = np.load(os.path.join(path, "bajo.npy"), mmap_mode=modo)
+        indice._altos_repetidos = np.load(os.path.join(path, "altos_repetidos.npy"))
+        indice.otros = set(np.load(os.path.join(path, "otros.npy")).tolist())
+        return indice
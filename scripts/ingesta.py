@@ -0,0 +1,403 @@
+"""
+Ingesta por micro-lotes: procesa los archivos de pólizas / siniestros a medida que
+llegan a `entrada_dir`, en vez de esperar la corrida nocturna.
+
+- Se toman los polizas_YYYYMMDD*.csv / siniestros_YYYYMMDD*.csv (no .tmp ni ocultos).
+  Cada pasada procesa las filas completas (hasta el último salto de línea) que
+  aparecieron desde el offset registrado: un archivo que el productor va agregando
+  entra por tramos, y una línea a medio escribir espera a la pasada siguiente.
+- manifiesto.json guarda por archivo el offset procesado y una huella de los bytes
+  previos: nada se procesa dos veces, y un archivo reescrito (no agregado) se marca
+  REESCRITO y no se reaplica (el agregado no puede restar filas ya sumadas).
+- Cada tramo se valida solo: pólizas con las reglas del esquema; siniestros además
+  contra las pólizas válidas ya ingeridas (índices IndiceIds en polizas_validas/,
+  compactados cada MAX_INDICES), así un siniestro puede llegar en un archivo o tramo
+  posterior al de su póliza.
+- Un siniestro que llega antes que su póliza (sólo poliza_inexistente) queda pendiente
+  en pendientes/fecha=YYYYMMDD/ y no cuenta para el `umbral`: al final de cada pasada
+  se revalidan los pendientes, los que ya tienen póliza van al agregado y los que
+  siguen sin ella después de `espera` segundos (PIPELINE_INGESTA_ESPERA_POLIZA) van a
+  la cuarentena como poliza_inexistente.
+- Tramo con más de `umbral` inválidos: sus bytes van a la cuarentena de archivos. Si
+  no, los inválidos van a la cuarentena particionada y los válidos al agregado
+  incremental (agregado_incremental.aplicar_delta) de su fecha (estado/fecha=YYYYMMDD),
+  que reescribe resumen_producto_<fecha>.csv: el resumen de un día sólo suma las filas
+  de los archivos de ese día, igual que el del pipeline diario.
+- Idempotente ante cortes: el lote del delta y de la cuarentena es archivo + rango de
+  bytes, y antes de validar el tramo empieza donde termina el rango ya aplicado al
+  agregado, así un tramo cuyo manifiesto no llegó a guardarse no suma dos veces
+  aunque el archivo haya crecido entre tanto.
+- Latencia de punta a punta (última escritura del archivo -> resumen actualizado) en la
+  auditoría como etapa `latencia_ingesta` (en duracion_segundos): se consulta con
+  utils_auditoria.latencias(etapas=["latencia_ingesta"]).
+"""
+import hashlib
+import json
+import mmap
+import os
+import re
+import shutil
+import sys
+import time
+from datetime import datetime
+
+import numpy as np
+import pyarrow as pa
+
+try:
+    import fcntl
+except ImportError:  # Windows: sin lock entre procesos
+    fcntl = None
+
+# allow running directly
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from scripts import cuarentena, esquema
+from scripts.agregado_incremental import aplicar_delta, cargar_estado
+from scripts.indice_ids import IndiceIds
+from scripts.utils_auditoria import registrar_evento_auditoria
+from scripts.validacion import (COLUMNA_MOTIVOS, REGLA_POLIZA_INEXISTENTE, REGLAS_POLIZAS, REGLAS_SINIESTROS,
+                                _conteo_motivos, validar_polizas_df, validar_siniestros_df)
+
+PATRON = re.compile(r"^(polizas|siniestros)_(\d{8})[^/]*\.csv$")
+ESQUEMAS = {"polizas": esquema.POLIZAS, "siniestros": esquema.SINIESTROS}
+REGLAS = {"polizas": REGLAS_POLIZAS, "siniestros": REGLAS_SINIESTROS}
+INTERVALO_SEGUNDOS = float(os.environ.get("PIPELINE_INGESTA_INTERVALO", 10))
+# segundos que un siniestro sin póliza espera a que llegue antes de ir a la cuarentena
+ESPERA_POLIZA_SEGUNDOS = float(os.environ.get("PIPELINE_INGESTA_ESPERA_POLIZA", 3600))
+MANIFIESTO = "manifiesto.json"
+ESTADO_DIR = "estado"
+POLIZAS_DIR = "polizas_validas"
+PENDIENTES_DIR = "pendientes"
+# <lote>.r<k>.arrow: siniestros que esperan su póliza (k-ésima revisión);
+# <lote>.v<k>.arrow: los que la encontraron en la revisión k y van al agregado
+_PENDIENTE = re.compile(r"^(.*)\.([rv])(\d+)\.arrow$")
+MAX_INDICES = 8
+HUELLA_BYTES = 64 * 1024
+
+PROCESADO = "PROCESADO"
+CORRUPTO = "CORRUPTO"
+REESCRITO = "REESCRITO"
+
+
+def leer_manifiesto(ingesta_dir):
+    try:
+        with open(os.path.join(ingesta_dir, MANIFIESTO), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {"archivos": {}}
+
+
+def _guardar_manifiesto(ingesta_dir, manifiesto):
+    path = os.path.join(ingesta_dir, MANIFIESTO)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifiesto, f, indent=2, sort_keys=True)
+    os.replace(tmp, path)
+
+
+def _huella(mm, offset):
+    """Hash de los HUELLA_BYTES anteriores a `offset`: detecta un archivo reescrito sin releerlo entero"""
+    return hashlib.blake2b(mm[max(0, offset - HUELLA_BYTES):offset], digest_size=16).hexdigest()
+
+
+def _huella_de(path, offset):
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        return _huella(mm, offset)
+
+
+def _tramo_nuevo(path, entrada):
+    """(encabezado, inicio, fin, huella_previa_ok) de las filas completas nuevas del archivo"""
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return None, 0, 0, True
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            datos = mm.find(b"\n") + 1
+            if datos == 0:
+                return None, 0, 0, True  # ni el encabezado está completo
+            ini = max(entrada.get("offset", 0), datos)
+            if entrada and (len(mm) < entrada["offset"] or _huella(mm, entrada["offset"]) != entrada["huella"]):
+                return None, ini, ini, False
+            fin = mm.rfind(b"\n", ini - 1) + 1
+            return mm[:datos], ini, max(ini, fin), True
+
+
+def pendientes(entrada_dir, manifiesto):
+    """[(tabla, fecha, path)] con filas nuevas, por orden de llegada (pólizas antes a igual mtime)"""
+    res = []
+    for e in os.scandir(entrada_dir) if os.path.isdir(entrada_dir) else []:
+        m = PATRON.match(e.name)
+        if not m or not e.is_file():
+            continue
+        entrada = manifiesto["archivos"].get(e.name)
+        st = e.stat()
+        if entrada and (entrada["estado"] == REESCRITO or (entrada["bytes"], entrada["mtime_ns"]) == (st.st_size, st.st_mtime_ns)):
+            continue
+        res.append((st.st_mtime_ns, m.group(1) != "polizas", m.group(1), m.group(2), e.path))
+    return [(tabla, fecha, path) for *_, tabla, fecha, path in sorted(res)]
+
+
+def _indices(ingesta_dir):
+    base = os.path.join(ingesta_dir, POLIZAS_DIR)
+    return sorted(os.path.join(base, d) for d in os.listdir(base) if not d.endswith(".tmp")) \
+        if os.path.isdir(base) else []
+
+
+def _agregar_polizas(ingesta_dir, ids):
+    """Guarda el índice de las pólizas válidas del tramo; cada MAX_INDICES se compactan en uno"""
+    indices = _indices(ingesta_dir)
+    siguiente = int(os.path.basename(indices[-1])) + 1 if indices else 1
+    nuevo = IndiceIds.desde(ids)
+    if len(indices) >= MAX_INDICES:
+        for path in indices:
+            nuevo.unir(IndiceIds.cargar(path))
+    destino = os.path.join(ingesta_dir, POLIZAS_DIR, f"{siguiente:06d}")
+    nuevo.guardar(f"{destino}.tmp")
+    os.replace(f"{destino}.tmp", destino)
+    if len(indices) >= MAX_INDICES:
+        for path in indices:
+            shutil.rmtree(path, ignore_errors=True)
+
+
+def _polizas_ingeridas(ingesta_dir):
+    """IndiceIds con las pólizas válidas de todos los tramos ya ingeridos (a lo sumo MAX_INDICES mapeados)"""
+    indice = IndiceIds()
+    for path in _indices(ingesta_dir):
+        indice.unir(IndiceIds.cargar(path))
+    return indice
+
+
+def _vacio(tabla):
+    esq = ESQUEMAS[tabla]
+    return esquema.a_pandas(pa.schema([(c.nombre, esquema.TIPOS_ARROW[c.tipo]) for c in esq]).empty_table())
+
+
+def _estado_dir(ingesta_dir, fecha):
+    """Estado del agregado incremental de una fecha"""
+    return os.path.join(ingesta_dir, ESTADO_DIR, f"fecha={fecha}")
+
+
+def _aplicado_hasta(ingesta_dir, fecha, nombre, ini):
+    """Fin del rango del archivo ya aplicado al agregado que contiene `ini` (o `ini` si no hay)"""
+    for a, b in cargar_estado(_estado_dir(ingesta_dir, fecha))["lotes_aplicados"]["rangos"].get(nombre, []):
+        if a <= ini < b:
+            return b
+    return ini
+
+
+def _escribir_resumen(out_dir, fecha, resumen):
+    resumen_file = os.path.join(out_dir, f"resumen_producto_{fecha}.csv")
+    tmp = f"{resumen_file}.{os.getpid()}.tmp"
+    resumen.to_csv(tmp, index=False)
+    os.replace(tmp, resumen_file)
+    return resumen_file
+
+
+def _guardar_pendientes(ingesta_dir, fecha, lote, tipo, k, df, llegada):
+    """Escribe los siniestros pendientes; el mtime del archivo guarda la llegada del tramo original"""
+    path = os.path.join(ingesta_dir, PENDIENTES_DIR, f"fecha={fecha}", f"{lote}.{tipo}{k}{esquema.EXTENSION_ARROW}")
+    esquema.escribir_arrow(df, path)
+    os.utime(path, (llegada, llegada))
+    return path
+
+
+def procesar_tramo(tabla, fecha, path, encabezado, ini, fin, ingesta_dir, out_dir, cuarentena_dir, umbral):
+    """Valida las filas [ini, fin) del archivo y aplica sus válidas al agregado; devuelve el detalle"""
+    inicio = datetime.now()
+    llegada = os.path.getmtime(path)
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        df = esquema.a_pandas(esquema.leer_tabla(encabezado + mm[ini:fin], ESQUEMAS[tabla]))
+    if tabla == "polizas":
+        validos, invalidos = validar_polizas_df(df)
+    else:
+        validos, invalidos = validar_siniestros_df(df, _polizas_ingeridas(ingesta_dir))
+    # siniestros cuyo único motivo es la póliza inexistente: quizá la póliza todavía no llegó
+    huerfano = (invalidos[COLUMNA_MOTIVOS] == 1 << REGLAS_SINIESTROS.index(REGLA_POLIZA_INEXISTENTE)).to_numpy() \
+        if tabla == "siniestros" else np.zeros(len(invalidos), dtype=bool)
+    huerfanos, invalidos = invalidos[huerfano], invalidos[~huerfano]
+    lote = f"{os.path.basename(path)}@{ini}-{fin}"
+    pct = len(invalidos) / max(1, len(df) - len(huerfanos))
+    detalle = {"tabla": tabla, "archivo": os.path.basename(path), "inicio": ini, "fin": fin, "filas": len(df),
+               "invalidos": len(invalidos), "pendientes": len(huerfanos),
+               "motivos": _conteo_motivos(invalidos, REGLAS[tabla]), "resumen_file": None}
+
+    if pct > umbral:
+        # tramo corrupto: sus bytes van enteros a la cuarentena de archivos, nada al agregado
+        destino = os.path.join(cuarentena_dir, "archivos", f"fecha={fecha}",
+                               f"{cuarentena.lote_de_archivo(path, ini)}.csv")
+        os.makedirs(os.path.dirname(destino), exist_ok=True)
+        with open(path, "rb") as f, open(destino, "wb") as out:
+            f.seek(ini)
+            out.write(encabezado + f.read(fin - ini))
+        detalle.update(estado=CORRUPTO, cuarentena=destino)
+    else:
+        cuarentena.guardar(os.path.join(cuarentena_dir, "filas"), tabla, invalidos, REGLAS[tabla], fecha,
+                           cuarentena.lote_de_archivo(path, ini))
+        if len(huerfanos):
+            # antes del delta: un corte después de aplicarlo no pierde los pendientes
+            _guardar_pendientes(ingesta_dir, fecha, cuarentena.lote_de_archivo(path, ini), "r", 0,
+                                huerfanos.drop(columns=COLUMNA_MOTIVOS), llegada)
+        if tabla == "polizas":
+            _agregar_polizas(ingesta_dir, validos["poliza_id"])
+            pol, sin = validos, _vacio("siniestros")
+        else:
+            pol, sin = _vacio("polizas"), validos
+        resumen = aplicar_delta(_estado_dir(ingesta_dir, fecha), pol, sin, lote=lote)
+        detalle.update(estado=PROCESADO, resumen_file=_escribir_resumen(out_dir, fecha, resumen))
+
+    latencia = time.time() - llegada
+    detalle["latencia_segundos"] = round(latencia, 3)
+    registrar_evento_auditoria(f"ingesta_{tabla}", archivo=lote, registros=len(df), inicio=inicio,
+                               estado="VALIDO" if detalle["estado"] == PROCESADO else CORRUPTO,
+                               mensaje=f"Inválidos: {len(invalidos)} ({pct:.2%}); sin póliza aún: {len(huerfanos)}")
+    registrar_evento_auditoria("latencia_ingesta", archivo=lote, registros=len(df), duracion=latencia,
+                               estado="OK", mensaje="Última escritura del archivo -> resumen actualizado"
+                               if detalle["estado"] == PROCESADO else "Última escritura -> cuarentena")
+    return detalle
+
+
+def _aplicar_resueltos(ingesta_dir, out_dir, fecha, lote, k, path):
+    """Aplica al agregado los siniestros pendientes que encontraron su póliza en la revisión k"""
+    inicio = datetime.now()
+    llegada = os.path.getmtime(path)
+    sin = esquema.leer_arrow(path)
+    resumen = aplicar_delta(_estado_dir(ingesta_dir, fecha), _vacio("polizas"), sin, lote=f"{lote}#pendientes{k}")
+    latencia = time.time() - llegada
+    registrar_evento_auditoria("ingesta_siniestros", archivo=f"{lote}#pendientes{k}", registros=len(sin),
+                               inicio=inicio, estado="VALIDO", mensaje="Siniestros que esperaban su póliza")
+    registrar_evento_auditoria("latencia_ingesta", archivo=f"{lote}#pendientes{k}", registros=len(sin),
+                               duracion=latencia, estado="OK",
+                               mensaje="Última escritura del archivo -> resumen actualizado (esperó la póliza)")
+    os.remove(path)
+    return {"tabla": "siniestros", "archivo": lote, "inicio": k, "fin": k + 1, "filas": len(sin), "invalidos": 0,
+            "pendientes": 0, "motivos": {}, "estado": PROCESADO,
+            "resumen_file": _escribir_resumen(out_dir, fecha, resumen), "latencia_segundos": round(latencia, 3)}
+
+
+def revisar_pendientes(ingesta_dir, out_dir, cuarentena_dir, espera=ESPERA_POLIZA_SEGUNDOS):
+    """
+    Revalida los siniestros que esperan su póliza: los que ya la tienen van al agregado
+    y los que esperaron más de `espera` segundos a la cuarentena. Devuelve el detalle
+    de los aplicados.
+    """
+    base = os.path.join(ingesta_dir, PENDIENTES_DIR)
+    procesados, polizas = [], None
+    for particion in sorted(os.listdir(base)) if os.path.isdir(base) else []:
+        fecha, carpeta = particion.split("=", 1)[1], os.path.join(base, particion)
+        por_lote = {}
+        for nombre in os.listdir(carpeta):
+            m = _PENDIENTE.match(nombre)
+            if m:
+                por_lote.setdefault(m.group(1), []).append((m.group(2), int(m.group(3)), os.path.join(carpeta, nombre)))
+        for lote, archivos in sorted(por_lote.items()):
+            # resueltos de una pasada cortada antes del delta (el lote del delta evita sumarlos dos veces)
+            for tipo, k, path in sorted(archivos):
+                if tipo == "v":
+                    procesados.append(_aplicar_resueltos(ingesta_dir, out_dir, fecha, lote, k, path))
+            restos = sorted((k, path) for tipo, k, path in archivos if tipo == "r")
+            for _, path in restos[:-1]:
+                os.remove(path)  # revisión anterior que un corte no llegó a borrar
+            if not restos:
+                continue
+            k, path = restos[-1]
+            llegada = os.path.getmtime(path)
+            if polizas is None:
+                polizas = _polizas_ingeridas(ingesta_dir)
+            validos, invalidos = validar_siniestros_df(esquema.leer_arrow(path), polizas)
+            vencido = time.time() - llegada >= espera
+            if not len(validos) and not vencido:
+                continue
+            if vencido and len(invalidos):
+                cuarentena.guardar(os.path.join(cuarentena_dir, "filas"), "siniestros", invalidos, REGLAS_SINIESTROS,
+                                   fecha, f"{lote}-pendientes")
+                registrar_evento_auditoria("ingesta_siniestros", archivo=f"{lote}-pendientes", registros=len(invalidos),
+                                           estado="ERROR", mensaje=f"Sin póliza después de {espera:.0f}s: a la cuarentena")
+            resueltos = _guardar_pendientes(ingesta_dir, fecha, lote, "v", k, validos, llegada) if len(validos) else None
+            if len(invalidos) and not vencido:
+                _guardar_pendientes(ingesta_dir, fecha, lote, "r", k + 1, invalidos.drop(columns=COLUMNA_MOTIVOS), llegada)
+            os.remove(path)
+            if resueltos:
+                procesados.append(_aplicar_resueltos(ingesta_dir, out_dir, fecha, lote, k, resueltos))
+    return procesados
+
+
+def procesar_pendientes(entrada_dir, ingesta_dir=None, out_dir=None, cuarentena_dir=None, umbral=0.10,
+                        espera=ESPERA_POLIZA_SEGUNDOS):
+    """
+    Una pasada: procesa las filas nuevas de cada archivo llegado, actualiza el manifiesto
+    y revisa los siniestros que esperan su póliza (ver `revisar_pendientes`).
+    Devuelve el detalle por tramo procesado ([] si otra pasada tiene el lock).
+    """
+    ingesta_dir = ingesta_dir or os.path.join(entrada_dir, "ingesta")
+    out_dir = out_dir or entrada_dir
+    cuarentena_dir = cuarentena_dir or os.path.join(ingesta_dir, "cuarentena")
+    os.makedirs(ingesta_dir, exist_ok=True)
+    os.makedirs(out_dir, exist_ok=True)
+    with open(os.path.join(ingesta_dir, ".lock"), "a") as lock:
+        if fcntl is not None:
+            try:
+                fcntl.flock(lock.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return []
+        manifiesto = leer_manifiesto(ingesta_dir)
+        procesados = []
+        for tabla, fecha, path in pendientes(entrada_dir, manifiesto):
+            nombre = os.path.basename(path)
+            entrada = manifiesto["archivos"].get(nombre, {})
+            st = os.stat(path)
+            encabezado, ini, fin, continua = _tramo_nuevo(path, entrada)
+            aplicado = _aplicado_hasta(ingesta_dir, fecha, nombre, ini) if continua else ini
+            if aplicado > ini:
+                # corte entre el delta y el manifiesto: ese tramo ya está en el agregado, sólo se
+                # valida lo que sigue (si no, un archivo que creció lo reaplicaría con otro rango)
+                entrada = dict(entrada, offset=aplicado, huella=_huella_de(path, aplicado), estado=PROCESADO)
+                ini, fin = aplicado, max(aplicado, fin)
+            if not continua:
+                entrada.update(estado=REESCRITO, bytes=st.st_size, mtime_ns=st.st_mtime_ns)
+                registrar_evento_auditoria(f"ingesta_{tabla}", archivo=nombre, estado="ERROR",
+                                           mensaje=f"Archivo reescrito desde el offset {entrada['offset']}: no se reaplica")
+            elif fin > ini:
+                detalle = procesar_tramo(tabla, fecha, path, encabezado, ini, fin, ingesta_dir, out_dir,
+                                         cuarentena_dir, umbral)
+                procesados.append(detalle)
+                entrada = dict(entrada, offset=fin, huella=_huella_de(path, fin), estado=detalle["estado"],
+                               tramos=entrada.get("tramos", 0) + 1, filas=entrada.get("filas", 0) + detalle["filas"],
+                               procesado=datetime.now().isoformat(timespec="seconds"))
+            if entrada.get("offset") is not None:
+                # bytes/mtime sólo si se llegó al final: si no, la próxima pasada vuelve a mirar
+                if entrada["estado"] == REESCRITO or entrada["offset"] == st.st_size:
+                    entrada.update(bytes=st.st_size, mtime_ns=st.st_mtime_ns)
+                else:
+                    entrada.update(bytes=None, mtime_ns=None)
+                manifiesto["archivos"][nombre] = entrada
+            _guardar_manifiesto(ingesta_dir, manifiesto)
+        return procesados + revisar_pendientes(ingesta_dir, out_dir, cuarentena_dir, espera)
+
+
+def vigilar(entrada_dir, ingesta_dir=None, out_dir=None, cuarentena_dir=None, umbral=0.10,
+            intervalo=INTERVALO_SEGUNDOS, pasadas=None, espera=ESPERA_POLIZA_SEGUNDOS):
+    """Repite `procesar_pendientes` cada `intervalo` segundos (`pasadas` veces, o sin fin)"""
+    n = 0
+    while pasadas is None or n < pasadas:
+        for d in procesar_pendientes(entrada_dir, ingesta_dir, out_dir, cuarentena_dir, umbral, espera):
+            print(f"{d['archivo']}[{d['inicio']}:{d['fin']}] {d['estado']}: {d['filas']} filas, "
+                  f"{d['invalidos']} inválidas, {d['pendientes']} sin póliza aún, latencia {d['latencia_segundos']}s")
+        n += 1
+        if pasadas is None or n < pasadas:
+            time.sleep(intervalo)
+
+
+if __name__ == "__main__":
+    import argparse
+    p = argparse.ArgumentParser(description="Ingesta por micro-lotes de los archivos que llegan al directorio")
+    p.add_argument("--entrada", default="data", help="Directorio donde llegan polizas_*.csv / siniestros_*.csv")
+    p.add_argument("--ingesta", default=None, help="Directorio del manifiesto y el estado (default: <entrada>/ingesta)")
+    p.add_argument("--out", default=None, help="Directorio de los resúmenes (default: --entrada)")
+    p.add_argument("--cuarentena", default=None, help="Raíz de la cuarentena (default: <ingesta>/cuarentena)")
+    p.add_argument("--umbral", type=float, default=0.10)
+    p.add_argument("--vigilar", action="store_true", help="Sigue vigilando cada --intervalo segundos")
+    p.add_argument("--intervalo", type=float, default=INTERVALO_SEGUNDOS)
+    p.add_argument("--espera-poliza", type=float, default=ESPERA_POLIZA_SEGUNDOS,
+                   help="Segundos que un siniestro espera a su póliza antes de ir a la cuarentena")
+    args = p.parse_args()
+    vigilar(args.entrada, args.ingesta, args.out, args.cuarentena, args.umbral, args.intervalo,
+            pasadas=None if args.vigilar else 1, espera=args.espera_poliza)
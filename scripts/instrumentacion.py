@@ -0,0 +1,182 @@
+"""
+Instrumentación por etapa del pipeline (generación, lectura, reglas de validación,
+agregación y escritura de salidas).
+
+Se activa con la variable PIPELINE_PERFILADO o el flag --perfilar de los scripts:
+- "1" / "tiempos": tiempos monotónicos de alta resolución, filas/s y memoria
+- "cprofile": además vuelca un .prof por etapa (abrir con pstats / snakeviz)
+- "tracemalloc": además registra el pico de memoria Python de la etapa y su top de asignaciones
+Los modos se combinan con comas (p. ej. "cprofile,tracemalloc"). cProfile y
+tracemalloc sólo se aplican a la etapa más externa (no admiten anidarse).
+
+Cada etapa medida genera un evento `perfil_<etapa>` en la auditoría y una línea
+JSON en PIPELINE_PERFILADO_DIR/perfil.jsonl. Desactivada, `etapa()` no mide nada.
+"""
+import cProfile
+import json
+import os
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+from types import SimpleNamespace
+
+from scripts.utils_auditoria import registrar_evento_auditoria
+
+MODOS = ("tiempos", "cprofile", "tracemalloc")
+REPORTE_FILE = "perfil.jsonl"
+
+_modos = set()
+_directorio = None
+_profundidad = 0
+_contador = 0
+
+
+def _parsear_modos(valor):
+    valor = (valor or "").strip().lower()
+    if valor in ("", "0", "no", "false"):
+        return set()
+    if valor in ("1", "si", "true"):
+        return {"tiempos"}
+    modos = {m.strip() for m in valor.split(",") if m.strip()}
+    desconocidos = modos - set(MODOS)
+    if desconocidos:
+        raise ValueError(f"Modos de perfilado desconocidos: {sorted(desconocidos)} (disponibles: {MODOS})")
+    return modos | {"tiempos"}
+
+
+def activar(modos="tiempos", directorio=None):
+    """Activa la instrumentación (también en los procesos hijos, vía entorno)"""
+    global _modos, _directorio
+    _modos = _parsear_modos(modos)
+    _directorio = directorio or os.environ.get("PIPELINE_PERFILADO_DIR") or os.path.join("data", "perfilado")
+    os.environ["PIPELINE_PERFILADO"] = ",".join(sorted(_modos)) or "0"
+    os.environ["PIPELINE_PERFILADO_DIR"] = _directorio
+
+
+def desactivar():
+    global _modos
+    _modos = set()
+    os.environ.pop("PIPELINE_PERFILADO", None)
+
+
+def activo():
+    return bool(_modos)
+
+
+def rss_actual_mb():
+    """Memoria residente actual (MB); None fuera de Linux"""
+    try:
+        with open("/proc/self/statm") as f:
+            return round(int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1024**2, 1)
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def pico_rss_mb():
+    """Pico de memoria residente del proceso (MB); None si la plataforma no lo expone"""
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reporta KB, macOS bytes
+    return round(pico / (1024**2 if sys.platform == "darwin" else 1024), 1)
+
+
+def _ruta(nombre):
+    os.makedirs(_directorio, exist_ok=True)
+    return os.path.join(_directorio, nombre)
+
+
+def _escribir_reporte(registro):
+    # una sola escritura por línea en modo append: no se intercalan entre procesos
+    with open(_ruta(REPORTE_FILE), "a", encoding="utf-8") as f:
+        f.write(json.dumps(registro, ensure_ascii=False) + "\n")
+
+
+@contextmanager
+def etapa(nombre, archivo=None, registros=None):
+    """
+    Mide el bloque como etapa `nombre`. Devuelve un objeto cuyo atributo `registros`
+    puede fijarse dentro del bloque cuando el nº de filas se conoce al final.
+    """
+    medicion = SimpleNamespace(registros=registros)
+    if not _modos:
+        yield medicion
+        return
+
+    global _profundidad, _contador
+    externa = _profundidad == 0
+    _profundidad += 1
+    _contador += 1
+    base = f"{nombre}_{os.getpid()}_{_contador}"
+    perfil = cProfile.Profile() if externa and "cprofile" in _modos else None
+    traza = externa and "tracemalloc" in _modos and not tracemalloc.is_tracing()
+    if traza:
+        tracemalloc.start()
+    rss_inicio = rss_actual_mb()
+    inicio_dt = datetime.now()
+    estado = "OK"
+    inicio = time.perf_counter()
+    if perfil:
+        perfil.enable()
+    try:
+        yield medicion
+    except BaseException:
+        estado = "ERROR"
+        raise
+    finally:
+        if perfil:
+            perfil.disable()
+        segundos = time.perf_counter() - inicio
+        _profundidad -= 1
+        filas = medicion.registros
+        registro = {
+            "etapa": nombre,
+            "archivo": archivo,
+            "registros": filas,
+            "estado": estado,
+            "inicio": inicio_dt.isoformat(timespec="microseconds"),
+            "segundos": segundos,
+            "filas_por_segundo": round(filas / segundos, 1) if filas and segundos > 0 else None,
+            "rss_inicio_mb": rss_inicio,
+            "rss_fin_mb": rss_actual_mb(),
+            "pico_rss_mb": pico_rss_mb(),
+            "pid": os.getpid(),
+        }
+        if traza:
+            foto = tracemalloc.take_snapshot()
+            registro["pico_tracemalloc_mb"] = round(tracemalloc.get_traced_memory()[1] / 1024**2, 1)
+            tracemalloc.stop()
+            with open(_ruta(f"{base}.tracemalloc.txt"), "w", encoding="utf-8") as f:
+                f.writelines(f"{s}\n" for s in foto.statistics("lineno")[:25])
+        if perfil:
+            registro["cprofile"] = _ruta(f"{base}.prof")
+            perfil.dump_stats(registro["cprofile"])
+        _escribir_reporte(registro)
+        mensaje = f"{segundos:.6f}s"
+        if registro["filas_por_segundo"]:
+            mensaje += f" {registro['filas_por_segundo']:,.0f} filas/s"
+        mensaje += f" pico RSS: {registro['pico_rss_mb']} MB"
+        if "pico_tracemalloc_mb" in registro:
+            mensaje += f" pico tracemalloc: {registro['pico_tracemalloc_mb']} MB"
+        registrar_evento_auditoria(f"perfil_{nombre}", archivo=archivo, registros=filas, estado=estado,
+                                   mensaje=mensaje, duracion=segundos)
+
+
+def agregar_argumento(parser):
+    """Flag --perfilar [MODOS] común a los CLI"""
+    parser.add_argument("--perfilar", nargs="?", const="tiempos", default=None, metavar="MODOS",
+                        help="Instrumenta las etapas: tiempos (default), cprofile, tracemalloc (separados por coma)")
+
+
+def desde_argumentos(args):
+    if args.perfilar:
+        activar(args.perfilar)
+
+
+# activación por entorno (también hereda la de un proceso padre)
+if os.environ.get("PIPELINE_PERFILADO"):
+    activar(os.environ["PIPELINE_PERFILADO"])
@@ -0,0 +1,112 @@
+"""
+Motor PySpark (modo local) de `transformaciones`.
+
+Lee los CSV con Spark y calcula los mismos agregados por producto que
+`transformaciones.resumen_por_producto` (siniestros pre-agregados por poliza_id y
+proyectados sobre las pólizas con peso max(1, k), importes en centavos enteros);
+sólo el agregado final, de pocas filas, vuelve a pandas y pasa por
+`armar_resumen`, así la salida es idéntica a la del motor pandas.
+
+pyspark es opcional: este módulo sólo se importa con --engine spark.
+"""
+import os
+import threading
+
+import pyarrow as pa
+import pyarrow.csv as pacsv
+import pyarrow.feather as feather
+from pyspark.sql import SparkSession, functions as F, types as T
+
+from scripts import esquema
+
+# núcleos del modo local (local[*] por defecto)
+SPARK_MASTER = os.environ.get("PIPELINE_SPARK_MASTER", "local[*]")
+# Arrow convierte a nulo estos textos al parsear; Spark debe hacer lo mismo
+NULOS = list(pacsv.ConvertOptions().null_values)
+
+_sesion = None
+_sesion_lock = threading.Lock()
+
+
+def sesion():
+    """SparkSession local, creada una vez por proceso"""
+    global _sesion
+    with _sesion_lock:
+        if _sesion is None:
+            nucleos = os.cpu_count() or 1
+            _sesion = (SparkSession.builder
+                       .master(SPARK_MASTER)
+                       .appName("pipeline_polizas")
+                       .config("spark.sql.shuffle.partitions", str(2 * nucleos))
+                       .config("spark.ui.enabled", "false")
+                       .config("spark.sql.execution.arrow.pyspark.enabled", "true")
+                       .getOrCreate())
+        return _sesion
+
+
+def detener():
+    global _sesion
+    with _sesion_lock:
+        if _sesion is not None:
+            _sesion.stop()
+            _sesion = None
+
+
+def _esquema_spark(esq):
+    # todo como texto y se castea después: un valor sucio queda nulo, como en el lector Arrow
+    return T.StructType([T.StructField(c.nombre, T.StringType(), True) for c in esq])
+
+
+def _leer_arrow(path, esq):
+    """Tabla .arrow de filas validadas -> DataFrame Spark (vía Arrow, sin parsear CSV)"""
+    tabla = feather.read_table(path, columns=[c.nombre for c in esq], memory_map=True)
+    # categorías y fechas como texto; los importes siguen siendo float64
+    tabla = tabla.cast(pa.schema([pa.field(f.name, pa.float64() if pa.types.is_floating(f.type) else pa.string())
+                                  for f in tabla.schema]))
+    return sesion().createDataFrame(tabla.to_pandas())
+
+
+def leer(path, esq):
+    """(DataFrame Spark cacheado, nº de filas) con nulos y números coercionados como el lector Arrow"""
+    if esquema.es_arrow(path):
+        df = _leer_arrow(path, esq).cache()
+        return df, df.count()
+    df = sesion().read.csv(path, header=True, schema=_esquema_spark(esq), mode="PERMISSIVE")
+    for c in esq:
+        col = F.when(F.col(c.nombre).isin(NULOS) | (F.col(c.nombre) == ""), None).otherwise(F.col(c.nombre))
+        if c.tipo == "decimal":
+            col = col.cast("double")
+        df = df.withColumn(c.nombre, col)
+    df = df.cache()
+    return df, df.count()
+
+
+def _centavos(col):
+    # bround = mitad al par, como np.rint; nulos y no numéricos -> 0
+    return F.coalesce(F.bround(col.cast("double") * 100, 0).cast("long"), F.lit(0).cast("long"))
+
+
+def resumen_por_producto(polizas_df, siniestros_df):
+    """Mismo resultado que `transformaciones.resumen_por_producto` sobre DataFrames Spark"""
+    from scripts.transformaciones import armar_resumen  # evita import circular
+
+    por_poliza = siniestros_df.groupBy("poliza_id").agg(
+        F.count(F.lit(1)).alias("k"),
+        F.count("siniestro_id").alias("c"),
+        F.sum(_centavos(F.col("monto_reclamado"))).alias("m"),
+    ).withColumnRenamed("poliza_id", "poliza_id_sin")
+
+    # igualdad segura con nulos: poliza_id nulo empareja con nulo, igual que el merge de pandas
+    combinado = (polizas_df
+                 .where(F.col("producto").isNotNull())
+                 .join(por_poliza, F.col("poliza_id").eqNullSafe(F.col("poliza_id_sin")), "left")
+                 .withColumn("w", F.greatest(F.lit(1).cast("long"), F.coalesce(F.col("k"), F.lit(0).cast("long")))))
+
+    agg = combinado.groupBy("producto").agg(
+        F.coalesce(F.sum("c"), F.lit(0)).alias("total_siniestros"),
+        F.coalesce(F.sum("m"), F.lit(0)).alias("monto_cent"),
+        F.sum(_centavos(F.col("prima_mensual")) * F.col("w")).alias("prima_cent"),
+        F.sum("w").alias("filas"),
+        F.countDistinct("poliza_id").alias("total_polizas"),
+    ).toPandas()
+    return armar_resumen(agg)
@@ -0,0 +1,107 @@
+"""
+Pre-chequeo por muestreo del umbral de CORRUPTO (`validacion.validar_archivos(..., muestreo_previo=True)`).
+
+Valida una muestra estratificada de filas: el archivo se parte en n tramos de bytes
+iguales y de cada uno se toma la primera fila que empieza después de un byte al
+azar, así la muestra cubre todo el archivo sin leerlo entero (mmap + búsqueda de
+saltos de línea). Con un intervalo de Wilson a la `confianza` pedida:
+- cota inferior de la tasa de error > umbral -> CORRUPTO sin escaneo completo
+- cota superior <= umbral -> VALIDO probable: escaneo completo (hacen falta las filas válidas)
+- si no, la muestra crece (MUESTRA_INICIAL, x4, ... hasta MUESTRA_MAX) y al final
+  queda NO_CONCLUYENTE -> escaneo completo
+La confianza se reparte entre las etapas (Bonferroni): mirar varias veces no la infla.
+
+Siniestros: sólo las reglas del esquema (poliza_inexistente necesita todas las pólizas
+válidas); la tasa de la muestra es una cota inferior, así un CORRUPTO anticipado
+sigue siendo correcto. Supone filas de una línea (sin saltos de línea entre comillas),
+como las que escribe el generador.
+"""
+import math
+import mmap
+import os
+from statistics import NormalDist
+
+import numpy as np
+
+from scripts import esquema
+
+MUESTRA_INICIAL = 1_000
+MUESTRA_MAX = 16_000
+CRECIMIENTO = 4
+CONFIANZA = 0.99
+# archivos más chicos se validan completos: muestrear no ahorra nada
+MIN_BYTES = 4 * 1024**2
+
+CORRUPTO = "CORRUPTO"
+VALIDO = "VALIDO"
+NO_CONCLUYENTE = "NO_CONCLUYENTE"
+OMITIDO = "OMITIDO"
+
+
+def etapas(maximo=MUESTRA_MAX, inicial=MUESTRA_INICIAL):
+    """Tamaños de muestra sucesivos: inicial, inicial*CRECIMIENTO, ... hasta `maximo`"""
+    tamanios = [min(inicial, maximo)]
+    while tamanios[-1] < maximo:
+        tamanios.append(min(tamanios[-1] * CRECIMIENTO, maximo))
+    return tamanios
+
+
+def intervalo(invalidos, n, confianza=CONFIANZA):
+    """(inferior, superior) de Wilson para la tasa invalidos/n; cada cota a `confianza` (una cola)"""
+    if n == 0:
+        return 0.0, 1.0
+    z = NormalDist().inv_cdf(confianza)
+    p = invalidos / n
+    centro = (p + z * z / (2 * n)) / (1 + z * z / n)
+    margen = z / (1 + z * z / n) * math.sqrt(p * (1 - p) / n + z * z / (4 * n * n))
+    return max(0.0, centro - margen), min(1.0, centro + margen)
+
+
+def leer_muestra(path, esq, n, rng):
+    """DataFrame tipado con ~n filas del CSV tomadas por tramos de bytes (sin repetir filas)"""
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        datos = mm.find(b"\n") + 1
+        tam = len(mm) - datos
+        bordes = datos + (np.arange(n + 1, dtype=np.int64) * tam) // n
+        offsets = rng.integers(bordes[:-1], np.maximum(bordes[1:], bordes[:-1] + 1))
+        inicios = set()
+        for off in offsets.tolist():
+            # inicio de la primera fila en o después de `off` (no la fila que contiene el byte:
+            # eso favorecería las filas largas)
+            ini = mm.find(b"\n", off - 1) + 1
+            if datos <= ini < len(mm):
+                inicios.add(ini)
+        filas = []
+        for ini in sorted(inicios):
+            fin = mm.find(b"\n", ini)
+            filas.append(mm[ini:len(mm) if fin < 0 else fin].rstrip(b"\r"))
+        contenido = mm[:datos] + b"\n".join(filas) + b"\n"
+    return esquema.a_pandas(esquema.leer_tabla(contenido, esq))
+
+
+def prechequear(path, esq, motivos, umbral, confianza=CONFIANZA, rng=None, maximo=MUESTRA_MAX):
+    """
+    Decide CORRUPTO / VALIDO / NO_CONCLUYENTE (u OMITIDO si el archivo es chico) con una
+    muestra creciente. `motivos(df)` -> máscara de reglas incumplidas (0 = válida).
+    Devuelve {"estado", "muestra", "invalidos", "intervalo", "df", "motivos"} de la última etapa.
+    """
+    rng = rng or np.random.default_rng()
+    res = {"estado": OMITIDO, "muestra": 0, "invalidos": 0, "intervalo": (0.0, 1.0), "df": None, "motivos": None}
+    if os.path.getsize(path) < MIN_BYTES:
+        return res
+    tamanios = etapas(maximo)
+    por_etapa = 1 - (1 - confianza) / len(tamanios)  # Bonferroni
+    for n in tamanios:
+        df = leer_muestra(path, esq, n, rng)
+        mascara = motivos(df)
+        invalidos = int(np.count_nonzero(mascara))
+        inferior, superior = intervalo(invalidos, len(df), por_etapa)
+        res.update(muestra=len(df), invalidos=invalidos, intervalo=(inferior, superior), df=df, motivos=mascara)
+        if inferior > umbral:
+            res["estado"] = CORRUPTO
+            return res
+        if superior <= umbral:
+            res["estado"] = VALIDO
+            return res
+    res["estado"] = NO_CONCLUYENTE
+    return res
@@ -0,0 +1,186 @@
+"""
+Pipeline de punta a punta en memoria para pruebas de carga y de resistencia:
+generación -> validación -> resumen por producto sobre lotes columnares, sin la ida y
+vuelta por CSV (serializar y re-parsear se lleva casi todo el tiempo de una corrida).
+
+- Los lotes de generar_datos.lotes_polizas / lotes_siniestros se tipan con el esquema
+  (los mismos tipos Arrow que da el lector CSV) y pasan por las mismas funciones que el
+  pipeline de archivos: validar_polizas_df / validar_siniestros_df.
+- Resumen: resumen_por_producto al final sobre las columnas que usa (poliza_id,
+  producto, prima_mensual / siniestro_id, poliza_id, monto_reclamado) de los válidos.
+  Con `estado_dir` va en cambio lote a lote por agregado_incremental.aplicar_delta: la
+  memoria no crece con las filas (para corridas de resistencia), a costa de escribir
+  el estado en cada lote.
+- Las pólizas van primero: los siniestros se generan contra sus IDs y se validan
+  contra el índice de pólizas válidas (IndiceIds: 2 x 16 bytes por póliza en total).
+- `tee_dir`: escribe además los lotes crudos en streaming como
+  polizas_/siniestros_<fecha>.csv[.gz|.zst]; validarlos con el pipeline de archivos da
+  los mismos conteos y el mismo resumen.
+"""
+import os
+import sys
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pacsv
+
+# allow running directly
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from scripts import entradas, esquema, instrumentacion
+from scripts.agregado_incremental import aplicar_delta, cargar_estado, resumen_desde_estado
+from scripts.generar_datos import CHUNK_FILAS, POL_COLS, SIN_COLS, lotes_polizas, lotes_siniestros
+from scripts.indice_ids import IndiceIds
+from scripts.transformaciones import resumen_por_producto
+from scripts.utils_auditoria import registrar_evento_auditoria
+from scripts.validacion import (REGLAS_POLIZAS, REGLAS_SINIESTROS, _conteo_motivos, _sumar_conteos,
+                                validar_polizas_df, validar_siniestros_df)
+
+ESQUEMAS = {"polizas": esquema.POLIZAS, "siniestros": esquema.SINIESTROS}
+REGLAS = {"polizas": REGLAS_POLIZAS, "siniestros": REGLAS_SINIESTROS}
+# columnas que usa resumen_por_producto: las únicas que se retienen de los válidos
+COLUMNAS_RESUMEN = {"polizas": ["poliza_id", "producto", "prima_mensual"],
+                    "siniestros": ["siniestro_id", "poliza_id", "monto_reclamado"]}
+
+
+def _esquema_arrow(esq):
+    return pa.schema([(c.nombre, esquema.TIPOS_ARROW[c.tipo]) for c in esq])
+
+
+def _tipar(lote, tabla):
+    """Lote generado -> DataFrame con los mismos tipos que la lectura del CSV"""
+    return esquema.a_pandas(lote.cast(_esquema_arrow(ESQUEMAS[tabla])))
+
+
+def _tee(lotes, tee_dir, tabla, date_str, columnas, compresion=None):
+    """Devuelve los lotes tal cual; con `tee_dir` los escribe además como CSV (mismo layout que generar_datos)"""
+    if tee_dir is None:
+        yield from lotes
+        return
+    os.makedirs(tee_dir, exist_ok=True)
+    path = os.path.join(tee_dir, f"{tabla}_{date_str}.csv{entradas.EXTENSIONES.get(compresion, '')}")
+    opciones = pacsv.WriteOptions(include_header=False, quoting_style="none")
+    with pa.output_stream(path, compression=compresion) as salida:
+        salida.write((",".join(columnas) + "\n").encode("utf-8"))
+        writer = None
+        for lote in lotes:
+            writer = writer or pacsv.CSVWriter(salida, lote.schema, write_options=opciones)
+            writer.write_table(lote)
+            yield lote
+        if writer is not None:
+            writer.close()
+
+
+def lotes_validados(n_polizas, n_siniestros, fecha, err_rate=0.05, seed=None, chunk_size=CHUNK_FILAS,
+                    tee_dir=None, compresion=None):
+    """Generador de (tabla, válidos, inválidos) por lote: todas las pólizas y después los siniestros"""
+    date_str = fecha.strftime("%Y%m%d")
+    seed_pol, seed_sin = np.random.SeedSequence(seed).spawn(2)
+    generados = IndiceIds()  # IDs no vacíos generados: a los que apuntan los siniestros
+    validos_idx = IndiceIds()
+    lotes = lotes_polizas(n_polizas, fecha, err_rate, np.random.default_rng(seed_pol), chunk_size)
+    for lote in _tee(lotes, tee_dir, "polizas", date_str, POL_COLS, compresion):
+        generados.agregar(lote.column("poliza_id"))
+        validos, invalidos = validar_polizas_df(_tipar(lote, "polizas"))
+        validos_idx.agregar(validos["poliza_id"])
+        yield "polizas", validos, invalidos
+
+    lotes = lotes_siniestros(n_siniestros, fecha, generados, err_rate, np.random.default_rng(seed_sin), chunk_size)
+    for lote in _tee(lotes, tee_dir, "siniestros", date_str, SIN_COLS, compresion):
+        validos, invalidos = validar_siniestros_df(_tipar(lote, "siniestros"), validos_idx)
+        yield "siniestros", validos, invalidos
+
+
+def _vacio(tabla):
+    return esquema.a_pandas(_esquema_arrow(ESQUEMAS[tabla]).empty_table())
+
+
+def ejecutar(n_polizas, n_siniestros, fecha=None, seed=None, err_rate=0.05, chunk_size=CHUNK_FILAS, umbral=0.10,
+             estado_dir=None, tee_dir=None, compresion=None, out_dir=None):
+    """
+    Corre el pipeline en memoria y devuelve los conteos de `validar_archivos` (totales,
+    inválidos, motivos por regla, estado según `umbral`), el `resumen` por producto,
+    `segundos` y `filas_por_segundo`. Con `out_dir` escribe resumen_producto_<fecha>.csv.
+    - estado_dir: resumen incremental lote a lote en ese directorio; los lotes se
+      identifican por fecha y número, así reanudar no los suma dos veces
+    """
+    inicio = datetime.now()
+    t0 = time.perf_counter()
+    fecha = fecha or inicio.date()
+    date_str = fecha.strftime("%Y%m%d")
+    res = {"pol_total": 0, "pol_invalidos": 0, "sin_total": 0, "sin_invalidos": 0,
+           "pol_motivos": {}, "sin_motivos": {}, "estado": "VALIDO"}
+    retenidos = {"polizas": [], "siniestros": []}
+    vacios = {tabla: _vacio(tabla) for tabla in ESQUEMAS}
+
+    lotes = lotes_validados(n_polizas, n_siniestros, fecha, err_rate, seed, chunk_size, tee_dir, compresion)
+    for i, (tabla, validos, invalidos) in enumerate(lotes):
+        clave = "pol" if tabla == "polizas" else "sin"
+        res[f"{clave}_total"] += len(validos) + len(invalidos)
+        res[f"{clave}_invalidos"] += len(invalidos)
+        _sumar_conteos(res[f"{clave}_motivos"], _conteo_motivos(invalidos, REGLAS[tabla]))
+        if estado_dir:
+            pol, sin = (validos, vacios["siniestros"]) if tabla == "polizas" else (vacios["polizas"], validos)
+            aplicar_delta(estado_dir, pol, sin, lote=f"memoria-{date_str}@{i}-{i + 1}")
+        else:
+            retenidos[tabla].append(validos[COLUMNAS_RESUMEN[tabla]])
+    if estado_dir:
+        res["resumen"] = resumen_desde_estado(cargar_estado(estado_dir))
+    else:
+        pol, sin = (esquema.aplicar_tipos(pd.concat(retenidos[t] or [vacios[t][COLUMNAS_RESUMEN[t]]],
+                                                    ignore_index=True), ESQUEMAS[t])
+                    for t in ("polizas", "siniestros"))
+        res["resumen"] = resumen_por_producto(pol, sin)
+
+    for clave in ("pol", "sin"):
+        if res[f"{clave}_invalidos"] / max(1, res[f"{clave}_total"]) > umbral:
+            res["estado"] = "CORRUPTO"
+    if out_dir:
+        os.makedirs(out_dir, exist_ok=True)
+        res["resumen_file"] = os.path.join(out_dir, f"resumen_producto_{date_str}.csv")
+        with instrumentacion.etapa("escritura_resumen", archivo=os.path.basename(res["resumen_file"]),
+                                   registros=len(res["resumen"])):
+            res["resumen"].to_csv(res["resumen_file"], index=False)
+    filas = res["pol_total"] + res["sin_total"]
+    res["segundos"] = round(time.perf_counter() - t0, 3)
+    res["filas_por_segundo"] = round(filas / max(res["segundos"], 1e-9))
+    registrar_evento_auditoria(
+        etapa="pipeline_memoria",
+        archivo=date_str,
+        registros=filas,
+        inicio=inicio,
+        estado=res["estado"],
+        mensaje=f"Inválidos pol:{res['pol_invalidos']} sin:{res['sin_invalidos']}; "
+                f"{res['filas_por_segundo']} filas/s; resumen {'incremental' if estado_dir else 'completo'}"
+                + (f"; copia en {tee_dir}" if tee_dir else "")
+    )
+    return res
+
+
+if __name__ == "__main__":
+    import argparse
+    p = argparse.ArgumentParser(description="Pipeline generación -> validación -> resumen en memoria (sin CSV)")
+    p.add_argument("--n-polizas", type=int, default=10000)
+    p.add_argument("--n-siniestros", type=int, default=2000)
+    p.add_argument("--seed", type=int, default=None, help="Semilla para salida reproducible")
+    p.add_argument("--err-rate", type=float, default=0.05, help="Tasa base de errores inyectados")
+    p.add_argument("--chunk", type=int, default=CHUNK_FILAS, help="Filas por lote")
+    p.add_argument("--umbral", type=float, default=0.10)
+    p.add_argument("--estado", default=None,
+                   help="Resumen incremental lote a lote en este directorio (memoria acotada)")
+    p.add_argument("--tee", default=None, help="Escribe además los lotes crudos como CSV en este directorio")
+    p.add_argument("--compresion", choices=sorted(entradas.EXTENSIONES), default=None, help="Compresión de --tee")
+    p.add_argument("--out", default=None, help="Directorio del resumen_producto_<fecha>.csv")
+    instrumentacion.agregar_argumento(p)
+    args = p.parse_args()
+    instrumentacion.desde_argumentos(args)
+
+    res = ejecutar(args.n_polizas, args.n_siniestros, seed=args.seed, err_rate=args.err_rate,
+                   chunk_size=args.chunk, umbral=args.umbral, estado_dir=args.estado,
+                   tee_dir=args.tee, compresion=args.compresion, out_dir=args.out)
+    print(f"Estado: {res['estado']} | pólizas {res['pol_total']} ({res['pol_invalidos']} inválidas) | "
+          f"siniestros {res['sin_total']} ({res['sin_invalidos']} inválidos) | "
+          f"{res['segundos']}s, {res['filas_por_segundo']} filas/s")
+    print(res["resumen"].to_string(index=False))
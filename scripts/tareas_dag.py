@@ -0,0 +1,296 @@
+"""
+Callables de las tareas del DAG `pipeline_polizas`, sin dependencia de Airflow:
+el DAG sólo los envuelve en operadores y el benchmark los ejecuta con un `ti` simulado.
+Se comunican por XCom (ti.xcom_push / ti.xcom_pull); contrato de claves:
+- preparar_archivos   -> pol_path, sin_path (CSV crudos del día: planos, comprimidos o patrón de partes)
+- validar_archivos    -> validacion_resumen (conteos, motivos, camino: muestra | completo, duplicados de
+                         días anteriores), cuarentena_dir, valid_pol_path, valid_sin_path (filas válidas:
+                         .arrow, o CSV en streaming)
+- transformar         <- valid_pol_path, valid_sin_path, pol_path (sólo la fecha)
+                      -> resumen_file, audit_file, cubo_files ({tabla: parquet}; vacío sin cubos)
+- cargar_bq           <- resumen_file, cubo_files, valid_pol_path, valid_sin_path (IDs al historial) -> carga
+- mover_cuarentena    <- pol_path, sin_path, cuarentena_dir -> cuarentena_motivos
+DAG `pipeline_microlotes`:
+- ingestar            -> ingesta (tramos procesados y particiones de resumen_producto_microlotes cargadas)
+"""
+import functools
+import os
+import shutil
+import time
+from datetime import datetime
+
+from scripts import (carga, cubo, cuarentena, entradas, filtro_duplicados, ingesta, validacion, transformaciones, generar_datos,
+                     utils_auditoria)
+from scripts.utils_auditoria import registrar_evento_auditoria, vaciar_auditoria, ultimos_eventos
+
+DATA_DIR = os.environ.get("PIPELINE_DATA_DIR", "/opt/airflow/data")
+QUARANTINE_DIR = os.environ.get("PIPELINE_QUARANTINE_DIR", "/opt/airflow/quarantine")
+# validación por chunks con memoria acotada (archivos mayores que la RAM del worker)
+VALIDACION_STREAMING = os.environ.get("PIPELINE_VALIDACION_STREAMING", "0") == "1"
+# pre-chequeo por muestra (opt-in): un archivo claramente corrupto va a cuarentena sin validarlo
+# entero; en ese camino los totales del archivo no se conocen (quedan en None)
+VALIDACION_MUESTREO = os.environ.get("PIPELINE_VALIDACION_MUESTREO", "0") == "1"
+# procesos de la validación por tramos; por defecto 1 (en serie): el pool es opt-in porque cada
+# worker copia sus tramos a /dev/shm (~2x memoria) y falta medirlo en varios núcleos
+VALIDACION_WORKERS = int(os.environ.get("PIPELINE_VALIDACION_WORKERS", 1))
+
+
+def _destino_carga():
+    # SQLite local junto a los datos salvo que se configure (p. ej. bigquery://proyecto.dataset)
+    return os.environ.get("PIPELINE_CARGA_DESTINO") or os.path.join(DATA_DIR, "warehouse.db")
+
+
+def _validos_dir():
+    return os.path.join(DATA_DIR, "validacion")
+
+
+def _historial_dir():
+    # filtro de IDs ya recibidos (duplicados entre días); persiste entre corridas
+    return os.environ.get("PIPELINE_HISTORIAL_DIR") or os.path.join(DATA_DIR, "historial_ids")
+
+
+def _ingesta_dir():
+    # manifiesto de offsets, índice de pólizas, estado incremental por fecha, resúmenes y
+    # cuarentena de la ingesta por micro-lotes
+    return os.environ.get("PIPELINE_INGESTA_DIR") or os.path.join(DATA_DIR, "ingesta")
+
+
+def _ingesta_entrada_dir():
+    # directorio propio de llegada: en DATA_DIR el DAG diario genera datos de prueba y mueve
+    # a cuarentena archivos enteros que la ingesta podría estar leyendo por offset
+    return os.environ.get("PIPELINE_INGESTA_ENTRADA_DIR") or os.path.join(_ingesta_dir(), "entrada")
+
+
+def _cuarentena_filas():
+    return os.path.join(QUARANTINE_DIR, "filas")
+
+
+def _cuarentena_archivos(fecha):
+    return os.path.join(QUARANTINE_DIR, "archivos", f"fecha={fecha}")
+
+
+def con_auditoria(fn):
+    """El runner de Airflow cierra la tarea con os._exit (sin atexit): vuelca la auditoría al terminar"""
+    @functools.wraps(fn)
+    def tarea(**ctx):
+        try:
+            return fn(**ctx)
+        finally:
+            vaciar_auditoria()
+    return tarea
+
+
+def preparar_archivos(**ctx):
+    inicio = datetime.now()
+    date = datetime.now().strftime("%Y%m%d")
+    # CSV plano, comprimido (.gz / .zst) o patrón de sus partes (ver scripts/entradas.py)
+    pol_path = entradas.buscar(DATA_DIR, "polizas", date)
+    sin_path = entradas.buscar(DATA_DIR, "siniestros", date)
+
+    os.makedirs(DATA_DIR, exist_ok=True)
+    if not (pol_path and sin_path):
+        p, s = generar_datos.generar_csvs(DATA_DIR, date=datetime.today().date())
+        pol_path, sin_path = p, s
+
+    ctx["ti"].xcom_push(key="pol_path", value=pol_path)
+    ctx["ti"].xcom_push(key="sin_path", value=sin_path)
+
+    registrar_evento_auditoria("preparar_archivos",
+                               archivo=f"{os.path.basename(pol_path)},{os.path.basename(sin_path)}",
+                               registros=0, inicio=inicio, estado="OK",
+                               mensaje="Archivos preparados/generados")
+
+
+def validar_archivos_task(**ctx):
+    inicio = datetime.now()
+    ti = ctx["ti"]
+    pol = ti.xcom_pull(key="pol_path")
+    sin = ti.xcom_pull(key="sin_path")
+    # los inválidos van a la cuarentena particionada (por fecha y motivo), no a /tmp
+    if VALIDACION_STREAMING:
+        res = validacion.validar_archivos_streaming(pol, sin, _validos_dir(), umbral=0.10,
+                                                    cuarentena_dir=_cuarentena_filas(),
+                                                    muestreo_previo=VALIDACION_MUESTREO,
+                                                    historial_dir=_historial_dir())
+    else:
+        res = validacion.validar_archivos(pol, sin, umbral=0.10, cuarentena_dir=_cuarentena_filas(),
+                                          validos_dir=_validos_dir(), muestreo_previo=VALIDACION_MUESTREO,
+                                          historial_dir=_historial_dir(), workers=VALIDACION_WORKERS)
+    ti.xcom_push(key="validacion_resumen", value={
+        "estado": res["estado"],
+        "pol_total": res["pol_total"],
+        "pol_invalidos": res["pol_invalidos"],
+        "sin_total": res["sin_total"],
+        "sin_invalidos": res["sin_invalidos"],
+        "pol_motivos": res["pol_motivos"],
+        "sin_motivos": res["sin_motivos"],
+        "camino": res["camino"],
+        "muestreo": res.get("muestreo"),
+        "duplicados": {tabla: d["confirmados"] for tabla, d in res.get("duplicados", {}).items()},
+    })
+    ti.xcom_push(key="cuarentena_dir", value=_cuarentena_filas())
+    # sólo rutas por XCom: transformar lee las filas válidas de disco, sin volver a parsear el CSV
+    ti.xcom_push(key="valid_pol_path", value=res["valid_pol_path"])
+    ti.xcom_push(key="valid_sin_path", value=res["valid_sin_path"])
+
+    registrar_evento_auditoria("validar_archivos",
+                               archivo=f"{os.path.basename(pol)},{os.path.basename(sin)}",
+                               registros=(res["pol_total"] or 0) + (res["sin_total"] or 0),
+                               inicio=inicio, estado=res["estado"],
+                               mensaje=f"Inválidos pol:{res['pol_invalidos']} sin:{res['sin_invalidos']} "
+                                       f"(camino: {res['camino']})")
+    return res["estado"]
+
+
+def decidir_fn(**ctx):
+    inicio = datetime.now()
+    ti = ctx["ti"]
+    resumen = ti.xcom_pull(key="validacion_resumen")
+    estado = resumen.get("estado", "CORRUPTO")
+    if estado == "VALIDO":
+        registrar_evento_auditoria("decidir_procesar", inicio=inicio, estado="OK", mensaje="Procesar")
+        return "transformar"
+    else:
+        registrar_evento_auditoria("decidir_procesar", inicio=inicio, estado="CORRUPTO", mensaje="Cuarentena")
+        return "mover_cuarentena"
+
+
+def transformar_task(**ctx):
+    inicio = datetime.now()
+    ti = ctx["ti"]
+    # sólo filas que pasaron la validación; el CSV crudo únicamente da la fecha del resumen
+    pol = ti.xcom_pull(key="valid_pol_path")
+    sin = ti.xcom_pull(key="valid_sin_path")
+    fecha_tag = cuarentena.fecha_de_archivo(ti.xcom_pull(key="pol_path"))
+    # motor de los params del DAG (sobrescribibles con la conf del dag_run) o PIPELINE_MOTOR
+    params = ctx.get("params") or {}
+    engine = params.get("motor") or transformaciones.MOTOR
+    # los cubos se calculan con pandas; con el motor spark se omiten
+    cubos = bool(params.get("cubos", True)) and engine == "pandas"
+    # main devuelve sólo la ruta del resumen; la auditoría va al destino configurado
+    resumen_file = transformaciones.main(pol, sin, DATA_DIR, fecha_tag=fecha_tag, engine=engine, cubos=cubos)
+    ti.xcom_push(key="resumen_file", value=resumen_file)
+    ti.xcom_push(key="cubo_files", value={t: cubo.ruta(DATA_DIR, t, fecha_tag) for t in cubo.DIMENSIONES} if cubos else {})
+    ti.xcom_push(key="audit_file", value=utils_auditoria.AUDITORIA_FILE)
+    registrar_evento_auditoria("transformar", archivo=os.path.basename(resumen_file), registros=0, inicio=inicio, estado="OK")
+
+
+def cargar_bq_task(**ctx):
+    """Reemplaza la partición del día en resumen_producto_diario, los cubos y auditoria_proceso (idempotente ante reintentos)"""
+    inicio = datetime.now()
+    ti = ctx["ti"]
+    resumen = ti.xcom_pull(key="resumen_file")
+    destino = _destino_carga()
+    process_date = cuarentena.fecha_de_archivo(resumen)
+    filas_resumen = carga.cargar_resumen(resumen, process_date, destino=destino)
+    filas_cubos = {tabla: carga.cargar_cubo(path, tabla, process_date, destino=destino)
+                   for tabla, path in (ti.xcom_pull(key="cubo_files") or {}).items()}
+    filas_auditoria = carga.cargar_auditoria([process_date], destino=destino)
+    # los IDs del día entran al historial sólo tras una carga exitosa (un reintento reemplaza la fecha)
+    validos = {"polizas": ti.xcom_pull(key="valid_pol_path"), "siniestros": ti.xcom_pull(key="valid_sin_path")}
+    for entidad, path in validos.items():
+        if path:
+            filtro_duplicados.registrar(_historial_dir(), entidad,
+                                        filtro_duplicados.ids_de_archivo(path, filtro_duplicados.ENTIDADES[entidad]),
+                                        process_date)
+    ti.xcom_push(key="carga", value={"destino": destino, "process_date": process_date,
+                                     "resumen": filas_resumen, "cubos": filas_cubos, "auditoria": filas_auditoria})
+    registrar_evento_auditoria("cargar_bq", archivo=os.path.basename(resumen), registros=filas_resumen,
+                               inicio=inicio, estado="OK",
+                               mensaje=f"Partición {process_date} cargada en {destino}")
+
+
+def auditoria_task(**ctx):
+    inicio = datetime.now()
+    # sólo la cola: con auditoría segmentada se lee el segmento más nuevo, no todo el historial
+    df = ultimos_eventos(5)
+    if len(df):
+        print("AUDITORÍA (últimas líneas):")
+        print(df.to_string(index=False))
+    registrar_evento_auditoria("auditoria", archivo=os.path.basename(os.path.normpath(utils_auditoria.AUDITORIA_FILE)),
+                               registros=0, inicio=inicio, estado="OK")
+
+
+def mover_cuarentena_task(**ctx):
+    """Mueve los CSV de origen rechazados a QUARANTINE_DIR/archivos/fecha=... y reporta los motivos"""
+    inicio = datetime.now()
+    ti = ctx["ti"]
+    movidos = []
+    for key in ("pol_path", "sin_path"):
+        path = ti.xcom_pull(key=key)
+        if not path:
+            continue
+        destino = _cuarentena_archivos(cuarentena.fecha_de_archivo(path))
+        for parte in entradas.partes(path):
+            os.makedirs(destino, exist_ok=True)
+            movidos.append(shutil.move(parte, os.path.join(destino, os.path.basename(parte))))
+
+    filas_dir = ti.xcom_pull(key="cuarentena_dir") or _cuarentena_filas()
+    fecha = cuarentena.fecha_de_archivo(ti.xcom_pull(key="pol_path") or "")
+    motivos = {tabla: cuarentena.conteos(filas_dir, tabla, fecha) for tabla in ("polizas", "siniestros")}
+    detalle = "; ".join(f"{tabla}: " + ", ".join(f"{r}={n}" for r, n in conteo.items() if n)
+                        for tabla, conteo in motivos.items())
+    ti.xcom_push(key="cuarentena_motivos", value=motivos)
+    registrar_evento_auditoria("mover_cuarentena", archivo=",".join(os.path.basename(m) for m in movidos),
+                               registros=sum(sum(c.values()) for c in motivos.values()), inicio=inicio,
+                               estado="CORRUPTO", mensaje=f"Archivos a cuarentena. Motivos {detalle}")
+
+
+def ingestar_task(**ctx):
+    """
+    Procesa las filas nuevas de los archivos llegados a la entrada de la ingesta y recarga
+    las particiones tocadas de resumen_producto_microlotes (no las del resumen diario)
+    """
+    inicio = datetime.now()
+    ti = ctx["ti"]
+    # cuarentena bajo el directorio de la ingesta (default de procesar_pendientes), no QUARANTINE_DIR
+    procesados = ingesta.procesar_pendientes(_ingesta_entrada_dir(), _ingesta_dir(),
+                                             out_dir=os.path.join(_ingesta_dir(), "resumen"))
+    destino = _destino_carga()
+    resumenes = sorted({d["resumen_file"] for d in procesados if d["resumen_file"]})
+    cargadas = {cuarentena.fecha_de_archivo(r): carga.cargar_resumen(r, destino=destino, tabla=carga.RESUMEN_MICROLOTES)
+                for r in resumenes}
+    ti.xcom_push(key="ingesta", value={"tramos": len(procesados), "filas": sum(d["filas"] for d in procesados),
+                                       "corruptos": sum(d["estado"] == ingesta.CORRUPTO for d in procesados),
+                                       "particiones": cargadas})
+    registrar_evento_auditoria("ingestar", archivo=",".join(sorted({d["archivo"] for d in procesados})),
+                               registros=sum(d["filas"] for d in procesados), inicio=inicio, estado="OK",
+                               mensaje=f"Tramos: {len(procesados)}; particiones cargadas: {sorted(cargadas)}")
+
+
+class XComLocal:
+    """`ti` mínimo para correr las tareas fuera de Airflow (XCom en un dict)"""
+
+    def __init__(self):
+        self.xcom = {}
+
+    def xcom_push(self, key, value):
+        self.xcom[key] = value
+
+    def xcom_pull(self, key=None, task_ids=None):
+        return self.xcom.get(key)
+
+
+def ejecutar_local(ti=None):
+    """
+    Corre el DAG en proceso, respetando el branching de `decidir_fn`.
+    Devuelve (ti, [(task_id, segundos), ...]) con tiempos monotónicos por tarea.
+    """
+    ti = ti or XComLocal()
+    tiempos = []
+
+    def correr(task_id, fn):
+        inicio = time.perf_counter()
+        salida = con_auditoria(fn)(ti=ti)
+        tiempos.append((task_id, time.perf_counter() - inicio))
+        return salida
+
+    correr("preparar_archivos", preparar_archivos)
+    correr("validar_archivos", validar_archivos_task)
+    if correr("decidir_procesar", decidir_fn) == "transformar":
+        correr("transformar", transformar_task)
+        correr("cargar_bq", cargar_bq_task)
+        correr("auditoria", auditoria_task)
+    else:
+        correr("mover_cuarentena", mover_cuarentena_task)
+    return ti, tiempos
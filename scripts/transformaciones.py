@@ -2,75 +2,243 @@
 import os
 import sys
 from datetime import datetime
+import numpy as np
 import pandas as pd
 
 # Permitir ejecución directa
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from scripts.utils_auditoria import registrar_evento_auditoria
+from scripts.cache_parseo import leer_csv
+from scripts import entradas, esquema, instrumentacion
+
+# tope del mapa de bits producto x poliza_id de `total_polizas` (1 byte por celda)
+MAX_BITS_DISTINTAS = 256 * 1024**2
+
+# motores de ejecución (--engine); spark requiere pyspark
+MOTORES = ("pandas", "spark")
+MOTOR = os.environ.get("PIPELINE_MOTOR", "pandas")
+
+COLUMNAS_RESUMEN = ["producto", "total_polizas", "total_siniestros", "monto_total", "prima_promedio"]
+
+
+def a_centavos(s):
+    """Importe -> centavos enteros (nulos -> 0): las sumas son exactas y no dependen del orden"""
+    return np.rint(esquema.numerico(s).fillna(0).to_numpy(dtype=float) * 100).astype(np.int64)
+
+
+def armar_resumen(agg):
+    """
+    Resumen final a partir de agregados por producto:
+    total_polizas, total_siniestros, monto_cent (Σ montos), prima_cent (Σ primas de las
+    filas combinadas póliza-siniestro) y filas (nº de filas combinadas).
+    Compartido por el cálculo completo y el incremental para que den lo mismo bit a bit.
+    """
+    resumen = pd.DataFrame({
+        "producto": agg["producto"].astype(str).to_numpy(),
+        "total_polizas": agg["total_polizas"].to_numpy(dtype=np.int64),
+        "total_siniestros": agg["total_siniestros"].to_numpy(dtype=np.int64),
+        "monto_total": agg["monto_cent"].to_numpy(dtype=np.int64) / 100,
+        "prima_promedio": agg["prima_cent"].to_numpy(dtype=np.int64) / agg["filas"].to_numpy(dtype=np.int64) / 100,
+    }, columns=COLUMNAS_RESUMEN)
+    resumen["prima_promedio"] = resumen["prima_promedio"].round(2)
+    # mismo orden de salida aunque producto llegue como categoría
+    return resumen.sort_values("producto", ignore_index=True)
+
+
+def _suma_exacta(grupos, valores, n):
+    """Σ entera por grupo en int64 (np.bincount acumula en float64)"""
+    return pd.Series(valores).groupby(grupos).sum().reindex(range(n), fill_value=0).to_numpy(dtype=np.int64)
+
+
+def _distintas_por_grupo(grupos, codigos, n_grupos, n_claves, nulo):
+    """nº de claves distintas (sin la nula) por grupo: mapa de bits grupo x clave, o hash si no cabe"""
+    if n_grupos * n_claves <= MAX_BITS_DISTINTAS:
+        visto = np.zeros((n_grupos, n_claves), dtype=bool)
+        visto[grupos, codigos] = True
+        if nulo >= 0:
+            visto[:, nulo] = False
+        return visto.sum(axis=1)
+    no_nulo = codigos != nulo
+    pares = pd.unique(grupos[no_nulo] * n_claves + codigos[no_nulo])
+    return np.bincount(pares // n_claves, minlength=n_grupos)
+
+
+def codigos_poliza(pol_ids, sin_ids):
+    """
+    Factoriza poliza_id de pólizas y siniestros en un solo paso de hash:
+    (códigos de pólizas, códigos de siniestros, nº de claves, código de la clave nula o -1).
+    Nulo es una clave más y empareja con nulo, igual que el merge.
+    """
+    codigos, claves = pd.factorize(pd.concat([pol_ids, sin_ids], ignore_index=True), use_na_sentinel=False)
+    nulos = np.flatnonzero(pd.isna(claves))
+    nulo = int(nulos[0]) if len(nulos) else -1
+    codigos = codigos.astype(np.int64, copy=False)
+    return codigos[:len(pol_ids)], codigos[len(pol_ids):], len(claves), nulo
+
 
 def resumen_por_producto(polizas_df, siniestros_df):
-    """Genera resumen por producto combinando pólizas y siniestros"""
+    """
+    Genera resumen por producto combinando pólizas y siniestros, sin materializar el join:
+    los siniestros se pre-agregan por poliza_id (k siniestros, c siniestro_id no nulos,
+    Σ montos) y se proyectan sobre las pólizas por código. Una póliza con k siniestros
+    equivale a max(1, k) filas del left merge, así que el resultado es idéntico bit a bit
+    al de `resumen_por_producto_merge`.
+    """
+    with instrumentacion.etapa("codigos_poliza", registros=len(polizas_df) + len(siniestros_df)):
+        cod_pol, cod_sin, n, nulo = codigos_poliza(polizas_df["poliza_id"], siniestros_df["poliza_id"])
+    with instrumentacion.etapa("agregacion_producto", registros=len(polizas_df)):
+        return _agregar(polizas_df, siniestros_df, cod_pol, cod_sin, n, nulo)
+
+
+def proyectar_siniestros(siniestros_df, cod_pol, cod_sin, n):
+    """
+    Siniestros pre-agregados por poliza_id y proyectados sobre cada fila de pólizas:
+    (c siniestro_id no nulos, m Σ montos en centavos, w filas del left merge = max(1, k)).
+    Las claves de siniestros huérfanos nunca se proyectan (left join).
+    """
+    k = np.bincount(cod_sin, minlength=n)
+    c = np.bincount(cod_sin, weights=siniestros_df["siniestro_id"].notna().to_numpy(), minlength=n)
+    # Σ de centavos enteros en float64: exacta mientras cada suma por póliza sea < 2**53
+    m = np.rint(np.bincount(cod_sin, weights=a_centavos(siniestros_df["monto_reclamado"]), minlength=n))
+    m = m.astype(np.int64)
+    w = np.maximum(1, k[cod_pol])  # una póliza sin siniestros igual aporta una fila combinada
+    return c[cod_pol], m[cod_pol], w
+
+
+def _agregar(polizas_df, siniestros_df, cod_pol, cod_sin, n, nulo):
+    """Agregados por producto a partir de los códigos de `codigos_poliza`"""
+    c, m, w = proyectar_siniestros(siniestros_df, cod_pol, cod_sin, n)
+    producto, productos = pd.factorize(polizas_df["producto"])
+    validos = producto >= 0  # producto nulo: el groupby lo descarta
+    g = producto[validos]
+    agg = pd.DataFrame({
+        "total_siniestros": np.bincount(g, weights=c[validos], minlength=len(productos)),
+        "monto_cent": _suma_exacta(g, m[validos], len(productos)),
+        "prima_cent": _suma_exacta(g, (a_centavos(polizas_df["prima_mensual"]) * w)[validos], len(productos)),
+        "filas": _suma_exacta(g, w[validos], len(productos)),
+    })
+    agg["total_polizas"] = _distintas_por_grupo(g, cod_pol[validos], len(productos), n, nulo)
+    agg.insert(0, "producto", np.asarray(productos))
+    return armar_resumen(agg)
+
+
+def resumen_por_producto_merge(polizas_df, siniestros_df):
+    """Implementación de referencia con left merge (benchmarks y tests de equivalencia)"""
     pol = polizas_df.copy()
     sin = siniestros_df.copy()
 
-    # conversión segura de tipos numéricos
-    pol["suma_asegurada"] = pd.to_numeric(pol["suma_asegurada"], errors="coerce").fillna(0)
-    pol["prima_mensual"] = pd.to_numeric(pol["prima_mensual"], errors="coerce").fillna(0)
-    sin["monto_reclamado"] = pd.to_numeric(sin["monto_reclamado"], errors="coerce").fillna(0)
+    # los importes ya llegan tipados desde el parseo; se pasan a centavos exactos
+    pol["prima_cent"] = a_centavos(pol["prima_mensual"])
+    sin["monto_cent"] = a_centavos(sin["monto_reclamado"])
 
     merged = pd.merge(pol, sin, on="poliza_id", how="left", suffixes=("_pol", "_sin"))
+    merged["monto_cent"] = merged["monto_cent"].fillna(0).astype(np.int64)
 
-    total_pol = pol.groupby("producto").agg(total_polizas=("poliza_id", "nunique")).reset_index()
-    resumen_sin = merged.groupby("producto").agg(
+    agg = merged.groupby("producto", observed=True).agg(
         total_siniestros=("siniestro_id", "count"),
-        monto_total=("monto_reclamado", "sum"),
-        prima_promedio=("prima_mensual", "mean")
-    ).reset_index()
+        monto_cent=("monto_cent", "sum"),
+        prima_cent=("prima_cent", "sum"),
+        filas=("prima_cent", "size"),
+    )
+    agg["total_polizas"] = pol.groupby("producto", observed=True)["poliza_id"].nunique()
+    return armar_resumen(agg.reset_index())
 
-    resumen = pd.merge(total_pol, resumen_sin, on="producto", how="left").fillna(0)
-    resumen["total_polizas"] = resumen["total_polizas"].astype(int)
-    resumen["total_siniestros"] = resumen["total_siniestros"].astype(int)
-    resumen["monto_total"] = resumen["monto_total"].astype(float)
-    resumen["prima_promedio"] = resumen["prima_promedio"].astype(float).round(2)
 
-    return resumen
+def _leer_pandas(path, esq):
+    # .arrow: filas ya validadas que entrega validar_archivos (mapeadas, sin volver a parsear)
+    if esquema.es_arrow(path):
+        df = esquema.leer_arrow(path)
+    elif entradas.es_compuesta(path):
+        df = entradas.leer_csv(path, esq)  # comprimido o en partes: descompresión en paralelo
+    else:
+        df = leer_csv(path, esq)
+    return df, len(df)
 
 
-def main(pol_path, sin_path, out_dir="data"):
-    """Ejecuta la transformación y registra auditoría detallada en auditoria_proceso.csv"""
+def motor(nombre):
+    """
+    (leer, resumir) del motor: leer(path, esquema) -> (tabla del motor, nº de filas) y
+    resumir(polizas, siniestros) -> resumen pandas (mismo formato en todos los motores)
+    """
+    if nombre == "pandas":
+        return _leer_pandas, resumen_por_producto
+    if nombre == "spark":
+        from scripts import motor_spark  # pyspark es opcional
+        return motor_spark.leer, motor_spark.resumen_por_producto
+    raise ValueError(f"Motor desconocido: {nombre} (disponibles: {MOTORES})")
+
+
+def main(pol_path, sin_path, out_dir="data", fecha_tag=None, estado_dir=None, engine=None, cubos=False):
+    """
+    Ejecuta la transformación y registra auditoría detallada en auditoria_proceso.csv
+    - fecha_tag: YYYYMMDD del resumen (None -> hoy); el backfill pasa la fecha del archivo
+    - estado_dir: si se indica, los archivos son el delta del día y el resumen sale del
+      estado incremental persistido (ver agregado_incremental)
+    - engine: motor de ejecución (pandas | spark; None -> PIPELINE_MOTOR); ambos generan el mismo CSV
+    - cubos: además escribe los cubos por producto/región/estado/mes (ver scripts/cubo.py)
+      en la partición fecha_tag, desde las mismas tablas ya leídas
+    pol_path/sin_path pueden ser los CSV crudos o las tablas .arrow de filas válidas que
+    genera `validacion.validar_archivos(..., validos_dir=...)`, y también CSV comprimidos o
+    patrones de partes (ver scripts/entradas.py).
+    Devuelve la ruta del resumen_producto_<fecha_tag>.csv generado.
+    """
     inicio_total = datetime.now()
     os.makedirs(out_dir, exist_ok=True)
+    engine = engine or MOTOR
+    if estado_dir and engine != "pandas":
+        raise ValueError("El modo incremental (--estado) sólo está disponible con el motor pandas")
+    if cubos and (estado_dir or engine != "pandas"):
+        raise ValueError("Los cubos (--cubos) requieren el motor pandas sobre los archivos completos (sin --estado)")
+    leer, resumir = motor(engine)
 
-    # --- Lectura de archivos ---
-    inicio_lectura = datetime.now()
-    pol = pd.read_csv(pol_path)
-    sin = pd.read_csv(sin_path)
-
-    # Auditoría individual por archivo de entrada
+    # --- Lectura de archivos (reutiliza el parseo de validación vía caché) ---
+    # cada lectura con su propio inicio: antes ambas compartían el de pólizas
+    inicio_pol = datetime.now()
+    pol, n_pol = leer(pol_path, esquema.POLIZAS)
     registrar_evento_auditoria(
         etapa="lectura_polizas",
         archivo=os.path.basename(pol_path),
-        registros=len(pol),
-        inicio=inicio_lectura,
+        registros=n_pol,
+        inicio=inicio_pol,
         estado="OK",
         mensaje="Archivo pólizas leído correctamente"
     )
 
+    inicio_sin = datetime.now()
+    sin, n_sin = leer(sin_path, esquema.SINIESTROS)
     registrar_evento_auditoria(
         etapa="lectura_siniestros",
         archivo=os.path.basename(sin_path),
-        registros=len(sin),
-        inicio=inicio_lectura,
+        registros=n_sin,
+        inicio=inicio_sin,
         estado="OK",
         mensaje="Archivo siniestros leído correctamente"
     )
 
     # --- Transformación ---
     inicio_tr = datetime.now()
-    resumen = resumen_por_producto(pol, sin)
-    fecha_tag = inicio_total.strftime("%Y%m%d")
+    if estado_dir:
+        from scripts.agregado_incremental import aplicar_delta  # evita import circular
+        lote = f"{os.path.basename(pol_path)},{os.path.basename(sin_path)}"
+        resumen = aplicar_delta(estado_dir, pol, sin, lote=lote)
+    else:
+        resumen = resumir(pol, sin)
+    fecha_tag = fecha_tag or inicio_total.strftime("%Y%m%d")
     resumen_file = os.path.join(out_dir, f"resumen_producto_{fecha_tag}.csv")
-    resumen.to_csv(resumen_file, index=False)
+    with instrumentacion.etapa("escritura_resumen", archivo=os.path.basename(resumen_file), registros=len(resumen)):
+        resumen.to_csv(resumen_file, index=False)
+    if cubos:
+        from scripts import cubo  # evita import circular
+        inicio_cubos = datetime.now()
+        rutas = cubo.escribir(cubo.calcular(pol, sin), out_dir, fecha_tag)
+        registrar_evento_auditoria(
+            etapa="cubos",
+            archivo=os.path.basename(resumen_file),
+            registros=n_pol + n_sin,
+            inicio=inicio_cubos,
+            estado="OK",
+            mensaje=f"Cubos {', '.join(rutas)} generados"
+        )
 
     # Auditoría del resultado
     registrar_evento_auditoria(
@@ -79,7 +247,7 @@ def main(pol_path, sin_path, out_dir="data"):
         registros=len(resumen),
         inicio=inicio_tr,
         estado="OK",
-        mensaje="Resumen por producto generado correctamente"
+        mensaje=f"Resumen por producto generado correctamente (motor {engine})"
     )
 
     duracion_total = round((datetime.now() - inicio_total).total_seconds(), 2)
@@ -95,7 +263,12 @@ if __name__ == "__main__":
     p.add_argument("--pol", required=True, help="Ruta del archivo de pólizas")
     p.add_argument("--sin", required=True, help="Ruta del archivo de siniestros")
     p.add_argument("--out", default="data", help="Directorio de salida")
+    p.add_argument("--estado", default=None, help="Directorio del estado incremental (archivos = delta del día)")
+    p.add_argument("--engine", choices=MOTORES, default=MOTOR, help="Motor de ejecución (pandas o PySpark local)")
+    p.add_argument("--cubos", action="store_true", help="Escribe también los cubos por producto/región/estado/mes")
+    instrumentacion.agregar_argumento(p)
     args = p.parse_args()
+    instrumentacion.desde_argumentos(args)
 
-    resumen_file = main(args.pol, args.sin, args.out)
+    resumen_file = main(args.pol, args.sin, args.out, estado_dir=args.estado, engine=args.engine, cubos=args.cubos)
     print(f"Resumen generado en: {resumen_file}")
@@ -1,17 +1,228 @@
 """
 Utilidad central para auditoría de procesos ETL.
-Registra eventos en un archivo CSV estructurado, con timestamp y duración.
+Registra eventos estructurados (timestamp y duración) en el destino configurado.
+
+- Escritura diferida: `registrar_evento_auditoria` sólo encola el evento; un hilo de
+  fondo lo vuelca en lotes cada FLUSH_SEGUNDOS o al juntar LOTE_MAX eventos, y lo
+  pendiente se vuelca al salir del proceso (o con `vaciar_auditoria`).
+- Concurrencia: la cola es segura entre hilos y cada lote se agrega bajo un lock de
+  archivo (CSV/JSONL) o una transacción (SQLite), así varios procesos (backfill,
+  tareas de Airflow) pueden escribir al mismo destino.
+- Fallos: un lote que no se pudo escribir vuelve a la cola y se reintenta en los
+  volcados siguientes; tras REINTENTOS_MAX fallos seguidos del mismo destino se
+  descarta con un aviso en stderr, así un destino roto no hace crecer la cola.
+- Backends: csv, jsonl, sqlite (tabla que replica `auditoria_proceso` de
+  sql/create_tables.sql) y segmentos (directorio de segmentos rotados por fecha con
+  índice, scripts/auditoria_segmentos.py); por defecto se elige por la extensión del
+  destino, y un directorio (ruta terminada en "/") usa segmentos.
+- Consultas: `ultimos_eventos` y `latencias` (percentiles de duración y throughput por
+  etapa); con segmentos leen sólo los segmentos necesarios.
 """
+import atexit
 import csv
+import json
+import multiprocessing.util
 import os
+import sqlite3
+import sys
+import threading
 from datetime import datetime
 
-AUDITORIA_FILE = os.path.join("data", "auditoria_proceso.csv")
+try:
+    import fcntl
+except ImportError:  # Windows: sin lock entre procesos
+    fcntl = None
+
+# destino por defecto; se lee en cada evento, así puede cambiarse en caliente (backfill, tests)
+AUDITORIA_FILE = os.environ.get("PIPELINE_AUDITORIA_FILE", os.path.join("data", "auditoria_proceso.csv"))
+# None -> según la extensión de AUDITORIA_FILE
+AUDITORIA_BACKEND = os.environ.get("PIPELINE_AUDITORIA_BACKEND") or None
+FLUSH_SEGUNDOS = float(os.environ.get("PIPELINE_AUDITORIA_FLUSH_SEGUNDOS", 1.0))
+LOTE_MAX = 1000
+# volcados fallidos seguidos de un destino antes de descartar sus eventos
+REINTENTOS_MAX = int(os.environ.get("PIPELINE_AUDITORIA_REINTENTOS", 3))
+
+CAMPOS = ["fecha_proceso", "etapa", "archivo", "registros", "estado", "mensaje", "duracion_segundos"]
+TABLA_SQLITE = "auditoria_proceso"
+SQLITE_DDL = f"""
+CREATE TABLE IF NOT EXISTS {TABLA_SQLITE} (
+  fecha_proceso TEXT,
+  etapa TEXT,
+  archivo TEXT,
+  registros INTEGER,
+  estado TEXT,
+  mensaje TEXT,
+  duracion_segundos REAL
+)"""
+
+_EXTENSIONES = {".csv": "csv", ".jsonl": "jsonl", ".db": "sqlite", ".sqlite": "sqlite", ".sqlite3": "sqlite"}
+
+
+def _bloquear(f):
+    if fcntl is not None:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+
+
+def _escribir_csv(destino, registros):
+    with open(destino, "a", newline="", encoding="utf-8") as f:
+        _bloquear(f)  # se libera al cerrar
+        writer = csv.DictWriter(f, fieldnames=CAMPOS)
+        # con el lock tomado: sólo el primer escritor pone el encabezado
+        if f.seek(0, os.SEEK_END) == 0:
+            writer.writeheader()
+        writer.writerows(registros)
+
+
+def _tipar(registro):
+    """Registros leídos de un CSV (todo texto) -> tipos de la tabla"""
+    registro = dict(registro)
+    registro["registros"] = int(float(registro.get("registros") or 0))
+    registro["duracion_segundos"] = float(registro.get("duracion_segundos") or 0)
+    return registro
+
+
+def _escribir_jsonl(destino, registros):
+    lineas = "".join(json.dumps(_tipar(r), ensure_ascii=False) + "\n" for r in registros)
+    with open(destino, "a", encoding="utf-8") as f:
+        _bloquear(f)
+        f.write(lineas)
+
+
+def _escribir_sqlite(destino, registros):
+    # SQLite serializa a los escritores; timeout espera a que otro proceso termine su lote
+    con = sqlite3.connect(destino, timeout=60)
+    try:
+        with con:
+            con.execute(SQLITE_DDL)
+            con.executemany(
+                f"INSERT INTO {TABLA_SQLITE} ({', '.join(CAMPOS)}) VALUES ({', '.join('?' * len(CAMPOS))})",
+                [tuple(_tipar(r)[c] for c in CAMPOS) for r in registros],
+            )
+    finally:
+        con.close()
+
+
+def _escribir_segmentos(destino, registros):
+    from scripts import auditoria_segmentos
+    auditoria_segmentos.escribir(destino, registros)
+
+
+BACKENDS = {
+    "csv": _escribir_csv,
+    "jsonl": _escribir_jsonl,
+    "sqlite": _escribir_sqlite,
+    "segmentos": _escribir_segmentos,
+}
+
+
+def _es_directorio(destino):
+    return os.path.isdir(destino) or destino.endswith(("/", os.sep))
+
+
+def backend_de(destino, backend=None):
+    """
+    Backend explícito, o el que corresponde al destino: segmentos si es un directorio,
+    si no según la extensión (csv si no se reconoce)
+    """
+    if not (backend or AUDITORIA_BACKEND) and _es_directorio(destino):
+        return "segmentos"
+    backend = backend or AUDITORIA_BACKEND or _EXTENSIONES.get(os.path.splitext(destino)[1].lower(), "csv")
+    if backend not in BACKENDS:
+        raise ValueError(f"Backend de auditoría desconocido: {backend} (disponibles: {sorted(BACKENDS)})")
+    return backend
+
+
+def configurar_auditoria(destino, backend=None):
+    """Cambia el destino (y opcionalmente el backend) de los eventos siguientes"""
+    global AUDITORIA_FILE, AUDITORIA_BACKEND
+    backend_de(destino, backend)  # valida antes de cambiar nada
+    AUDITORIA_FILE, AUDITORIA_BACKEND = destino, backend
+
 
-def registrar_evento_auditoria(etapa, archivo=None, registros=None, estado="OK", mensaje=None, inicio=None):
-    os.makedirs(os.path.dirname(AUDITORIA_FILE), exist_ok=True)
+def _escribir(destino, backend, registros):
+    os.makedirs(os.path.dirname(destino) or ".", exist_ok=True)
+    BACKENDS[backend](destino, registros)
+
+
+# --- cola y volcado en segundo plano ---
+_cola = []                       # (destino, backend, registro) en orden de llegada
+_cola_lock = threading.Lock()
+_flush_lock = threading.Lock()   # un único volcado a la vez: se conserva el orden
+_despertar = threading.Event()
+_hilo = None
+_fallos = {}                     # (destino, backend) -> volcados fallidos seguidos
+
+
+def vaciar_auditoria():
+    """Vuelca ya todos los eventos encolados (agrupados por destino, en orden de llegada)"""
+    with _flush_lock:
+        with _cola_lock:
+            pendientes = _cola[:]
+            del _cola[:]
+        grupos = {}
+        for destino, backend, registro in pendientes:
+            grupos.setdefault((destino, backend), []).append(registro)
+        for (destino, backend), registros in grupos.items():
+            try:
+                _escribir(destino, backend, registros)
+                _fallos.pop((destino, backend), None)
+            except (OSError, sqlite3.Error) as e:
+                fallos = _fallos[(destino, backend)] = _fallos.get((destino, backend), 0) + 1
+                if fallos >= REINTENTOS_MAX:
+                    del _fallos[(destino, backend)]
+                    print(f"⚠️ Auditoría en {destino}: {fallos} intentos fallidos ({e}); "
+                          f"se descartan {len(registros)} eventos", file=sys.stderr)
+                    continue
+                print(f"⚠️ No se pudo escribir la auditoría en {destino}: {e}", file=sys.stderr)
+                with _cola_lock:  # se reintentan en el próximo volcado
+                    _cola[:0] = [(destino, backend, r) for r in registros]
+
+
+def _bucle_volcado():
+    while True:
+        _despertar.wait(FLUSH_SEGUNDOS)
+        _despertar.clear()
+        vaciar_auditoria()
+
+
+def _asegurar_hilo():
+    global _hilo
+    if _hilo is None or not _hilo.is_alive():
+        _hilo = threading.Thread(target=_bucle_volcado, name="auditoria-flush", daemon=True)
+        _hilo.start()
+
+
+def _reiniciar_en_hijo():
+    # tras un fork el hijo hereda la cola del padre (que la volcará él) pero no su hilo
+    global _cola_lock, _flush_lock, _despertar, _hilo
+    _cola_lock, _flush_lock, _despertar, _hilo = threading.Lock(), threading.Lock(), threading.Event(), None
+    del _cola[:]
+    _fallos.clear()
+
+
+def _registrar_finalizador(_=None):
+    # los procesos de multiprocessing (pools del backfill) salen sin pasar por atexit;
+    # su registro de finalizadores se limpia al arrancar, por eso se re-registra en cada hijo
+    multiprocessing.util.Finalize(None, vaciar_auditoria, exitpriority=100)
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reiniciar_en_hijo)
+atexit.register(vaciar_auditoria)
+_registrar_finalizador()
+multiprocessing.util.register_after_fork(_registrar_finalizador, _registrar_finalizador)
+
+
+def registrar_evento_auditoria(etapa, archivo=None, registros=None, estado="OK", mensaje=None, inicio=None,
+                               duracion=None):
+    """
+    Encola un evento. La duración sale de `inicio` (datetime) salvo que se pase
+    `duracion` ya medida en segundos (p. ej. con time.perf_counter).
+    """
     fin = datetime.now()
-    duracion = round((fin - inicio).total_seconds(), 2) if inicio else None
+    if duracion is None and inicio:
+        duracion = (fin - inicio).total_seconds()
+    duracion = round(duracion, 6) if duracion is not None else None
 
     registro = {
         "fecha_proceso": fin.strftime("%Y-%m-%d %H:%M:%S"),
@@ -23,9 +234,82 @@ def registrar_evento_auditoria(etapa, archivo=None, registros=None, estado="OK",
         "duracion_segundos": duracion or 0
     }
 
-    existe = os.path.exists(AUDITORIA_FILE)
-    with open(AUDITORIA_FILE, "a", newline="", encoding="utf-8") as f:
-        writer = csv.DictWriter(f, fieldnames=registro.keys())
-        if not existe:
-            writer.writeheader()
-        writer.writerow(registro)
+    # ruta absoluta al encolar: un cambio de cwd posterior no mueve el evento
+    # (el backend se decide antes: abspath quita la "/" final de un destino de segmentos)
+    entrada = (os.path.abspath(AUDITORIA_FILE), backend_de(AUDITORIA_FILE), registro)
+    with _cola_lock:
+        _cola.append(entrada)
+        lleno = len(_cola) >= LOTE_MAX
+    _asegurar_hilo()
+    if lleno:
+        _despertar.set()
+
+
+def leer_auditoria(destino=None, backend=None, fechas=None):
+    """
+    DataFrame con los eventos del destino (vuelca antes lo pendiente); con `fechas`
+    ('YYYY-MM-DD') sólo los de esos días (con segmentos, sin leer las otras particiones)
+    """
+    import pandas as pd
+    vaciar_auditoria()
+    destino = destino or AUDITORIA_FILE
+    backend = backend_de(destino, backend)
+    if not os.path.exists(destino):
+        return pd.DataFrame(columns=CAMPOS)
+    if backend == "segmentos":
+        from scripts import auditoria_segmentos
+        return auditoria_segmentos.leer(destino, fechas=None if fechas is None else set(fechas))
+    if backend == "jsonl":
+        df = pd.read_json(destino, lines=True)
+    elif backend == "sqlite":
+        con = sqlite3.connect(destino, timeout=60)
+        try:
+            df = pd.read_sql_query(f"SELECT * FROM {TABLA_SQLITE}", con)
+        finally:
+            con.close()
+    else:
+        df = pd.read_csv(destino)
+    if fechas is not None:
+        df = df[df["fecha_proceso"].astype(str).str[:10].isin(set(fechas))]
+    return df
+
+
+def ultimos_eventos(n=5, etapa=None, destino=None):
+    """Los últimos `n` eventos (de `etapa` si se pide); con segmentos lee sólo los más nuevos"""
+    destino = destino or AUDITORIA_FILE
+    if backend_de(destino) == "segmentos":
+        from scripts import auditoria_segmentos
+        vaciar_auditoria()
+        return auditoria_segmentos.ultimos(destino, n, etapa)
+    df = leer_auditoria(destino)
+    if etapa:
+        df = df[df["etapa"] == etapa]
+    return df.tail(n).reset_index(drop=True)
+
+
+def latencias(desde=None, hasta=None, etapas=None, percentiles=(50, 90, 99), destino=None):
+    """
+    Percentiles de duracion_segundos, eventos, registros y registros por segundo por etapa
+    en la ventana [desde, hasta] ('YYYY-MM-DD'); con segmentos lee sólo esas particiones.
+    """
+    from scripts import auditoria_segmentos
+    destino = destino or AUDITORIA_FILE
+    if backend_de(destino) == "segmentos":
+        vaciar_auditoria()
+        return auditoria_segmentos.latencias(destino, desde, hasta, etapas, percentiles)
+    return auditoria_segmentos.latencias_de(leer_auditoria(destino), desde, hasta, etapas, percentiles)
+
+
+def fusionar_auditorias(paths, destino=None):
+    """Agrega (en el orden dado) los registros de otros CSV de auditoría al destino principal"""
+    vaciar_auditoria()
+    destino = os.path.abspath(destino or AUDITORIA_FILE)
+    registros = []
+    for path in paths:
+        if not os.path.exists(path):
+            continue
+        with open(path, newline="", encoding="utf-8") as f:
+            registros.extend(csv.DictReader(f))
+    if registros:
+        _escribir(destino, backend_de(destino), registros)
+    return len(registros)
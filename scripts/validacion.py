@@ -2,47 +2,190 @@
 import os
 import sys
 from datetime import datetime
+import numpy as np
 import pandas as pd
 
 # allow running directly
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from scripts.utils_auditoria import registrar_evento_auditoria
+from scripts.cache_parseo import leer_csv
+from scripts import cuarentena, entradas, esquema, filtro_duplicados, instrumentacion, muestreo, validacion_paralela
+from scripts.indice_ids import IndiceIds
+from scripts.instrumentacion import pico_rss_mb  # noqa: F401 (compatibilidad)
+
+EXPECTED_POL_COLS = esquema.columnas(esquema.POLIZAS)
+EXPECTED_SIN_COLS = esquema.columnas(esquema.SINIESTROS)
+
+# reglas en orden de bit de la columna `motivos` de los inválidos
+REGLA_POLIZA_INEXISTENTE = "poliza_inexistente"
+REGLAS_POLIZAS = esquema.reglas(esquema.POLIZAS)
+REGLAS_SINIESTROS = esquema.reglas(esquema.SINIESTROS) + [REGLA_POLIZA_INEXISTENTE]
+COLUMNA_MOTIVOS = "motivos"
+
+# filas por chunk en el modo streaming
+CHUNK_FILAS = 500_000
+
+
+def _separar(df, motivos):
+    """(válidos, inválidos); los inválidos llevan la máscara de reglas incumplidas en `motivos`"""
+    ok = motivos == 0
+    validos = df[ok].copy()
+    invalidos = df[~ok].copy()
+    invalidos[COLUMNA_MOTIVOS] = motivos[~ok]
+    return validos, invalidos
+
+
+def _a_cuarentena(cuarentena_dir, tabla, path, invalidos, reglas, parte=None):
+    """Guarda los inválidos en la cuarentena particionada; devuelve el manifiesto del lote"""
+    with instrumentacion.etapa("escritura_cuarentena", archivo=os.path.basename(path), registros=len(invalidos)):
+        return cuarentena.guardar(cuarentena_dir, tabla, invalidos, reglas,
+                                  fecha=cuarentena.fecha_de_archivo(path),
+                                  lote=cuarentena.lote_de_archivo(path, parte))
+
+
+def _conteo_motivos(invalidos, reglas):
+    return esquema.conteo_por_regla(invalidos[COLUMNA_MOTIVOS].to_numpy(dtype=np.uint32), reglas)
+
+
+def _sumar_conteos(total, parcial):
+    for regla, n in parcial.items():
+        total[regla] = total.get(regla, 0) + n
 
-EXPECTED_POL_COLS = ["poliza_id","cliente_id","producto","suma_asegurada","prima_mensual","fecha_inicio","estado","region"]
-EXPECTED_SIN_COLS = ["siniestro_id","poliza_id","fecha_siniestro","tipo_siniestro","monto_reclamado","estado"]
 
 def validar_polizas_df(df: pd.DataFrame):
     # esquema
     for c in EXPECTED_POL_COLS:
         if c not in df.columns:
             raise ValueError(f"Columna faltante en polizas: {c}")
-    conds_ok = (
-        df["poliza_id"].notna() & (df["poliza_id"].astype(str).str.len()>0)
-        & df["suma_asegurada"].notna() & (pd.to_numeric(df["suma_asegurada"], errors="coerce")>0)
-        & df["prima_mensual"].notna() & (pd.to_numeric(df["prima_mensual"], errors="coerce")>0)
-    )
-    validos = df[conds_ok].copy()
-    invalidos = df[~conds_ok].copy()
-    return validos, invalidos
+    return _separar(df, esquema.motivos_rechazo(df, esquema.POLIZAS))
 
-def validar_siniestros_df(df: pd.DataFrame, poliza_set:set):
+def validar_siniestros_df(df: pd.DataFrame, poliza_set):
+    """`poliza_set`: IndiceIds de pólizas válidas (o un set de IDs en texto)"""
     for c in EXPECTED_SIN_COLS:
         if c not in df.columns:
             raise ValueError(f"Columna faltante en siniestros: {c}")
-    conds_ok = (
-        df["siniestro_id"].notna() & (df["siniestro_id"].astype(str).str.len()>0)
-        & df["poliza_id"].notna() & (df["poliza_id"].astype(str).str.len()>0)
-        & df["monto_reclamado"].notna() & (pd.to_numeric(df["monto_reclamado"], errors="coerce")>0)
-        & df["poliza_id"].isin(poliza_set)
+    motivos = esquema.motivos_rechazo(df, esquema.SINIESTROS)
+    with instrumentacion.etapa("regla_referencia_poliza_id", registros=len(df)):
+        if isinstance(poliza_set, IndiceIds):
+            inexistente = ~poliza_set.contiene(df["poliza_id"])
+        else:
+            inexistente = ~esquema.pertenece(df["poliza_id"], poliza_set)
+        motivos |= inexistente.astype(np.uint32) << REGLAS_SINIESTROS.index(REGLA_POLIZA_INEXISTENTE)
+    return _separar(df, motivos)
+
+# camino de la decisión CORRUPTO/VALIDO (res["camino"], auditoría muestreo_*)
+CAMINO_MUESTRA = "muestra"
+CAMINO_COMPLETO = "completo"
+_CAMINOS = {
+    muestreo.VALIDO: "escaneo completo (muestra bajo el umbral)",
+    muestreo.NO_CONCLUYENTE: "escaneo completo (muestra no concluyente)",
+    muestreo.OMITIDO: "escaneo completo (archivo chico, sin muestra)",
+}
+
+
+def _prechequeo(res, umbral, confianza, cuarentena_dir):
+    """
+    Pre-chequeo por muestreo de ambos archivos (ver scripts/muestreo.py). Si alguno sale
+    CORRUPTO devuelve True: no hace falta el escaneo completo. Los conteos de la muestra
+    (y sus motivos) quedan sólo en res["muestreo"]; *_total / *_invalidos quedan en None
+    porque el archivo no se contó entero. Audita por archivo el camino tomado.
+    """
+    rng = np.random.default_rng()
+    tablas = (("pol", "polizas", res["pol_path"], esquema.POLIZAS, REGLAS_POLIZAS),
+              ("sin", "siniestros", res["sin_path"], esquema.SINIESTROS, REGLAS_SINIESTROS))
+    previos = {}
+    for clave, tabla, path, esq, _ in tablas:
+        inicio = datetime.now()
+        with instrumentacion.etapa(f"muestreo_{tabla}", archivo=os.path.basename(path)):
+            # siniestros: sin poliza_inexistente (necesita todas las pólizas); cota inferior de la tasa
+            previos[clave] = (muestreo.prechequear(path, esq, lambda df, esq=esq: esquema.motivos_rechazo(df, esq),
+                                                   umbral, confianza, rng), inicio)
+    anticipado = any(p["estado"] == muestreo.CORRUPTO for p, _ in previos.values())
+
+    res["camino"] = CAMINO_MUESTRA if anticipado else CAMINO_COMPLETO
+    res["muestreo"] = {}
+    for clave, tabla, path, _, reglas in tablas:
+        p, inicio = previos[clave]
+        res["muestreo"][clave] = {k: p[k] for k in ("estado", "muestra", "invalidos", "intervalo")}
+        camino = "muestra (CORRUPTO anticipado, sin escaneo completo)" if anticipado else _CAMINOS.get(p["estado"])
+        inferior, superior = p["intervalo"]
+        registrar_evento_auditoria(
+            etapa=f"muestreo_{tabla}",
+            archivo=os.path.basename(path),
+            registros=p["muestra"],
+            inicio=inicio,
+            estado=p["estado"],
+            mensaje=f"Camino: {camino}. Muestra: {p['invalidos']}/{p['muestra']} inválidos, "
+                    f"IC {confianza:.0%} [{inferior:.2%}, {superior:.2%}] (umbral {umbral:.0%})"
+        )
+        if anticipado:
+            invalidos = pd.DataFrame() if p["df"] is None else _separar(p["df"], p["motivos"])[1]
+            res["muestreo"][clave]["motivos"] = _conteo_motivos(invalidos, reglas) if len(invalidos) else {}
+            res[f"{clave}_total"] = res[f"{clave}_invalidos"] = None  # desconocidos sin el escaneo completo
+            res[f"valid_{clave}_path"] = None
+            if cuarentena_dir and len(invalidos):
+                # mismo lote que el escaneo completo: una re-ejecución completa lo reemplaza
+                res.setdefault("cuarentena", {})[tabla] = _a_cuarentena(cuarentena_dir, tabla, path, invalidos, reglas)
+    if anticipado:
+        res["estado"] = "CORRUPTO"
+    return anticipado
+
+
+def _revisar_duplicados(res, historial_dir, tabla, path, validos):
+    """Acumula en res["duplicados"][tabla] los IDs válidos que ya llegaron en días anteriores"""
+    columna = filtro_duplicados.ENTIDADES[tabla]
+    with instrumentacion.etapa(f"duplicados_{tabla}", archivo=os.path.basename(path), registros=len(validos)):
+        repetidos, candidatos = filtro_duplicados.duplicados(historial_dir, tabla, validos[columna],
+                                                             cuarentena.fecha_de_archivo(path))
+    acumulado = res["duplicados"].setdefault(tabla, {"candidatos": 0, "confirmados": 0, "ids": []})
+    acumulado["candidatos"] += candidatos
+    acumulado["confirmados"] += int(repetidos.sum())
+    acumulado["ids"].extend(validos[columna][repetidos].tolist())
+
+
+def _auditar_duplicados(res, tabla, path, inicio):
+    d = res["duplicados"].get(tabla, {"candidatos": 0, "confirmados": 0})
+    registrar_evento_auditoria(
+        etapa=f"duplicados_{tabla}",
+        archivo=os.path.basename(path),
+        registros=d["confirmados"],
+        inicio=inicio,
+        estado="OK",
+        mensaje=f"IDs ya recibidos en días anteriores: {d['confirmados']} (candidatos del filtro: {d['candidatos']})"
     )
-    validos = df[conds_ok].copy()
-    invalidos = df[~conds_ok].copy()
-    return validos, invalidos
 
-def validar_archivos(pol_path, sin_path, umbral=0.10):
+
+def _leer(path, esq, workers=None):
+    """DataFrame tipado de un CSV (vía la caché de parseo) o de una entrada comprimida / en partes"""
+    if entradas.es_compuesta(path):
+        return entradas.leer_csv(path, esq, workers)
+    return leer_csv(path, esq)
+
+
+def ruta_validos(validos_dir, path):
+    """<validos_dir>/<nombre>_validos.arrow: entrega de filas válidas a transformaciones"""
+    base = entradas.nombre_base(path)
+    return os.path.join(validos_dir, f"{base}_validos{esquema.EXTENSION_ARROW}")
+
+
+def validar_archivos(pol_path, sin_path, umbral=0.10, cuarentena_dir=None, validos_dir=None,
+                     muestreo_previo=False, confianza=muestreo.CONFIANZA, historial_dir=None, workers=None):
     """
     Valida ambos archivos y registra auditoría por archivo (polizas, siniestros) + resumen.
-    Devuelve la misma estructura `res` que antes para compatibilidad con el DAG/tests.
+    Devuelve la misma estructura `res` que antes para compatibilidad con el DAG/tests,
+    más el conteo de inválidos por regla. Con `cuarentena_dir` guarda además los
+    inválidos en la cuarentena particionada (ver scripts/cuarentena.py).
+    Con `validos_dir` persiste las filas válidas como Arrow IPC (memory-mappable) en
+    res["valid_pol_path"] / res["valid_sin_path"], la entrada de transformaciones.main.
+    Con `muestreo_previo` valida primero una muestra (scripts/muestreo.py): si la tasa de
+    error supera `umbral` con la `confianza` pedida devuelve CORRUPTO sin escaneo completo
+    (conteos de la muestra, res["camino"] == "muestra"); si no, valida todo.
+    Con `historial_dir` marca los poliza_id / siniestro_id válidos que ya llegaron en días
+    anteriores (scripts/filtro_duplicados.py) en res["duplicados"]; no los rechaza.
+    Con `workers` > 1 parsea y evalúa las reglas por tramos en un pool de procesos
+    (scripts/validacion_paralela.py); el resultado es el mismo que en serie.
+    `pol_path` / `sin_path` pueden ser CSV comprimidos o patrones de partes (scripts/entradas.py):
+    las partes se leen en paralelo (`workers` hilos) y no hay muestreo ni validación por tramos.
     """
     inicio_total = datetime.now()
     res = {
@@ -56,21 +199,39 @@ def validar_archivos(pol_path, sin_path, umbral=0.10):
         "valid_pol_df": None,
         "invalid_pol_df": None,
         "valid_sin_df": None,
-        "invalid_sin_df": None
+        "invalid_sin_df": None,
+        "pol_motivos": {},
+        "sin_motivos": {},
+        "camino": CAMINO_COMPLETO,
     }
+    compuesta = entradas.es_compuesta(pol_path) or entradas.es_compuesta(sin_path)
+    if muestreo_previo and not compuesta and _prechequeo(res, umbral, confianza, cuarentena_dir):
+        return res
 
-    # --- Leer archivos ---
-    pol_df = pd.read_csv(pol_path)
-    sin_df = pd.read_csv(sin_path)
+    paralelo = None
+    if workers and workers > 1 and not compuesta:
+        paralelo = validacion_paralela.validar(pol_path, sin_path, workers,
+                                               REGLAS_SINIESTROS.index(REGLA_POLIZA_INEXISTENTE))
+    if paralelo:
+        pol_df, sin_df, motivos_pol, motivos_sin = paralelo
+    else:
+        # --- Leer archivos (desde la caché de parseo si no cambiaron) ---
+        pol_df = _leer(pol_path, esquema.POLIZAS, workers)
+        sin_df = _leer(sin_path, esquema.SINIESTROS, workers)
     res["pol_total"] = len(pol_df)
     res["sin_total"] = len(sin_df)
 
     # --- Validar pólizas por separado ---
     inicio_pol = datetime.now()
-    valid_pol, invalid_pol = validar_polizas_df(pol_df)
+    with instrumentacion.etapa("validacion_polizas", archivo=os.path.basename(pol_path), registros=len(pol_df)):
+        valid_pol, invalid_pol = _separar(pol_df, motivos_pol) if paralelo else validar_polizas_df(pol_df)
     res["pol_invalidos"] = len(invalid_pol)
     res["valid_pol_df"] = valid_pol
     res["invalid_pol_df"] = invalid_pol
+    res["pol_motivos"] = _conteo_motivos(invalid_pol, REGLAS_POLIZAS)
+    if historial_dir:
+        res["duplicados"] = {}
+        _revisar_duplicados(res, historial_dir, "polizas", pol_path, valid_pol)
 
     pct_error_pol = res["pol_invalidos"] / max(1, res["pol_total"])
     estado_pol = "CORRUPTO" if pct_error_pol > umbral else "VALIDO"
@@ -85,11 +246,19 @@ def validar_archivos(pol_path, sin_path, umbral=0.10):
 
     # --- Validar siniestros por separado (usa polizas válidas) ---
     inicio_sin = datetime.now()
-    pol_set = set(valid_pol["poliza_id"].astype(str).tolist())
-    valid_sin, invalid_sin = validar_siniestros_df(sin_df, pol_set)
+    with instrumentacion.etapa("validacion_siniestros", archivo=os.path.basename(sin_path), registros=len(sin_df)):
+        if paralelo:  # la regla de referencia ya se evaluó en los workers
+            valid_sin, invalid_sin = _separar(sin_df, motivos_sin)
+        else:
+            # UUID empaquetados en 128 bits: ~16 bytes por póliza en vez de un str de Python
+            pol_idx = IndiceIds.desde(valid_pol["poliza_id"])
+            valid_sin, invalid_sin = validar_siniestros_df(sin_df, pol_idx)
     res["sin_invalidos"] = len(invalid_sin)
     res["valid_sin_df"] = valid_sin
     res["invalid_sin_df"] = invalid_sin
+    res["sin_motivos"] = _conteo_motivos(invalid_sin, REGLAS_SINIESTROS)
+    if historial_dir:
+        _revisar_duplicados(res, historial_dir, "siniestros", sin_path, valid_sin)
 
     pct_error_sin = res["sin_invalidos"] / max(1, res["sin_total"])
     estado_sin = "CORRUPTO" if pct_error_sin > umbral else "VALIDO"
@@ -101,7 +270,159 @@ def validar_archivos(pol_path, sin_path, umbral=0.10):
         estado=estado_sin,
         mensaje=f"Inválidos: {res['sin_invalidos']} ({pct_error_sin:.2%})"
     )
+    if historial_dir:
+        _auditar_duplicados(res, "polizas", pol_path, inicio_pol)
+        _auditar_duplicados(res, "siniestros", sin_path, inicio_sin)
+
+    if validos_dir:
+        for clave, path, validos in (("pol", pol_path, valid_pol), ("sin", sin_path, valid_sin)):
+            destino = ruta_validos(validos_dir, path)
+            with instrumentacion.etapa("escritura_validos", archivo=os.path.basename(destino), registros=len(validos)):
+                res[f"valid_{clave}_path"] = esquema.escribir_arrow(validos, destino)
+
+    if cuarentena_dir:
+        res["cuarentena"] = {
+            "polizas": _a_cuarentena(cuarentena_dir, "polizas", pol_path, invalid_pol, REGLAS_POLIZAS),
+            "siniestros": _a_cuarentena(cuarentena_dir, "siniestros", sin_path, invalid_sin, REGLAS_SINIESTROS),
+        }
+
+    if "CORRUPTO" in (estado_pol, estado_sin):
+        res["estado"] = "CORRUPTO"
+    return res
+
+
+def _volcar(df, path, primero):
+    """Escribe (primer chunk) o agrega (siguientes) filas a un CSV de salida"""
+    with instrumentacion.etapa("escritura_validacion", archivo=os.path.basename(path), registros=len(df)):
+        df.to_csv(path, mode="w" if primero else "a", header=primero, index=False)
+
+
+def _validar_en_chunks(path, validar, esq, out_validos, out_invalidos, chunksize, al_validar=None,
+                       al_rechazar=None):
+    """
+    Aplica `validar` chunk a chunk volcando válidos/inválidos a disco; devuelve (total, invalidos).
+    `al_rechazar(invalidos, n_chunk)` recibe los inválidos de cada chunk.
+    """
+    total = invalidos = 0
+    primero = True
+    chunks = entradas.leer_csv_chunks if entradas.es_compuesta(path) else esquema.leer_csv_chunks
+    for i, chunk in enumerate(chunks(path, esq, chunksize)):
+        validos, malos = validar(chunk)
+        _volcar(validos, out_validos, primero)
+        _volcar(malos, out_invalidos, primero)
+        if al_validar:
+            al_validar(validos)
+        if al_rechazar:
+            al_rechazar(malos, i)
+        total += len(chunk)
+        invalidos += len(malos)
+        primero = False
+    if primero:  # archivo sin filas: sólo encabezado
+        vacio = pd.DataFrame(columns=esquema.columnas(esq))
+        _volcar(vacio, out_validos, True)
+        _volcar(vacio.assign(**{COLUMNA_MOTIVOS: []}), out_invalidos, True)
+    return total, invalidos
 
+
+def validar_archivos_streaming(pol_path, sin_path, out_dir, umbral=0.10, chunksize=CHUNK_FILAS,
+                               cuarentena_dir=None, muestreo_previo=False, confianza=muestreo.CONFIANZA,
+                               historial_dir=None):
+    """
+    Variante de memoria acotada de `validar_archivos` para archivos mayores que la RAM.
+    Lee por chunks, escribe válidos/inválidos directo a `out_dir` y sólo acumula
+    contadores y el índice de poliza_id válidos. Devuelve las mismas claves de
+    resumen que usa el DAG más las rutas de salida y el pico de RSS (MB).
+    Con `cuarentena_dir` cada chunk de inválidos es un lote de la cuarentena.
+    `muestreo_previo` / `confianza`: pre-chequeo por muestreo, como en `validar_archivos`.
+    `historial_dir`: duplicados entre días por chunk, como en `validar_archivos`.
+    Entradas comprimidas o en partes se descomprimen en streaming, parte por parte (sin muestreo).
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    res = {
+        "pol_path": pol_path,
+        "sin_path": sin_path,
+        "pol_total": 0,
+        "pol_invalidos": 0,
+        "sin_total": 0,
+        "sin_invalidos": 0,
+        "estado": "VALIDO",
+        "pol_motivos": {},
+        "sin_motivos": {},
+        "camino": CAMINO_COMPLETO,
+    }
+    compuesta = entradas.es_compuesta(pol_path) or entradas.es_compuesta(sin_path)
+    if muestreo_previo and not compuesta and _prechequeo(res, umbral, confianza, cuarentena_dir):
+        res["pico_rss_mb"] = pico_rss_mb()
+        return res
+    if cuarentena_dir:
+        res["cuarentena"] = {"polizas": [], "siniestros": []}
+    if historial_dir:
+        res["duplicados"] = {}
+
+    def duplicados(tabla, path):
+        if historial_dir:
+            return lambda validos: _revisar_duplicados(res, historial_dir, tabla, path, validos)
+        return lambda validos: None
+
+    def rechazos(tabla, clave, path, reglas):
+        def al_rechazar(invalidos, parte):
+            _sumar_conteos(res[f"{clave}_motivos"], _conteo_motivos(invalidos, reglas))
+            if cuarentena_dir:
+                res["cuarentena"][tabla].append(
+                    _a_cuarentena(cuarentena_dir, tabla, path, invalidos, reglas, parte))
+        return al_rechazar
+
+    for clave, path in (("pol", pol_path), ("sin", sin_path)):
+        base = entradas.nombre_base(path)
+        res[f"valid_{clave}_path"] = os.path.join(out_dir, f"{base}_validos.csv")
+        res[f"invalid_{clave}_path"] = os.path.join(out_dir, f"{base}_invalidos.csv")
+
+    # --- Pólizas: acumula sólo el índice de IDs válidos ---
+    inicio_pol = datetime.now()
+    pol_idx = IndiceIds()
+    duplicados_pol = duplicados("polizas", pol_path)
+    res["pol_total"], res["pol_invalidos"] = _validar_en_chunks(
+        pol_path, validar_polizas_df, esquema.POLIZAS,
+        res["valid_pol_path"], res["invalid_pol_path"], chunksize,
+        al_validar=lambda v: (pol_idx.agregar(v["poliza_id"]), duplicados_pol(v)),
+        al_rechazar=rechazos("polizas", "pol", pol_path, REGLAS_POLIZAS),
+    )
+    pct_error_pol = res["pol_invalidos"] / max(1, res["pol_total"])
+    estado_pol = "CORRUPTO" if pct_error_pol > umbral else "VALIDO"
+    registrar_evento_auditoria(
+        etapa="validacion_polizas",
+        archivo=os.path.basename(pol_path),
+        registros=res["pol_total"],
+        inicio=inicio_pol,
+        estado=estado_pol,
+        mensaje=f"Inválidos: {res['pol_invalidos']} ({pct_error_pol:.2%}) [streaming]"
+    )
+
+    # --- Siniestros: requiere el índice completo de pólizas válidas ---
+    inicio_sin = datetime.now()
+    res["sin_total"], res["sin_invalidos"] = _validar_en_chunks(
+        sin_path, lambda df: validar_siniestros_df(df, pol_idx), esquema.SINIESTROS,
+        res["valid_sin_path"], res["invalid_sin_path"], chunksize,
+        al_validar=duplicados("siniestros", sin_path),
+        al_rechazar=rechazos("siniestros", "sin", sin_path, REGLAS_SINIESTROS),
+    )
+    if historial_dir:
+        _auditar_duplicados(res, "polizas", pol_path, inicio_pol)
+        _auditar_duplicados(res, "siniestros", sin_path, inicio_sin)
+    pct_error_sin = res["sin_invalidos"] / max(1, res["sin_total"])
+    estado_sin = "CORRUPTO" if pct_error_sin > umbral else "VALIDO"
+
+    if "CORRUPTO" in (estado_pol, estado_sin):
+        res["estado"] = "CORRUPTO"
+    res["pico_rss_mb"] = pico_rss_mb()
+    registrar_evento_auditoria(
+        etapa="validacion_siniestros",
+        archivo=os.path.basename(sin_path),
+        registros=res["sin_total"],
+        inicio=inicio_sin,
+        estado=estado_sin,
+        mensaje=f"Inválidos: {res['sin_invalidos']} ({pct_error_sin:.2%}) [streaming] pico RSS: {res['pico_rss_mb']} MB"
+    )
     return res
 
 if __name__ == "__main__":
@@ -110,9 +431,43 @@ if __name__ == "__main__":
     p.add_argument("--pol", required=True)
     p.add_argument("--sin", required=True)
     p.add_argument("--umbral", type=float, default=0.10)
+    p.add_argument("--streaming", action="store_true", help="Valida por chunks con memoria acotada")
+    p.add_argument("--chunksize", type=int, default=CHUNK_FILAS)
+    p.add_argument("--out", default="data", help="Directorio de salida de válidos/inválidos (modo streaming)")
+    p.add_argument("--cuarentena", default=None, help="Directorio de la cuarentena particionada de inválidos")
+    p.add_argument("--validos", default=None, help="Directorio donde dejar las filas válidas (.arrow) para transformar")
+    p.add_argument("--muestreo", action="store_true",
+                   help="Pre-chequeo por muestra: CORRUPTO anticipado sin validar todo si la tasa supera --umbral")
+    p.add_argument("--confianza", type=float, default=muestreo.CONFIANZA, help="Confianza del pre-chequeo")
+    p.add_argument("--workers", type=int, default=None,
+                   help="Procesos para parsear y validar por tramos (>1: en paralelo; no aplica a --streaming)")
+    p.add_argument("--historial", default=None,
+                   help="Directorio del filtro de IDs de días anteriores (marca duplicados entre días)")
+    instrumentacion.agregar_argumento(p)
     args = p.parse_args()
-    resumen = validar_archivos(args.pol, args.sin, args.umbral)
-    print(f"Estado: {resumen['estado']}")
-    print(f"Polizas tot/invalid: {resumen['pol_total']}/{resumen['pol_invalidos']}")
-    print(f"Siniestros tot/invalid: {resumen['sin_total']}/{resumen['sin_invalidos']}")
+    instrumentacion.desde_argumentos(args)
+    if args.streaming:
+        resumen = validar_archivos_streaming(args.pol, args.sin, args.out, args.umbral, args.chunksize,
+                                             cuarentena_dir=args.cuarentena, muestreo_previo=args.muestreo,
+                                             confianza=args.confianza, historial_dir=args.historial)
+    else:
+        resumen = validar_archivos(args.pol, args.sin, args.umbral, cuarentena_dir=args.cuarentena,
+                                   validos_dir=args.validos, muestreo_previo=args.muestreo,
+                                   confianza=args.confianza, historial_dir=args.historial, workers=args.workers)
+    print(f"Estado: {resumen['estado']} (camino: {resumen['camino']})")
+    if resumen["camino"] == CAMINO_MUESTRA:
+        for clave, tabla in (("pol", "Polizas"), ("sin", "Siniestros")):
+            m = resumen["muestreo"][clave]
+            print(f"{tabla} muestra/invalid: {m['muestra']}/{m['invalidos']} ({m['estado']})")
+    else:
+        print(f"Polizas tot/invalid: {resumen['pol_total']}/{resumen['pol_invalidos']}")
+        print(f"Siniestros tot/invalid: {resumen['sin_total']}/{resumen['sin_invalidos']}")
+    for clave in ("pol_motivos", "sin_motivos"):
+        for regla, n in resumen[clave].items():
+            if n:
+                print(f"  {regla}: {n}")
+    for tabla, d in resumen.get("duplicados", {}).items():
+        print(f"Duplicados de días anteriores en {tabla}: {d['confirmados']}")
+    if args.streaming:
+        print(f"Pico RSS: {resumen['pico_rss_mb']} MB")
     exit(0 if resumen["estado"]=="VALIDO" else 2)
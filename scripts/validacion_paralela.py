@@ -0,0 +1,181 @@
+"""
+Validación multinúcleo (`validacion.validar_archivos(..., workers=N)`).
+
+Cada archivo se parte en tramos de bytes alineados a inicio de fila y un pool de
+procesos parsea y evalúa las reglas del esquema de cada tramo; pólizas y siniestros
+entran al pool juntos, así se parsean a la vez. Nada se serializa entre procesos:
+cada worker deja su tramo como Arrow IPC sin comprimir y su máscara de motivos como
+.npy en un directorio de memoria compartida (/dev/shm si existe) y devuelve sólo
+conteos. La única espera entre archivos es la regla poliza_inexistente: el índice
+de pólizas válidas se arma con los índices parciales de cada tramo y los tramos de
+siniestros lo consultan mapeado, marcando el bit en su propio .npy.
+
+Al final el proceso principal mapea los tramos en orden y arma los mismos
+DataFrames y máscaras que el camino en serie. Si algún tramo necesitó la relectura
+sin tipos (valores no convertibles) o falta una columna, devuelve None y la
+validación sigue en serie: el resultado no cambia de tipos según el camino.
+Supone filas de una línea (sin saltos de línea entre comillas), como scripts/muestreo.py.
+"""
+import mmap
+import os
+import shutil
+import tempfile
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from datetime import datetime
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.feather as feather
+
+from scripts import esquema, instrumentacion
+from scripts.indice_ids import IndiceIds
+from scripts.utils_auditoria import registrar_evento_auditoria
+
+# tramos por worker (balancea archivos de distinto tamaño) y tamaño mínimo de un tramo
+TRAMOS_POR_WORKER = 2
+MIN_BYTES_TRAMO = 4 * 1024**2
+MEMORIA_COMPARTIDA = "/dev/shm"
+
+ESQUEMAS = {"polizas": esquema.POLIZAS, "siniestros": esquema.SINIESTROS}
+
+
+def tramos(path, partes):
+    """[(inicio, fin)] en bytes de `partes` tramos de filas del CSV (sin el encabezado)"""
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        datos = mm.find(b"\n") + 1
+        if datos == 0 or datos == len(mm):
+            return []
+        bordes = [datos]
+        for k in range(1, partes):
+            corte = mm.find(b"\n", datos + k * (len(mm) - datos) // partes - 1) + 1
+            if bordes[-1] < corte < len(mm):
+                bordes.append(corte)
+        return list(zip(bordes, bordes[1:] + [len(mm)]))
+
+
+def _encabezado(path):
+    with open(path, "rb") as f:
+        return f.readline().decode("utf-8").strip().split(",")
+
+
+def _esquema_arrow(esq):
+    return pa.schema([(c.nombre, esquema.TIPOS_ARROW[c.tipo]) for c in esq])
+
+
+def _iniciar_worker(hilos):
+    # un pool de N procesos con todos los hilos de Arrow cada uno sobresuscribe los núcleos
+    pa.set_cpu_count(hilos)
+
+
+def _validar_tramo(tabla, path, ini, fin, salida, indexar):
+    """
+    Parsea el tramo, evalúa las reglas del esquema y deja en `salida`.arrow / .npy la tabla y los
+    motivos (y con `indexar`, el índice de poliza_id válidos). Devuelve (filas, tipado).
+    """
+    esq = ESQUEMAS[tabla]
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        contenido = mm[:mm.find(b"\n") + 1] + mm[ini:fin]
+    datos = esquema.leer_tabla(contenido, esq)
+    if datos.schema != _esquema_arrow(esq):
+        return datos.num_rows, False
+    motivos = esquema.motivos_rechazo(esquema.a_pandas(datos), esq)
+    feather.write_feather(datos, f"{salida}.arrow", compression="uncompressed")
+    np.save(f"{salida}.npy", motivos)
+    if indexar:
+        IndiceIds.desde(datos.column("poliza_id").filter(pa.array(motivos == 0))).guardar(f"{salida}.indice")
+    return datos.num_rows, True
+
+
+def _referenciar_tramo(salida, indice_dir, bit):
+    """Marca `bit` en los motivos del tramo de siniestros cuyo poliza_id no está en el índice"""
+    ids = feather.read_table(f"{salida}.arrow", columns=["poliza_id"], memory_map=True).column("poliza_id")
+    inexistente = ~IndiceIds.cargar(indice_dir).contiene(ids)
+    motivos = np.load(f"{salida}.npy", mmap_mode="r+")
+    motivos |= inexistente.astype(np.uint32) << np.uint32(bit)
+    motivos.flush()
+    return int(inexistente.sum())
+
+
+def _directorio_compartido():
+    base = MEMORIA_COMPARTIDA if os.access(MEMORIA_COMPARTIDA, os.W_OK) else None
+    return tempfile.mkdtemp(prefix="validacion-", dir=base)
+
+
+def _armar(salidas):
+    """(DataFrame, motivos) de los tramos en orden, mapeados desde la memoria compartida"""
+    tablas = [feather.read_table(f"{s}.arrow", memory_map=True) for s in salidas]
+    motivos = [np.load(f"{s}.npy") for s in salidas]
+    return esquema.a_pandas(pa.concat_tables(tablas)), np.concatenate(motivos).astype(np.uint32, copy=False)
+
+
+def validar(pol_path, sin_path, workers, bit_referencia):
+    """
+    (pol_df, sin_df, motivos_pol, motivos_sin) como los del camino en serie, o None si
+    hay que validar en serie (archivo vacío, columnas faltantes o valores no convertibles).
+    """
+    inicio = datetime.now()
+    archivos = {"polizas": pol_path, "siniestros": sin_path}
+    for tabla, path in archivos.items():
+        if not set(esquema.columnas(ESQUEMAS[tabla])) <= set(_encabezado(path)):
+            return None
+    partes = {tabla: tramos(path, max(1, min(workers * TRAMOS_POR_WORKER, os.path.getsize(path) // MIN_BYTES_TRAMO)))
+              for tabla, path in archivos.items()}
+    if not all(partes.values()):
+        return None
+
+    compartido = _directorio_compartido()
+    salidas = {tabla: [os.path.join(compartido, f"{tabla}-{i:05d}") for i in range(len(rangos))]
+               for tabla, rangos in partes.items()}
+    indice_dir = os.path.join(compartido, "indice_polizas")
+    try:
+        with instrumentacion.etapa("validacion_paralela", archivo=os.path.basename(pol_path)), \
+                ProcessPoolExecutor(max_workers=workers, initializer=_iniciar_worker,
+                                    initargs=(max(1, (os.cpu_count() or 1) // workers),)) as pool:
+            # pólizas primero: sus índices parciales desbloquean la regla de referencia
+            futuros = {}
+            for tabla in ("polizas", "siniestros"):
+                for (ini, fin), salida in zip(partes[tabla], salidas[tabla]):
+                    fut = pool.submit(_validar_tramo, tabla, archivos[tabla], ini, fin, salida, tabla == "polizas")
+                    futuros[fut] = (tabla, salida)
+            pendientes_pol = {f for f, (tabla, _) in futuros.items() if tabla == "polizas"}
+            sin_listos, referencias, tipado = [], [], True
+            pendientes = set(futuros)
+            while pendientes:
+                hechos, pendientes = wait(pendientes, return_when=FIRST_COMPLETED)
+                for fut in hechos:
+                    tipado &= fut.result()[1]
+                    tabla, salida = futuros[fut]
+                    if tabla == "siniestros":
+                        sin_listos.append(salida)
+                    pendientes_pol.discard(fut)
+                if not tipado:
+                    for fut in pendientes:
+                        fut.cancel()
+                    return None
+                if not pendientes_pol and not os.path.isdir(indice_dir):
+                    # el único punto de unión: índice de pólizas válidas de todos los tramos
+                    indice = IndiceIds()
+                    for salida in salidas["polizas"]:
+                        indice.unir(IndiceIds.cargar(f"{salida}.indice"))
+                    indice.guardar(indice_dir)
+                if os.path.isdir(indice_dir):
+                    referencias += [pool.submit(_referenciar_tramo, s, indice_dir, bit_referencia) for s in sin_listos]
+                    sin_listos = []
+            inexistentes = sum(f.result() for f in referencias)
+
+        pol_df, motivos_pol = _armar(salidas["polizas"])
+        sin_df, motivos_sin = _armar(salidas["siniestros"])
+    finally:
+        # los tramos mapeados siguen vivos en los DataFrames aunque se borre el directorio
+        shutil.rmtree(compartido, ignore_errors=True)
+
+    registrar_evento_auditoria(
+        etapa="validacion_paralela",
+        archivo=f"{os.path.basename(pol_path)},{os.path.basename(sin_path)}",
+        registros=len(pol_df) + len(sin_df),
+        inicio=inicio,
+        estado="OK",
+        mensaje=f"Workers: {workers}; tramos pol:{len(partes['polizas'])} sin:{len(partes['siniestros'])}; "
+                f"siniestros sin póliza válida: {inexistentes}"
+    )
+    return pol_df, sin_df, motivos_pol, motivos_sin
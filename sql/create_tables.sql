@@ -8,6 +8,46 @@ CREATE TABLE IF NOT EXISTS `project.dataset.resumen_producto_diario` (
   prima_promedio NUMERIC
 ) PARTITION BY process_date;
 
+-- Tabla: resumen_producto_microlotes (resumen del día que mantiene la ingesta por micro-lotes;
+-- separado del diario para que ninguno de los dos DAG reemplace la partición del otro)
+CREATE TABLE IF NOT EXISTS `project.dataset.resumen_producto_microlotes` (
+  process_date DATE,
+  producto STRING,
+  total_polizas INT64,
+  total_siniestros INT64,
+  monto_total NUMERIC,
+  prima_promedio NUMERIC
+) PARTITION BY process_date;
+
+-- Tabla: cubo_polizas_diario (grouping sets de producto x region x estado x mes de fecha_inicio;
+-- agrupacion = dimensiones del grupo unidas con '+', o 'total'; las demás quedan NULL)
+CREATE TABLE IF NOT EXISTS `project.dataset.cubo_polizas_diario` (
+  process_date DATE,
+  agrupacion STRING,
+  producto STRING,
+  region STRING,
+  estado STRING,
+  mes DATE,
+  total_polizas INT64,
+  total_siniestros INT64,
+  monto_total NUMERIC,
+  prima_promedio NUMERIC
+) PARTITION BY process_date
+CLUSTER BY agrupacion, producto;
+
+-- Tabla: cubo_siniestros_diario (grouping sets de producto x region x tipo_siniestro x mes de fecha_siniestro)
+CREATE TABLE IF NOT EXISTS `project.dataset.cubo_siniestros_diario` (
+  process_date DATE,
+  agrupacion STRING,
+  producto STRING,
+  region STRING,
+  tipo_siniestro STRING,
+  mes DATE,
+  total_siniestros INT64,
+  monto_total NUMERIC
+) PARTITION BY process_date
+CLUSTER BY agrupacion, producto;
+
 -- Tabla: auditoria_proceso
 CREATE TABLE IF NOT EXISTS `project.dataset.auditoria_proceso` (
   fecha_proceso DATETIME,
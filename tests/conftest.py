@@ -0,0 +1,13 @@
+import pytest
+from scripts import utils_auditoria
+
+
+@pytest.fixture(autouse=True)
+def auditoria_temporal(tmp_path, monkeypatch):
+    """Auditoría de cada test en su tmp_path: ningún test escribe en data/auditoria_proceso.csv"""
+    utils_auditoria.vaciar_auditoria()  # lo pendiente de un test anterior va a su propio destino
+    monkeypatch.setattr(utils_auditoria, "AUDITORIA_FILE", utils_auditoria.AUDITORIA_FILE)
+    monkeypatch.setattr(utils_auditoria, "AUDITORIA_BACKEND", utils_auditoria.AUDITORIA_BACKEND)
+    utils_auditoria.configurar_auditoria(str(tmp_path / "auditoria.csv"))
+    yield
+    utils_auditoria.vaciar_auditoria()
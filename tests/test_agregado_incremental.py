@@ -0,0 +1,52 @@
+import numpy as np
+import pandas as pd
+from scripts import agregado_incremental, esquema
+from scripts.agregado_incremental import aplicar_delta, cargar_estado
+from scripts.generar_datos import generar_csvs
+from scripts.transformaciones import resumen_por_producto
+
+
+def test_incremental_igual_a_recalculo_completo(tmp_path):
+    pol_path, sin_path = generar_csvs(str(tmp_path), seed=11, n_polizas=3000, n_siniestros=900)
+    pol = esquema.leer_csv(pol_path, esquema.POLIZAS)
+    sin = esquema.leer_csv(sin_path, esquema.SINIESTROS)
+    pol = pd.concat([pol, pol.iloc[:20]], ignore_index=True)  # pólizas reenviadas otro día
+
+    # deltas aleatorios: hay siniestros que llegan antes que su póliza
+    rng = np.random.default_rng(0)
+    dia_pol = rng.integers(0, 12, len(pol))
+    dia_sin = rng.integers(0, 12, len(sin))
+    estado_dir = str(tmp_path / "estado")
+    for dia in range(12):
+        resumen = aplicar_delta(estado_dir, pol[dia_pol == dia], sin[dia_sin == dia], lote=f"d{dia}")
+
+    pd.testing.assert_frame_equal(resumen, resumen_por_producto(pol, sin), check_exact=True)
+    # cada segmento tiene más filas que todos los más nuevos juntos: O(log n) segmentos
+    filas = [s["filas"] for s in cargar_estado(estado_dir)["segmentos"]]
+    assert all(f > agregado_incremental.RAZON_COMPACTACION * sum(filas[i + 1:]) for i, f in enumerate(filas[:-1]))
+    assert len(filas) <= 4
+    # claves de 16 bytes (UUID empaquetado o digest de los IDs inválidos / nulos) y productos uint8
+    seg = agregado_incremental._cargar_segmento(estado_dir, cargar_estado(estado_dir)["segmentos"][0]["nombre"])
+    assert (seg["pol_id"].dtype, seg["pol_producto"].dtype, seg["sin_id"].dtype) == (np.dtype("S16"), np.uint8, np.dtype("S16"))
+
+    # reaplicar un lote ya aplicado no cambia nada
+    pd.testing.assert_frame_equal(aplicar_delta(estado_dir, pol[dia_pol == 0], sin[dia_sin == 0], lote="d0"), resumen)
+
+
+def test_lotes_por_rango_se_guardan_fusionados(tmp_path):
+    pol_path, sin_path = generar_csvs(str(tmp_path), seed=5, n_polizas=400, n_siniestros=100)
+    pol = esquema.leer_csv(pol_path, esquema.POLIZAS)
+    sin = esquema.leer_csv(sin_path, esquema.SINIESTROS)
+    estado_dir = str(tmp_path / "estado")
+    for i in range(4):
+        resumen = aplicar_delta(estado_dir, pol[i::4], sin[i::4], lote=f"polizas.csv@{i * 100}-{(i + 1) * 100}")
+    aplicar_delta(estado_dir, pol.iloc[:0], sin.iloc[:0], lote="20250101")
+
+    # un rango por fuente, no un ID por lote
+    lotes = cargar_estado(estado_dir)["lotes_aplicados"]
+    assert lotes == {"ids": {"20250101"}, "rangos": {"polizas.csv": [[0, 400]]}}
+    pd.testing.assert_frame_equal(resumen, resumen_por_producto(pol, sin), check_exact=True)
+
+    # un tramo dentro de lo ya aplicado se omite; uno que sigue se aplica
+    assert aplicar_delta(estado_dir, pol, sin, lote="polizas.csv@100-300").equals(resumen)
+    assert not aplicar_delta(estado_dir, pol, sin, lote="polizas.csv@400-500").equals(resumen)
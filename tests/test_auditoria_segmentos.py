@@ -0,0 +1,79 @@
+import os
+
+import pandas as pd
+from scripts import auditoria_segmentos, carga, utils_auditoria
+from scripts.utils_auditoria import leer_auditoria, registrar_evento_auditoria, ultimos_eventos, latencias
+
+
+def _eventos(fecha, n, etapa="validar", duracion=1.0):
+    return [{"fecha_proceso": f"{fecha} 02:00:{i % 60:02d}", "etapa": etapa, "archivo": "x.csv", "registros": 100,
+             "estado": "OK", "mensaje": "", "duracion_segundos": duracion * (i + 1)} for i in range(n)]
+
+
+def test_rotacion_por_fecha_y_tamanio(tmp_path, monkeypatch):
+    destino = str(tmp_path / "auditoria")
+    monkeypatch.setattr(auditoria_segmentos, "SEGMENTO_MAX_BYTES", 1)  # cada lote rota
+    for _ in range(3):
+        auditoria_segmentos.escribir(destino, _eventos("2025-10-26", 5))
+    auditoria_segmentos.escribir(destino, _eventos("2025-10-26", 2) + _eventos("2025-10-27", 4, etapa="cargar_bq"))
+
+    segmentos = auditoria_segmentos.leer_indice(destino)["segmentos"]
+    assert [s["ruta"] for s in segmentos] == [os.path.join("fecha=2025-10-26", f"segmento-{i:05d}.csv")
+                                              for i in range(4)] + [os.path.join("fecha=2025-10-27",
+                                                                                 "segmento-00000.csv")]
+    assert sum(s["filas"] for s in segmentos) == 21
+    assert segmentos[-1]["etapas"] == {"cargar_bq": {"eventos": 4, "registros": 400, "duracion": 10.0}}
+    assert len(auditoria_segmentos.leer(destino, fechas={"2025-10-27"})) == 4
+
+    # el índice se reconstruye igual desde los segmentos
+    os.remove(os.path.join(destino, auditoria_segmentos.INDICE))
+    assert auditoria_segmentos.reindexar(destino)["segmentos"] == segmentos
+
+
+def test_ultimos_lee_solo_los_segmentos_necesarios(tmp_path, monkeypatch):
+    destino = str(tmp_path / "auditoria")
+    auditoria_segmentos.escribir(destino, _eventos("2025-10-25", 3, etapa="backfill"))
+    auditoria_segmentos.escribir(destino, _eventos("2025-10-26", 10))
+    auditoria_segmentos.escribir(destino, _eventos("2025-10-27", 3, etapa="cargar_bq"))
+    leidos = []
+    leer = auditoria_segmentos._leer
+    monkeypatch.setattr(auditoria_segmentos, "_leer",
+                        lambda d, segs, columnas=None: leidos.extend(s["fecha"] for s in segs) or leer(d, segs, columnas))
+
+    assert ultimos_eventos(2, destino=destino + "/")["etapa"].tolist() == ["cargar_bq"] * 2
+    assert leidos == ["2025-10-27"]
+    del leidos[:]
+    ultimos = auditoria_segmentos.ultimos(destino, 4, etapa="validar")
+    assert ultimos["duracion_segundos"].tolist() == [7.0, 8.0, 9.0, 10.0]
+    assert leidos == ["2025-10-26"]  # la del 27 no tiene la etapa; la del 25 ya no hace falta
+
+
+def test_latencias_por_ventana(tmp_path):
+    destino = str(tmp_path / "auditoria")
+    auditoria_segmentos.escribir(destino, _eventos("2025-10-01", 100, duracion=10.0))
+    auditoria_segmentos.escribir(destino, _eventos("2025-10-26", 100) + _eventos("2025-10-27", 1, etapa="cargar_bq"))
+
+    res = auditoria_segmentos.latencias(destino, desde="2025-10-20", hasta="2025-10-31").set_index("etapa")
+    assert res.loc["validar", "eventos"] == 100
+    assert res.loc["validar", "p50"] == 50.5 and res.loc["validar", "p99"] == 99.01
+    assert res.loc["validar", "registros_por_segundo"] == round(100 * 100 / 5050, 2)
+    assert res.loc["cargar_bq", "p90"] == 1.0
+    # mismo cálculo sobre cualquier backend
+    pd.testing.assert_frame_equal(
+        auditoria_segmentos.latencias_de(leer_auditoria(destino + "/"), "2025-10-20", "2025-10-31").set_index("etapa"),
+        res)
+
+
+def test_backend_segmentos_desde_el_registro(tmp_path, monkeypatch):
+    destino = str(tmp_path / "auditoria") + os.sep
+    monkeypatch.setattr(utils_auditoria, "AUDITORIA_FILE", destino)
+    registrar_evento_auditoria("etapa_a", registros=3, duracion=0.5)
+    registrar_evento_auditoria("etapa_b", registros=4, duracion=2.0)
+    assert leer_auditoria()["etapa"].tolist() == ["etapa_a", "etapa_b"]
+    assert latencias(etapas=["etapa_b"])["registros_por_segundo"].tolist() == [2.0]
+
+    hoy = pd.Timestamp.now().strftime("%Y-%m-%d")
+    db = str(tmp_path / "warehouse.db")
+    assert carga.cargar_auditoria([hoy], destino=db) == 2
+    assert carga.cargar_auditoria(["2000-01-01"], destino=db) == 0
+    carga.cerrar_almacenes()
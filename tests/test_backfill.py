@@ -0,0 +1,39 @@
+import os
+from datetime import date
+import pandas as pd
+import pytest
+from scripts import utils_auditoria
+from scripts.backfill import ejecutar_backfill
+from scripts.generar_datos import generar_csvs
+
+
+def test_backfill_aislamiento_y_reanudacion(tmp_path, monkeypatch):
+    data = tmp_path / "data"
+    out = tmp_path / "out"
+    audit = tmp_path / "auditoria_proceso.csv"
+    monkeypatch.setattr(utils_auditoria, "AUDITORIA_FILE", str(audit))
+    for dia in (1, 3):
+        generar_csvs(str(data), date=date(2025, 1, dia), seed=dia, n_polizas=500, n_siniestros=100, err_rate=0.01)
+
+    res = ejecutar_backfill("2025-01-01", "2025-01-03", str(data), str(out), workers=2)
+
+    # el día sin archivos no detiene los demás
+    assert [r["estado"] for r in res] == ["OK", "SIN_ARCHIVOS", "OK"]
+    assert os.path.exists(out / "resumen_producto_20250101.csv")
+    assert os.path.exists(out / "resumen_producto_20250103.csv")
+
+    # auditoría de los workers fusionada en el archivo principal
+    etapas = pd.read_csv(audit)["etapa"].tolist()
+    assert etapas.count("backfill_fecha") == 3
+
+    # reanudación: sólo se reintenta la fecha pendiente
+    generar_csvs(str(data), date=date(2025, 1, 2), seed=2, n_polizas=500, n_siniestros=100, err_rate=0.01)
+    res = ejecutar_backfill("2025-01-01", "2025-01-03", str(data), str(out), workers=2)
+    assert [r.get("omitida", False) for r in res] == [True, False, True]
+    assert [r["estado"] for r in res] == ["OK", "OK", "OK"]
+
+
+def test_backfill_rango_invertido(tmp_path):
+    with pytest.raises(ValueError, match="Rango de fechas vacío"):
+        ejecutar_backfill("2025-01-05", "2025-01-01", str(tmp_path / "data"), str(tmp_path / "out"))
+    assert not os.path.exists(tmp_path / "out")
@@ -0,0 +1,24 @@
+from benchmarks.suite import comparar
+
+
+def _doc(*filas):
+    return {"resultados": [dict(zip(("tamanio", "etapa", "segundos", "pico_rss_mb"), f)) for f in filas]}
+
+
+def test_comparar_detecta_regresiones_sobre_tolerancia():
+    baseline = _doc((1000, "validar_archivos", 2.0, 500.0), (1000, "dag", 0.01, 30.0))
+    # +20% tiempo: dentro de la tolerancia; el dag de milisegundos es ruido
+    assert comparar(_doc((1000, "validar_archivos", 2.4, 500.0), (1000, "dag", 0.04, 30.0)), baseline) == []
+
+    regresiones = comparar(_doc((1000, "validar_archivos", 3.0, 800.0)), baseline, tolerancia=0.25)
+    assert len(regresiones) == 2  # tiempo y memoria
+    assert comparar(_doc((1000, "validar_archivos", 3.0, 500.0)), baseline, tolerancia=0.6) == []
+
+
+def test_cruce_de_motores():
+    from benchmarks.bench_motores import cruce
+    filas = [(1000, "pandas", {"segundos": 0.1}), (1000, "spark", {"segundos": 3.0}),
+             (10**6, "pandas", {"segundos": 5.0}), (10**6, "spark", {"segundos": 4.0}),
+             (10**7, "pandas", {"segundos": 50.0}), (10**7, "spark", {"segundos": 20.0})]
+    assert cruce(filas) == 10**6
+    assert cruce(filas[:2]) is None
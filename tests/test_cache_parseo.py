@@ -0,0 +1,47 @@
+import os
+import pandas as pd
+from scripts import cache_parseo
+from scripts.cache_parseo import leer_csv
+
+
+def _escribir(path, filas):
+    pd.DataFrame({"poliza_id": [f"p{i}" for i in range(filas)], "prima_mensual": range(filas)}).to_csv(path, index=False)
+
+
+def test_cache_hit_e_invalidacion(tmp_path):
+    path = tmp_path / "polizas_20240101.csv"
+    _escribir(path, 5)
+
+    misses = cache_parseo.ESTADISTICAS["miss"]
+    hits = cache_parseo.ESTADISTICAS["hit"]
+    df1 = leer_csv(str(path))
+    df2 = leer_csv(str(path))
+    assert cache_parseo.ESTADISTICAS["miss"] == misses + 1
+    assert cache_parseo.ESTADISTICAS["hit"] == hits + 1
+    pd.testing.assert_frame_equal(df1, df2)
+
+    # mismo contenido con otro mtime -> sigue siendo hit
+    os.utime(path, (1, 1))
+    leer_csv(str(path))
+    assert cache_parseo.ESTADISTICAS["hit"] == hits + 2
+
+    # contenido distinto -> se vuelve a parsear
+    _escribir(path, 7)
+    assert len(leer_csv(str(path))) == 7
+    assert cache_parseo.ESTADISTICAS["miss"] == misses + 2
+
+
+def test_cache_desalojo_lru(tmp_path):
+    cache_dir = str(tmp_path / cache_parseo.CACHE_DIRNAME)
+    _escribir(tmp_path / "f0.csv", 50)
+    leer_csv(str(tmp_path / "f0.csv"))
+    tam = next(iter(cache_parseo._cargar_indice(cache_dir).values()))["bytes"]
+
+    # con espacio para dos entradas se desaloja la menos usada (f0)
+    for nombre in ["f1.csv", "f2.csv"]:
+        _escribir(tmp_path / nombre, 50)
+        leer_csv(str(tmp_path / nombre), max_bytes=2 * tam)
+
+    indice = cache_parseo._cargar_indice(cache_dir)
+    assert sorted(os.path.basename(k.split("|")[0]) for k in indice) == ["f1.csv", "f2.csv"]
+    assert len([f for f in os.listdir(cache_dir) if f.endswith(".feather")]) == 2
@@ -0,0 +1,49 @@
+import pandas as pd
+from scripts import carga, utils_auditoria
+from scripts.utils_auditoria import registrar_evento_auditoria
+
+
+def _resumen(path, monto):
+    pd.DataFrame({
+        "producto": ["AUTO", "VIDA"],
+        "total_polizas": [10, 5],
+        "total_siniestros": [2, 0],
+        "monto_total": [monto, 0.0],
+        "prima_promedio": [350.5, 120.0],
+    }).to_csv(path, index=False)
+    return str(path)
+
+
+def test_cargar_resumen_reemplaza_la_particion(tmp_path):
+    destino = str(tmp_path / "warehouse.db")
+    dia1 = _resumen(tmp_path / "resumen_producto_20251027.csv", 100.0)
+    dia2 = _resumen(tmp_path / "resumen_producto_20251028.csv", 200.0)
+
+    for _ in range(2):  # reintento: no duplica
+        assert carga.cargar_resumen(dia1, destino=destino) == 2
+    carga.cargar_resumen(dia2, destino=destino)
+    _resumen(tmp_path / "resumen_producto_20251027.csv", 150.0)
+    carga.cargar_resumen(dia1, destino=destino)  # re-ejecución con datos corregidos
+
+    almacen = carga.almacen(destino)
+    df = almacen.leer(carga.RESUMEN)
+    assert len(df) == 4
+    assert almacen.leer(carga.RESUMEN, "2025-10-27")["monto_total"].tolist() == [150.0, 0.0]
+    assert almacen.leer(carga.RESUMEN, "20251028")["monto_total"].tolist() == [200.0, 0.0]
+    carga.cerrar_almacenes()
+
+
+def test_cargar_auditoria_por_fecha(tmp_path):
+    destino = str(tmp_path / "warehouse.db")
+    registrar_evento_auditoria("etapa_a", registros=3)
+    registrar_evento_auditoria("etapa_b", registros=4)
+    hoy = pd.Timestamp.now().strftime("%Y-%m-%d")
+
+    assert carga.cargar_auditoria([hoy], destino=destino) == 2
+    assert carga.cargar_auditoria(["2000-01-01"], destino=destino) == 0
+    # la segunda carga del día incluye el evento carga_auditoria de la primera y reemplaza la partición
+    n = carga.cargar_auditoria([hoy], destino=destino)
+    df = carga.almacen(destino).leer(carga.AUDITORIA, hoy)
+    assert len(df) == n
+    assert df["etapa"].tolist()[:2] == ["etapa_a", "etapa_b"]
+    carga.cerrar_almacenes()
@@ -0,0 +1,64 @@
+import os
+import numpy as np
+import pandas as pd
+from scripts import cuarentena, esquema
+from scripts.validacion import REGLAS_POLIZAS, validar_archivos, validar_archivos_streaming, validar_polizas_df
+
+
+def _polizas():
+    return pd.DataFrame({
+        "poliza_id": ["p1", "p2", "", "p4"],
+        "cliente_id": [1, 2, 3, 4],
+        "producto": ["AUTO", "VIDA", "HOGAR", "BARCO"],
+        "suma_asegurada": [10000, -5, -1, 100],
+        "prima_mensual": [300, 400, 0, 10],
+        "fecha_inicio": ["2024-01-01"] * 4,
+        "estado": ["ACTIVA"] * 4,
+        "region": ["CDMX"] * 4,
+    })
+
+
+def test_motivos_por_regla():
+    _, invalidos = validar_polizas_df(_polizas())
+    nombres = [esquema.decodificar(m, REGLAS_POLIZAS) for m in invalidos["motivos"]]
+    assert nombres == [
+        ["suma_asegurada_no_positivo"],
+        ["poliza_id_vacio", "suma_asegurada_no_positivo", "prima_mensual_no_positivo"],
+        ["producto_fuera_de_dominio"],
+    ]
+
+
+def test_guardar_particiona_y_es_idempotente(tmp_path):
+    raiz = str(tmp_path)
+    _, invalidos = validar_polizas_df(_polizas())
+    for _ in range(2):  # el reintento reemplaza el lote
+        m = cuarentena.guardar(raiz, "polizas", invalidos, REGLAS_POLIZAS, fecha="20251027", lote="polizas_20251027")
+
+    # la fila con poliza_id vacío va a su primera regla incumplida
+    assert sorted(m["particiones"]) == ["poliza_id_vacio", "producto_fuera_de_dominio", "suma_asegurada_no_positivo"]
+    assert os.path.exists(tmp_path / "tabla=polizas" / "fecha=20251027" / "motivo=poliza_id_vacio" / "polizas_20251027.parquet")
+    conteos = cuarentena.conteos(raiz, "polizas")
+    assert conteos["suma_asegurada_no_positivo"] == 2
+    assert conteos["prima_mensual_no_positivo"] == 1
+    assert len(cuarentena.leer(raiz, "polizas")) == 3
+    assert len(cuarentena.leer(raiz, "polizas", motivo="suma_asegurada_no_positivo")) == 2
+
+    # un reintento con menos rechazos no deja particiones viejas
+    solo = invalidos[invalidos["motivos"] == np.uint32(1 << REGLAS_POLIZAS.index("producto_fuera_de_dominio"))]
+    cuarentena.guardar(raiz, "polizas", solo, REGLAS_POLIZAS, fecha="20251027", lote="polizas_20251027")
+    assert len(cuarentena.leer(raiz, "polizas")) == 1
+    assert cuarentena.conteos(raiz, "polizas")["suma_asegurada_no_positivo"] == 0
+
+
+def test_validacion_con_cuarentena_streaming_coincide(tmp_path):
+    from scripts.generar_datos import generar_csvs
+    pol, sin = generar_csvs(str(tmp_path), seed=7, n_polizas=3000, n_siniestros=800, err_rate=0.05)
+    completo = validar_archivos(pol, sin, cuarentena_dir=str(tmp_path / "q1"))
+    streaming = validar_archivos_streaming(pol, sin, str(tmp_path / "out"), chunksize=500,
+                                           cuarentena_dir=str(tmp_path / "q2"))
+
+    assert streaming["pol_motivos"] == completo["pol_motivos"]
+    assert streaming["sin_motivos"] == completo["sin_motivos"]
+    for q in ("q1", "q2"):
+        assert cuarentena.conteos(str(tmp_path / q), "siniestros") == completo["sin_motivos"]
+        assert len(cuarentena.leer(str(tmp_path / q), "polizas")) == completo["pol_invalidos"]
@@ -0,0 +1,85 @@
+from datetime import date
+
+import pandas as pd
+from scripts import carga, cubo, esquema
+from scripts.cache_parseo import leer_csv
+from scripts.generar_datos import generar_csvs
+from scripts.transformaciones import resumen_por_producto
+
+
+def _datos():
+    pol = pd.DataFrame({
+        "poliza_id": ["p1", "p2", "p3", "p3"],  # p3 repetida en dos regiones
+        "cliente_id": [1, 2, 3, 4],
+        "producto": ["AUTO", "AUTO", "VIDA", "VIDA"],
+        "suma_asegurada": [10000, 20000, 30000, 30000],
+        "prima_mensual": [100, 200, 300, 301],
+        "fecha_inicio": ["2024-01-01", "2024-02-02", "2024-01-03", "2024-03-01"],
+        "estado": ["ACTIVA", "CANCELADA", "ACTIVA", "ACTIVA"],
+        "region": ["CDMX", "GDL", "MTY", "CDMX"],
+    })
+    sin = pd.DataFrame({
+        "siniestro_id": ["s1", "s2", "s3", "s4"],
+        "poliza_id": ["p1", "p3", "p3", "huerfana"],
+        "fecha_siniestro": ["2024-02-01", "2024-02-02", "2024-03-05", "2024-03-01"],
+        "tipo_siniestro": ["CHOQUE", "ROBO", "ROBO", "ROBO"],
+        "monto_reclamado": [1000, 2000, 10.5, 7],
+        "estado": ["APROBADO"] * 4,
+    })
+    return pol, sin
+
+
+def _grupo(df, agrupacion):
+    return df[df["agrupacion"] == agrupacion].reset_index(drop=True)
+
+
+def test_grupo_producto_coincide_con_el_resumen():
+    pol, sin = _datos()
+    cubos = cubo.calcular(pol, sin)
+    por_producto = _grupo(cubos[cubo.CUBO_POLIZAS], "producto")[["producto", *cubo.MEDIDAS[cubo.CUBO_POLIZAS]]]
+    pd.testing.assert_frame_equal(por_producto, resumen_por_producto(pol, sin), check_dtype=False)
+    # todos los grouping sets (CUBE de 4 dimensiones)
+    assert cubos[cubo.CUBO_POLIZAS]["agrupacion"].nunique() == 16
+
+
+def test_polizas_distintas_y_meses_por_grupo():
+    pol, sin = _datos()
+    polizas = cubo.calcular(pol, sin)[cubo.CUBO_POLIZAS]
+    # p3 está en CDMX y MTY: cuenta en ambas regiones pero una sola vez en el total
+    assert _grupo(polizas, "total")["total_polizas"].tolist() == [3]
+    assert dict(_grupo(polizas, "region")[["region", "total_polizas"]].values) == {"CDMX": 2, "GDL": 1, "MTY": 1}
+    assert _grupo(polizas, "mes")["mes"].tolist() == ["2024-01-01", "2024-02-01", "2024-03-01"]
+    fila = _grupo(polizas, "producto+region+estado+mes").iloc[0]
+    assert (fila["producto"], fila["region"], fila["estado"], fila["mes"]) == ("AUTO", "CDMX", "ACTIVA", "2024-01-01")
+
+
+def test_cubo_siniestros_toma_dimensiones_de_la_poliza():
+    pol, sin = _datos()
+    siniestros = cubo.calcular(pol, sin)[cubo.CUBO_SINIESTROS]
+    por_producto = _grupo(siniestros, "producto")
+    # el siniestro huérfano queda con producto nulo; p3 toma la primera póliza (MTY)
+    assert por_producto["producto"].tolist() == [None, "AUTO", "VIDA"]
+    assert por_producto["monto_total"].tolist() == [7.0, 1000.0, 2010.5]
+    assert dict(_grupo(siniestros, "region")[["region", "total_siniestros"]].values) == {None: 1, "CDMX": 1, "MTY": 2}
+    for agrupacion in siniestros["agrupacion"].unique():
+        assert _grupo(siniestros, agrupacion)["total_siniestros"].sum() == 4
+
+
+def test_main_escribe_y_carga_los_cubos(tmp_path):
+    pol_path, sin_path = generar_csvs(str(tmp_path), date=date(2025, 10, 27), seed=3, n_polizas=2000,
+                                      n_siniestros=400)
+    rutas = cubo.main(pol_path, sin_path, str(tmp_path), "20251027")
+    assert rutas[cubo.CUBO_POLIZAS] == str(tmp_path / "cubos" / "tabla=cubo_polizas_diario" / "fecha=20251027"
+                                           / "cubo_polizas_diario_20251027.parquet")
+    pol, sin = leer_csv(pol_path, esquema.POLIZAS), leer_csv(sin_path, esquema.SINIESTROS)
+    esperado = resumen_por_producto(pol, sin)
+    leido = _grupo(cubo.leer(rutas[cubo.CUBO_POLIZAS]), "producto").dropna(subset=["producto"])
+    assert leido["total_polizas"].tolist() == esperado["total_polizas"].tolist()
+
+    destino = str(tmp_path / "warehouse.db")
+    for _ in range(2):  # reintento: reemplaza la partición
+        for tabla, path in rutas.items():
+            assert carga.cargar_cubo(path, tabla, destino=destino) == len(cubo.leer(path))
+    almacen = carga.almacen(destino)
+    assert len(almacen.leer(cubo.CUBO_SINIESTROS, "2025-10-27")) == len(cubo.leer(rutas[cubo.CUBO_SINIESTROS]))
+    carga.cerrar_almacenes()
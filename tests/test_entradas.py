@@ -0,0 +1,56 @@
+import os
+from datetime import date
+
+import pandas as pd
+from scripts import entradas, esquema, tareas_dag, utils_auditoria, validacion
+from scripts.generar_datos import generar_csvs
+
+
+def test_partes_comprimidas_iguales_al_csv_plano(tmp_path):
+    pol, sin = generar_csvs(str(tmp_path / "plano"), date=date(2025, 1, 1), seed=3, n_polizas=2500,
+                            n_siniestros=700, chunk_size=1000)
+    pol_gz, sin_gz = generar_csvs(str(tmp_path / "partes"), date=date(2025, 1, 1), seed=3, n_polizas=2500,
+                                  n_siniestros=700, chunk_size=1000, partes=4, compresion="gzip")
+    assert pol_gz.endswith("polizas_20250101-*.csv.gz") and len(entradas.partes(pol_gz)) == 4
+
+    pd.testing.assert_frame_equal(entradas.leer_csv(pol_gz, esquema.POLIZAS, workers=2),
+                                  esquema.leer_csv(pol, esquema.POLIZAS))
+    pd.testing.assert_frame_equal(entradas.leer_csv(sin_gz, esquema.SINIESTROS),
+                                  esquema.leer_csv(sin, esquema.SINIESTROS))
+
+    utils_auditoria.vaciar_auditoria()
+    eventos = pd.read_csv(tmp_path / "auditoria.csv")
+    lectura = eventos[eventos["etapa"] == "lectura_partes"].iloc[0]
+    assert lectura["registros"] == 2500 and "Partes: 4;" in lectura["mensaje"]
+    ratio = float(lectura["mensaje"].split("ratio: ")[1].split(";")[0])
+    assert ratio == round(os.path.getsize(pol) / sum(map(os.path.getsize, entradas.partes(pol_gz))), 2)
+
+
+def test_validacion_de_partes_igual_a_la_del_csv_plano(tmp_path):
+    plano = generar_csvs(str(tmp_path / "plano"), date=date(2025, 1, 1), seed=9, n_polizas=1200, n_siniestros=300)
+    partes = generar_csvs(str(tmp_path / "partes"), date=date(2025, 1, 1), seed=9, n_polizas=1200, n_siniestros=300,
+                          partes=3, compresion="zstd")
+
+    res = validacion.validar_archivos(*partes, validos_dir=str(tmp_path / "validos"), muestreo_previo=True)
+    esperado = validacion.validar_archivos(*plano)
+    for clave in ("estado", "pol_total", "pol_invalidos", "sin_total", "sin_invalidos", "pol_motivos", "sin_motivos"):
+        assert res[clave] == esperado[clave]
+    assert os.path.basename(res["valid_pol_path"]) == "polizas_20250101_validos.arrow"
+
+    streaming = validacion.validar_archivos_streaming(*partes, str(tmp_path / "streaming"), chunksize=500)
+    assert (streaming["sin_total"], streaming["sin_invalidos"]) == (esperado["sin_total"], esperado["sin_invalidos"])
+
+
+def test_dag_toma_las_partes_del_dia(tmp_path, monkeypatch):
+    monkeypatch.setattr(tareas_dag, "DATA_DIR", str(tmp_path))
+    monkeypatch.setattr(tareas_dag, "QUARANTINE_DIR", str(tmp_path / "quarantine"))
+    pol, sin = generar_csvs(str(tmp_path), date=date.today(), seed=7, n_polizas=500, n_siniestros=100,
+                            err_rate=0.5, partes=2, compresion="gzip")
+
+    ti, tiempos = tareas_dag.ejecutar_local()
+
+    assert ti.xcom_pull(key="pol_path") == pol
+    assert tiempos[-1][0] == "mover_cuarentena"
+    fecha = date.today().strftime("%Y%m%d")
+    assert len(os.listdir(tmp_path / "quarantine" / "archivos" / f"fecha={fecha}")) == 4
+    assert entradas.buscar(str(tmp_path), "polizas", fecha) is None
@@ -0,0 +1,23 @@
+from scripts import esquema
+
+
+def test_leer_csv_tipado_y_coercion(tmp_path):
+    path = tmp_path / "polizas.csv"
+    path.write_text(
+        "poliza_id,cliente_id,producto,suma_asegurada,prima_mensual,fecha_inicio,estado,region\n"
+        "p1,1,AUTO,abc,5,2024-01-01,ACTIVA,GDL\n"
+        "p2,2,SALUD,10,5,2024-01-01,ACTIVA,GDL\n"
+        ",3,VIDA,10,5,2024-01-01,ACTIVA,GDL\n"
+        "p4,4,VIDA,10,5,2024-01-01,ACTIVA,GDL\n",
+        encoding="utf-8",
+    )
+    df = esquema.leer_csv(str(path), esquema.POLIZAS)
+
+    # tipos resueltos al parsear, aun con un monto no numérico
+    assert str(df["poliza_id"].dtype) == "string"
+    assert str(df["producto"].dtype) == "category"
+    assert df["suma_asegurada"].dtype == "float64"
+    assert df["suma_asegurada"].isna().sum() == 1
+
+    # monto inválido, producto fuera de dominio e id vacío -> inválidos
+    assert esquema.mascara_validos(df, esquema.POLIZAS).tolist() == [False, False, False, True]
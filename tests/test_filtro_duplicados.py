@@ -0,0 +1,89 @@
+import multiprocessing as mp
+import uuid
+from datetime import date
+
+import numpy as np
+import pandas as pd
+from scripts import filtro_duplicados, utils_auditoria
+from scripts.generar_datos import generar_csvs
+from scripts.validacion import validar_archivos
+
+
+def _ids(n, seed):
+    rng = np.random.default_rng(seed)
+    return [str(uuid.UUID(bytes=bytes(b), version=4)) for b in rng.integers(0, 256, (n, 16), dtype=np.uint8)]
+
+
+def test_filtro_sin_falsos_negativos_y_pocos_falsos_positivos():
+    bloques, k = filtro_duplicados.FiltroBloom.dimensionar(10_000)
+    filtro = filtro_duplicados.FiltroBloom(np.zeros(bloques * filtro_duplicados.PALABRAS_BLOQUE, np.uint64), k)
+    presentes, _, _ = filtro_duplicados.hashes(_ids(10_000, 1))
+    ausentes, _, _ = filtro_duplicados.hashes(_ids(10_000, 2))
+    filtro.agregar(presentes)
+    assert filtro.contiene(presentes).all()
+    assert filtro.contiene(ausentes).mean() < 0.03
+
+
+def test_duplicados_solo_de_dias_anteriores(tmp_path):
+    historial = str(tmp_path / "historial")
+    ayer, hoy = _ids(2000, 3), _ids(2000, 4)
+    assert not filtro_duplicados.duplicados(historial, "polizas", hoy, "20251027")[0].any()
+
+    filtro_duplicados.registrar(historial, "polizas", ayer + ["POL-1", None], "20251026", capacidad=10_000)
+    llegada = hoy[:1500] + ayer[:500] + ["POL-1", "POL-2", None]
+    repetidos, candidatos = filtro_duplicados.duplicados(historial, "polizas", llegada, "20251027")
+    assert repetidos.tolist() == [False] * 1500 + [True] * 500 + [True, False, False]
+    assert candidatos >= 501
+
+    # re-correr el mismo día no se marca a sí mismo, y re-registrar no duplica el conteo
+    filtro_duplicados.registrar(historial, "polizas", llegada, "20251027")
+    assert (filtro_duplicados.duplicados(historial, "polizas", llegada, "20251027")[0] == repetidos).all()
+    meta = filtro_duplicados.registrar(historial, "polizas", llegada, "20251027")
+    assert meta["insertados"] == 2001 + 2002 and meta["fechas"] == ["20251026", "20251027"]
+    # re-registrar con otros IDs reemplaza el conteo de la fecha
+    meta = filtro_duplicados.registrar(historial, "polizas", hoy[:10], "20251027")
+    assert meta["insertados"] == 2001 + 10
+
+
+def _registrar_dia(historial, dia):
+    filtro_duplicados.registrar(historial, "polizas", _ids(3000, dia), f"202510{dia:02d}", capacidad=50_000)
+
+
+def test_registros_concurrentes_no_pierden_bits(tmp_path):
+    historial = str(tmp_path / "historial")
+    filtro_duplicados.registrar(historial, "polizas", [], "20251001", capacidad=50_000)
+    ctx = mp.get_context("fork")
+    procs = [ctx.Process(target=_registrar_dia, args=(historial, dia)) for dia in range(2, 6)]
+    for p in procs:
+        p.start()
+    for p in procs:
+        p.join()
+
+    meta = filtro_duplicados.leer_meta(historial, "polizas")
+    assert meta["insertados"] == 4 * 3000 and len(meta["fechas"]) == 5
+    for dia in range(2, 6):
+        repetidos, _ = filtro_duplicados.duplicados(historial, "polizas", _ids(3000, dia), "20251031")
+        assert repetidos.all()
+
+
+def test_validacion_marca_duplicados(tmp_path):
+    historial = str(tmp_path / "historial")
+    pol_ayer, _ = generar_csvs(str(tmp_path / "ayer"), date=date(2025, 10, 26), seed=5, n_polizas=1000,
+                               n_siniestros=100, err_rate=0.0)
+    ids_ayer = pd.read_csv(pol_ayer)["poliza_id"]
+    filtro_duplicados.registrar(historial, "polizas", ids_ayer, "20251026", capacidad=10_000)
+
+    pol, sin = generar_csvs(str(tmp_path), date=date(2025, 10, 27), seed=6, n_polizas=1000, n_siniestros=100,
+                            err_rate=0.0)
+    df = pd.read_csv(pol)
+    df.loc[:49, "poliza_id"] = ids_ayer[:50].values
+    df.to_csv(pol, index=False)
+
+    res = validar_archivos(pol, sin, historial_dir=historial)
+    assert res["estado"] == "VALIDO"
+    assert res["duplicados"]["polizas"]["confirmados"] == 50
+    assert sorted(res["duplicados"]["polizas"]["ids"]) == sorted(ids_ayer[:50])
+    assert res["duplicados"]["siniestros"]["confirmados"] == 0
+    utils_auditoria.vaciar_auditoria()
+    eventos = pd.read_csv(tmp_path / "auditoria.csv")
+    assert eventos.loc[eventos["etapa"] == "duplicados_polizas", "registros"].tolist() == [50]
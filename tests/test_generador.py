@@ -23,3 +23,22 @@ def test_generar_datos(tmp_path):
     # Validar columnas esperadas básicas
     assert {"poliza_id", "producto", "prima_mensual"}.issubset(df_pol.columns)
     assert {"siniestro_id", "poliza_id", "monto_reclamado"}.issubset(df_sin.columns)
+
+
+def test_generar_datos_semilla_reproducible(tmp_path):
+    p1, s1 = generar_csvs(str(tmp_path / "a"), seed=42, n_polizas=2000, n_siniestros=500)
+    p2, s2 = generar_csvs(str(tmp_path / "b"), seed=42, n_polizas=2000, n_siniestros=500)
+
+    # misma semilla -> mismos archivos
+    assert open(p1, "rb").read() == open(p2, "rb").read()
+    assert open(s1, "rb").read() == open(s2, "rb").read()
+
+    df_pol = pd.read_csv(p1)
+    df_sin = pd.read_csv(s1)
+    assert len(df_pol) == 2000
+    assert len(df_sin) == 500
+
+    # los siniestros sin prefijo "invalid-" referencian pólizas generadas
+    refs = df_sin["poliza_id"].dropna()
+    refs = refs[~refs.str.startswith("invalid-")]
+    assert refs.isin(set(df_pol["poliza_id"].dropna())).all()
@@ -0,0 +1,69 @@
+import uuid
+
+import numpy as np
+import pandas as pd
+from scripts import indice_ids
+from scripts.indice_ids import IndiceIds
+from scripts.validacion import validar_siniestros_df
+
+
+def _uuids(n, seed=0):
+    rng = np.random.default_rng(seed)
+    return [str(uuid.UUID(bytes=rng.bytes(16), version=4)) for _ in range(n)]
+
+
+def test_empaquetar_y_formatear_ida_y_vuelta():
+    ids = _uuids(50)
+    alto, bajo, canonico, _ = indice_ids.empaquetar(pd.Series(ids))
+    assert canonico.all()
+    assert [int(a) << 64 | int(b) for a, b in zip(alto, bajo)] == [uuid.UUID(i).int for i in ids]
+    assert indice_ids.formatear(alto, bajo).astype(str).tolist() == ids
+
+
+def test_pertenencia_igual_que_set_con_ids_no_canonicos():
+    ids = _uuids(20)
+    pol = ids[:10] + ["invalid-abc", ids[10].upper(), "", None]
+    consultas = ids + ["invalid-abc", "invalid-xyz", ids[10].upper(), ids[0][:-1] + "g", "", None]
+    idx = IndiceIds.desde(pd.Series(pol, dtype="string"))
+    esperado = [c is not None and c in set(p for p in pol if p is not None) for c in consultas]
+    assert idx.contiene(pd.Series(consultas, dtype="string")).tolist() == esperado
+    assert len(idx) == 13  # 10 canónicos + 3 no canónicos (sin el nulo)
+
+
+def test_mitades_altas_repetidas_y_duplicados():
+    idx = IndiceIds()
+    for alto, bajo in (([5, 5, 1], [3, 1, 9]), ([5, 5], [2, 3])):  # (5, 3) agregado dos veces
+        idx._partes.append((np.array(alto, dtype=np.uint64), np.array(bajo, dtype=np.uint64)))
+    idx._consolidar()
+    assert idx.alto.tolist() == [1, 5, 5, 5] and idx.bajo.tolist() == [9, 1, 2, 3]
+    res = idx._contiene_empaquetados(np.array([5, 5, 5, 1, 5, 2], dtype=np.uint64),
+                                     np.array([1, 2, 3, 9, 4, 0], dtype=np.uint64))
+    assert res.tolist() == [True, True, True, True, False, False]
+
+
+def test_agregar_por_partes_unir_y_guardar(tmp_path):
+    ids = _uuids(30)
+    idx = IndiceIds().agregar(ids[:10]).agregar(ids[10:20])
+    previo = IndiceIds.desde(ids[20:] + ["invalid-1"])
+    path = tmp_path / "indice"
+    idx.unir(previo).guardar(path)
+    cargado = IndiceIds.cargar(path)
+    assert cargado.contiene(ids + ["invalid-1", "invalid-2"]).tolist() == [True] * 31 + [False]
+    assert cargado.nbytes() == 30 * 16
+
+
+def test_validar_siniestros_con_indice_o_set():
+    ids = _uuids(5)
+    sin = pd.DataFrame({
+        "siniestro_id": ["s1", "s2", "s3"],
+        "poliza_id": [ids[0], "invalid-1", ids[4]],
+        "fecha_siniestro": ["2024-01-01"] * 3,
+        "tipo_siniestro": ["CHOQUE"] * 3,
+        "monto_reclamado": [100.0] * 3,
+        "estado": ["PENDIENTE"] * 3,
+    })
+    con_set = validar_siniestros_df(sin, set(ids[:3]))
+    con_indice = validar_siniestros_df(sin, IndiceIds.desde(ids[:3]))
+    pd.testing.assert_frame_equal(con_set[0], con_indice[0])
+    pd.testing.assert_frame_equal(con_set[1], con_indice[1])
+    assert con_indice[0]["siniestro_id"].tolist() == ["s1"]
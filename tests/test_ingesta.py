@@ -0,0 +1,171 @@
+import os
+from datetime import date
+
+import pandas as pd
+from scripts import cuarentena, esquema, ingesta, utils_auditoria
+from scripts.generar_datos import generar_csvs
+from scripts.transformaciones import resumen_por_producto
+
+
+def _partir(path, destino, corte):
+    """Escribe en `destino` el encabezado y las filas hasta `corte` (más media línea); devuelve el resto"""
+    with open(path, "rb") as f:
+        lineas = f.read().splitlines(keepends=True)
+    with open(destino, "wb") as f:
+        f.writelines(lineas[:corte + 1])
+        f.write(lineas[corte + 1][:5])  # línea a medio escribir
+    return lineas[corte + 1][5:], lineas[corte + 2:]
+
+
+def _completar(destino, resto):
+    media, lineas = resto
+    with open(destino, "ab") as f:
+        f.write(media)
+        f.writelines(lineas)
+
+
+def test_archivos_que_crecen_se_procesan_una_vez(tmp_path, monkeypatch):
+    monkeypatch.setattr(ingesta, "MAX_INDICES", 1)
+    origen, entrada = tmp_path / "origen", tmp_path / "entrada"
+    entrada.mkdir()
+    pol_path, sin_path = generar_csvs(str(origen), seed=5, n_polizas=2000, n_siniestros=600, err_rate=0.0)
+    pol_dst = str(entrada / os.path.basename(pol_path))
+    sin_dst = str(entrada / os.path.basename(sin_path))
+
+    # llega medio archivo de pólizas; después el resto y medio de siniestros; por último el resto
+    ingesta_dir = str(tmp_path / "ingesta")
+    resto_pol = _partir(pol_path, pol_dst, 1000)
+    primera = ingesta.procesar_pendientes(str(entrada), ingesta_dir)
+    assert [(d["tabla"], d["filas"]) for d in primera] == [("polizas", 1000)]
+    assert ingesta.procesar_pendientes(str(entrada), ingesta_dir) == []  # nada nuevo
+
+    _completar(pol_dst, resto_pol)
+    resto_sin = _partir(sin_path, sin_dst, 300)
+    segunda = ingesta.procesar_pendientes(str(entrada), ingesta_dir)
+    assert [(d["tabla"], d["filas"]) for d in segunda] == [("polizas", 1000), ("siniestros", 300)]
+
+    _completar(sin_dst, resto_sin)
+    tercera = ingesta.procesar_pendientes(str(entrada), ingesta_dir)
+    assert [(d["tabla"], d["filas"]) for d in tercera] == [("siniestros", 300)]
+    # los siniestros se validan contra las pólizas de todos los tramos anteriores
+    assert all(d["estado"] == ingesta.PROCESADO and d["invalidos"] == 0 for d in primera + segunda + tercera)
+
+    # el resumen incremental es el de los archivos completos
+    pol = esquema.leer_csv(pol_path, esquema.POLIZAS)
+    sin = esquema.leer_csv(sin_path, esquema.SINIESTROS)
+    resumen = pd.read_csv(tercera[-1]["resumen_file"])
+    esperado = resumen_por_producto(pol, sin)
+    pd.testing.assert_frame_equal(resumen, esperado.astype(resumen.dtypes.to_dict()), check_exact=False)
+
+    manifiesto = ingesta.leer_manifiesto(ingesta_dir)["archivos"]
+    assert manifiesto[os.path.basename(pol_dst)]["offset"] == os.path.getsize(pol_dst)
+    assert manifiesto[os.path.basename(sin_dst)]["tramos"] == 2
+
+    utils_auditoria.vaciar_auditoria()
+    lat = utils_auditoria.latencias(etapas=["latencia_ingesta"], destino=str(tmp_path / "auditoria.csv"))
+    assert lat.loc[0, "eventos"] == 4 and lat.loc[0, "registros"] == 2600
+
+
+def test_archivo_reescrito_no_se_reaplica(tmp_path):
+    pol_path, _ = generar_csvs(str(tmp_path / "entrada"), seed=6, n_polizas=300, n_siniestros=50, err_rate=0.0)
+    os.remove(_)
+    ingesta_dir = str(tmp_path / "ingesta")
+    assert len(ingesta.procesar_pendientes(str(tmp_path / "entrada"), ingesta_dir)) == 1
+
+    generar_csvs(str(tmp_path / "entrada"), seed=7, n_polizas=400, n_siniestros=50, err_rate=0.0)
+    os.remove(_)
+    assert ingesta.procesar_pendientes(str(tmp_path / "entrada"), ingesta_dir) == []
+    assert ingesta.leer_manifiesto(ingesta_dir)["archivos"][os.path.basename(pol_path)]["estado"] == ingesta.REESCRITO
+
+
+def test_estado_y_resumen_por_fecha(tmp_path):
+    entrada, ingesta_dir = tmp_path / "entrada", str(tmp_path / "ingesta")
+    esperados = {}
+    for dia, seed in ((26, 8), (27, 9)):
+        pol_path, sin_path = generar_csvs(str(entrada), date=date(2025, 10, dia), seed=seed, n_polizas=800,
+                                          n_siniestros=200, err_rate=0.0)
+        esperados[f"202510{dia}"] = resumen_por_producto(esquema.leer_csv(pol_path, esquema.POLIZAS),
+                                                         esquema.leer_csv(sin_path, esquema.SINIESTROS))
+    procesados = ingesta.procesar_pendientes(str(entrada), ingesta_dir)
+
+    # cada día con su propio estado: el resumen del 27 no acumula las filas del 26
+    for fecha, esperado in esperados.items():
+        resumen = pd.read_csv(tmp_path / "entrada" / f"resumen_producto_{fecha}.csv")
+        pd.testing.assert_frame_equal(resumen, esperado.astype(resumen.dtypes.to_dict()), check_exact=False)
+    assert sorted(os.listdir(os.path.join(ingesta_dir, ingesta.ESTADO_DIR))) == ["fecha=20251026", "fecha=20251027"]
+    assert {d["estado"] for d in procesados} == {ingesta.PROCESADO}
+
+
+def test_corte_antes_del_manifiesto_no_suma_dos_veces(tmp_path, monkeypatch):
+    origen, entrada = tmp_path / "origen", tmp_path / "entrada"
+    entrada.mkdir()
+    pol_path, sin_path = generar_csvs(str(origen), seed=10, n_polizas=1000, n_siniestros=800, err_rate=0.0)
+    os.replace(pol_path, entrada / os.path.basename(pol_path))
+    sin_dst = str(entrada / os.path.basename(sin_path))
+    resto_sin = _partir(sin_path, sin_dst, 400)
+
+    # el proceso se corta después de aplicar el tramo de siniestros, antes de guardar el manifiesto
+    guardar, llamadas = ingesta._guardar_manifiesto, []
+
+    def cortar(ingesta_dir, manifiesto):
+        llamadas.append(1)
+        if len(llamadas) == 2:
+            raise KeyboardInterrupt
+        guardar(ingesta_dir, manifiesto)
+
+    ingesta_dir = str(tmp_path / "ingesta")
+    monkeypatch.setattr(ingesta, "_guardar_manifiesto", cortar)
+    try:
+        ingesta.procesar_pendientes(str(entrada), ingesta_dir)
+    except KeyboardInterrupt:
+        pass
+    monkeypatch.setattr(ingesta, "_guardar_manifiesto", guardar)
+
+    # el archivo sigue creciendo: la pasada siguiente sólo valida lo nuevo
+    _completar(sin_dst, resto_sin)
+    procesados = ingesta.procesar_pendientes(str(entrada), ingesta_dir)
+    assert [(d["tabla"], d["filas"]) for d in procesados] == [("siniestros", 400)]
+
+    resumen = pd.read_csv(procesados[-1]["resumen_file"])
+    esperado = resumen_por_producto(esquema.leer_csv(str(entrada / os.path.basename(pol_path)), esquema.POLIZAS),
+                                    esquema.leer_csv(sin_dst, esquema.SINIESTROS))
+    assert resumen["total_siniestros"].sum() == 800
+    pd.testing.assert_frame_equal(resumen, esperado.astype(resumen.dtypes.to_dict()), check_exact=False)
+    assert ingesta.leer_manifiesto(ingesta_dir)["archivos"][os.path.basename(sin_dst)]["offset"] == os.path.getsize(sin_dst)
+
+
+def test_siniestros_antes_que_sus_polizas_esperan(tmp_path):
+    origen, entrada = tmp_path / "origen", tmp_path / "entrada"
+    entrada.mkdir()
+    pol_path, sin_path = generar_csvs(str(origen), seed=11, n_polizas=900, n_siniestros=300, err_rate=0.0)
+    ingesta_dir = str(tmp_path / "ingesta")
+
+    # llegan los siniestros: todos sin póliza, quedan pendientes y el tramo no es corrupto
+    os.replace(sin_path, entrada / os.path.basename(sin_path))
+    primera = ingesta.procesar_pendientes(str(entrada), ingesta_dir)
+    assert [(d["estado"], d["invalidos"], d["pendientes"]) for d in primera] == [(ingesta.PROCESADO, 0, 300)]
+
+    # llega el archivo de pólizas: la misma pasada aplica los siniestros que las esperaban
+    os.replace(pol_path, entrada / os.path.basename(pol_path))
+    segunda = ingesta.procesar_pendientes(str(entrada), ingesta_dir)
+    assert [(d["tabla"], d["filas"]) for d in segunda] == [("polizas", 900), ("siniestros", 300)]
+    assert ingesta.procesar_pendientes(str(entrada), ingesta_dir) == []
+
+    resumen = pd.read_csv(segunda[-1]["resumen_file"])
+    esperado = resumen_por_producto(esquema.leer_csv(str(entrada / os.path.basename(pol_path)), esquema.POLIZAS),
+                                    esquema.leer_csv(str(entrada / os.path.basename(sin_path)), esquema.SINIESTROS))
+    pd.testing.assert_frame_equal(resumen, esperado.astype(resumen.dtypes.to_dict()), check_exact=False)
+    assert not any(cuarentena.conteos(os.path.join(ingesta_dir, "cuarentena", "filas")).values())
+    assert os.listdir(os.path.join(ingesta_dir, ingesta.PENDIENTES_DIR, "fecha=" + cuarentena.fecha_de_archivo(sin_path))) == []
+
+
+def test_siniestros_sin_poliza_vencidos_van_a_cuarentena(tmp_path):
+    pol_path, sin_path = generar_csvs(str(tmp_path / "entrada"), seed=12, n_polizas=200, n_siniestros=80, err_rate=0.0)
+    os.remove(pol_path)
+    ingesta_dir = str(tmp_path / "ingesta")
+    procesados = ingesta.procesar_pendientes(str(tmp_path / "entrada"), ingesta_dir, espera=0)
+    assert [(d["estado"], d["pendientes"]) for d in procesados] == [(ingesta.PROCESADO, 80)]
+
+    conteos = cuarentena.conteos(os.path.join(ingesta_dir, "cuarentena", "filas"), tabla="siniestros")
+    assert {regla: n for regla, n in conteos.items() if n} == {"poliza_inexistente": 80}
+    assert os.listdir(os.path.join(ingesta_dir, ingesta.PENDIENTES_DIR, "fecha=" + cuarentena.fecha_de_archivo(sin_path))) == []
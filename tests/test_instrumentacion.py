@@ -0,0 +1,39 @@
+import json
+import os
+import pytest
+from scripts import instrumentacion, utils_auditoria
+from scripts.utils_auditoria import leer_auditoria
+
+
+@pytest.fixture
+def perfilado(tmp_path, monkeypatch):
+    monkeypatch.delenv("PIPELINE_PERFILADO", raising=False)
+    monkeypatch.delenv("PIPELINE_PERFILADO_DIR", raising=False)
+    yield tmp_path
+    instrumentacion.desactivar()
+
+
+def test_etapa_desactivada_no_mide(perfilado):
+    with instrumentacion.etapa("x", registros=10) as m:
+        m.registros = 20
+    assert not os.path.exists(perfilado / "auditoria.csv")
+
+
+def test_etapa_reporte_y_auditoria(perfilado):
+    instrumentacion.activar("cprofile,tracemalloc", directorio=str(perfilado / "perf"))
+    with instrumentacion.etapa("externa", archivo="a.csv") as m:
+        with instrumentacion.etapa("interna", registros=5):
+            sum(range(1000))
+        m.registros = 100
+
+    with open(perfilado / "perf" / instrumentacion.REPORTE_FILE, encoding="utf-8") as f:
+        reporte = [json.loads(l) for l in f]
+    assert [r["etapa"] for r in reporte] == ["interna", "externa"]
+    externa = reporte[1]
+    assert externa["registros"] == 100 and externa["segundos"] > 0 and externa["filas_por_segundo"] > 0
+    assert os.path.exists(externa["cprofile"]) and "pico_tracemalloc_mb" in externa
+    assert "cprofile" not in reporte[0]  # sólo la etapa más externa se perfila
+
+    audit = leer_auditoria()
+    assert audit["etapa"].tolist() == ["perfil_interna", "perfil_externa"]
+    assert audit["duracion_segundos"].iloc[1] == round(externa["segundos"], 6)
@@ -0,0 +1,58 @@
+from datetime import date
+
+import numpy as np
+import pandas as pd
+from scripts import esquema, muestreo, utils_auditoria
+from scripts.cache_parseo import leer_csv
+from scripts.generar_datos import generar_csvs
+from scripts.validacion import validar_archivos
+
+
+def test_intervalo_y_etapas():
+    inferior, superior = muestreo.intervalo(300, 1000, 0.99)
+    assert 0.26 < inferior < 0.3 < superior < 0.34
+    assert muestreo.intervalo(0, 1000)[0] == 0.0
+    assert muestreo.etapas(16_000, 1_000) == [1_000, 4_000, 16_000]
+
+
+def test_leer_muestra_toma_filas_del_archivo_sin_repetir(tmp_path):
+    pol_path, _ = generar_csvs(str(tmp_path), date=date(2025, 10, 27), seed=1, n_polizas=3000, n_siniestros=10)
+    muestra = muestreo.leer_muestra(pol_path, esquema.POLIZAS, 500, np.random.default_rng(0))
+    completo = leer_csv(pol_path, esquema.POLIZAS)
+    assert 450 <= len(muestra) <= 500
+    assert muestra["cliente_id"].is_unique
+    assert muestra["cliente_id"].isin(completo["cliente_id"]).all()
+
+
+def test_corrupto_anticipado_por_muestra(tmp_path, monkeypatch):
+    monkeypatch.setattr(muestreo, "MIN_BYTES", 0)
+    pol, sin = generar_csvs(str(tmp_path), date=date(2025, 10, 27), seed=2, n_polizas=20_000, n_siniestros=4000,
+                            err_rate=0.3)
+
+    res = validar_archivos(pol, sin, umbral=0.10, cuarentena_dir=str(tmp_path / "q"), muestreo_previo=True)
+
+    assert res["estado"] == "CORRUPTO" and res["camino"] == "muestra"
+    # sin escaneo completo los totales del archivo no se conocen: la muestra va sólo en "muestreo"
+    assert res["pol_total"] is None and res["pol_invalidos"] is None
+    assert res["muestreo"]["pol"]["muestra"] < 20_000
+    assert sum(res["muestreo"]["pol"]["motivos"].values()) >= res["muestreo"]["pol"]["invalidos"]
+    assert res["valid_pol_path"] is None
+    assert sum(res["cuarentena"]["polizas"]["conteos"].values()) >= res["muestreo"]["pol"]["invalidos"]
+    utils_auditoria.vaciar_auditoria()
+    eventos = pd.read_csv(tmp_path / "auditoria.csv")
+    muestreos = eventos[eventos["etapa"] == "muestreo_polizas"]
+    assert muestreos["mensaje"].str.contains("CORRUPTO anticipado").all()
+    assert "validacion_polizas" not in set(eventos["etapa"])
+
+
+def test_muestra_bajo_el_umbral_o_archivo_chico_valida_completo(tmp_path, monkeypatch):
+    pol, sin = generar_csvs(str(tmp_path), date=date(2025, 10, 27), seed=3, n_polizas=20_000, n_siniestros=4000,
+                            err_rate=0.01)
+    completo = validar_archivos(pol, sin)
+    for minimo in (0, muestreo.MIN_BYTES):
+        monkeypatch.setattr(muestreo, "MIN_BYTES", minimo)
+        res = validar_archivos(pol, sin, muestreo_previo=True)
+        assert res["camino"] == "completo"
+        assert res["muestreo"]["pol"]["estado"] == (muestreo.VALIDO if minimo == 0 else muestreo.OMITIDO)
+        assert (res["estado"], res["pol_invalidos"], res["sin_invalidos"]) == \
+            (completo["estado"], completo["pol_invalidos"], completo["sin_invalidos"])
@@ -0,0 +1,65 @@
+import os
+from datetime import date
+from scripts import carga, filtro_duplicados, tareas_dag
+from scripts.generar_datos import generar_csvs
+
+
+def test_ejecutar_local_flujo_valido(tmp_path, monkeypatch):
+    monkeypatch.setattr(tareas_dag, "DATA_DIR", str(tmp_path))
+    monkeypatch.setattr(tareas_dag, "QUARANTINE_DIR", str(tmp_path / "quarantine"))
+    generar_csvs(str(tmp_path), date=date.today(), seed=7, n_polizas=500, n_siniestros=100, err_rate=0.01)
+
+    ti, tiempos = tareas_dag.ejecutar_local()
+
+    assert [t for t, _ in tiempos] == ["preparar_archivos", "validar_archivos", "decidir_procesar",
+                                       "transformar", "cargar_bq", "auditoria"]
+    assert os.path.exists(ti.xcom_pull(key="resumen_file"))
+    assert ti.xcom_pull(key="validacion_resumen")["estado"] == "VALIDO"
+    assert ti.xcom_pull(key="carga")["resumen"] > 0
+    assert all(n > 0 for n in ti.xcom_pull(key="carga")["cubos"].values())
+    assert ti.xcom_pull(key="valid_pol_path").endswith(".arrow")
+    # tras la carga, los IDs del día quedan en el historial de duplicados
+    fecha = date.today().strftime("%Y%m%d")
+    assert filtro_duplicados.fechas(str(tmp_path / "historial_ids"), "polizas") == [fecha]
+    assert ti.xcom_pull(key="validacion_resumen")["duplicados"] == {"polizas": 0, "siniestros": 0}
+
+
+def test_ejecutar_local_flujo_corrupto(tmp_path, monkeypatch):
+    monkeypatch.setattr(tareas_dag, "DATA_DIR", str(tmp_path))
+    monkeypatch.setattr(tareas_dag, "QUARANTINE_DIR", str(tmp_path / "quarantine"))
+    pol, sin = generar_csvs(str(tmp_path), date=date.today(), seed=7, n_polizas=500, n_siniestros=100, err_rate=0.5)
+
+    ti, tiempos = tareas_dag.ejecutar_local()
+
+    assert tiempos[-1][0] == "mover_cuarentena"
+    assert not os.path.exists(pol) and not os.path.exists(sin)
+    fecha = date.today().strftime("%Y%m%d")
+    assert sorted(os.listdir(tmp_path / "quarantine" / "archivos" / f"fecha={fecha}")) == \
+        sorted([os.path.basename(pol), os.path.basename(sin)])
+    motivos = ti.xcom_pull(key="cuarentena_motivos")
+    assert sum(motivos["polizas"].values()) >= ti.xcom_pull(key="validacion_resumen")["pol_invalidos"]
+
+
+def test_ingestar_task_carga_solo_lo_nuevo(tmp_path, monkeypatch):
+    monkeypatch.setattr(tareas_dag, "DATA_DIR", str(tmp_path))
+    monkeypatch.setattr(tareas_dag, "QUARANTINE_DIR", str(tmp_path / "quarantine"))
+    monkeypatch.delenv("PIPELINE_INGESTA_DIR", raising=False)
+    monkeypatch.delenv("PIPELINE_INGESTA_ENTRADA_DIR", raising=False)
+    # los archivos del DAG diario en DATA_DIR no son de la ingesta
+    generar_csvs(str(tmp_path), date=date.today(), seed=8, n_polizas=300, n_siniestros=50)
+    generar_csvs(str(tmp_path / "ingesta" / "entrada"), date=date.today(), seed=7, n_polizas=500,
+                 n_siniestros=100, err_rate=0.01)
+
+    ti = tareas_dag.XComLocal()
+    tareas_dag.con_auditoria(tareas_dag.ingestar_task)(ti=ti)
+    fecha = date.today().strftime("%Y%m%d")
+    assert ti.xcom_pull(key="ingesta")["filas"] == 600
+    assert ti.xcom_pull(key="ingesta")["particiones"][fecha] > 0
+    # su resumen va a una tabla propia: no reemplaza la partición del resumen diario
+    almacen = carga.almacen(tareas_dag._destino_carga())
+    assert len(almacen.leer(carga.RESUMEN_MICROLOTES, fecha)) > 0
+    assert len(almacen.leer(carga.RESUMEN, fecha)) == 0
+    assert not os.path.exists(tmp_path / "quarantine")
+
+    tareas_dag.con_auditoria(tareas_dag.ingestar_task)(ti=ti)
+    assert ti.xcom_pull(key="ingesta") == {"tramos": 0, "filas": 0, "corruptos": 0, "particiones": {}}
@@ -1,4 +1,5 @@
 import pandas as pd
+from scripts.generar_datos import generar_csvs
 from scripts.transformaciones import resumen_por_producto
 
 def test_resumen_por_producto():
@@ -37,3 +38,94 @@ def test_resumen_por_producto():
     # Validar tipos de datos numéricos
     assert resumen["monto_total"].dtype in ["float64", "float32"]
     assert resumen["total_polizas"].dtype == "int64"
+
+
+def test_resumen_por_producto_tipado_igual_a_object():
+    pol = pd.DataFrame({
+        "poliza_id": ["p1", "p2", "p3"],
+        "producto": ["VIDA", "AUTO", "VIDA"],
+        "prima_mensual": [100.0, 200.0, 300.0],
+        "suma_asegurada": [1.0, 2.0, 3.0],
+    })
+    sin = pd.DataFrame({"siniestro_id": ["s1"], "poliza_id": ["p1"], "monto_reclamado": [50.0]})
+
+    tipado = pol.astype({"producto": "category", "poliza_id": "string[pyarrow]"})
+    sin_tipado = sin.astype({"poliza_id": "string[pyarrow]", "siniestro_id": "string[pyarrow]"})
+
+    pd.testing.assert_frame_equal(resumen_por_producto(pol, sin), resumen_por_producto(tipado, sin_tipado))
+
+
+def _resumen_original(polizas_df, siniestros_df):
+    """Copia congelada del resumen original (merge + groupby en float): la referencia bit a bit"""
+    pol = polizas_df.copy()
+    sin = siniestros_df.copy()
+
+    pol["suma_asegurada"] = pd.to_numeric(pol["suma_asegurada"], errors="coerce").fillna(0)
+    pol["prima_mensual"] = pd.to_numeric(pol["prima_mensual"], errors="coerce").fillna(0)
+    sin["monto_reclamado"] = pd.to_numeric(sin["monto_reclamado"], errors="coerce").fillna(0)
+
+    merged = pd.merge(pol, sin, on="poliza_id", how="left", suffixes=("_pol", "_sin"))
+
+    total_pol = pol.groupby("producto").agg(total_polizas=("poliza_id", "nunique")).reset_index()
+    resumen_sin = merged.groupby("producto").agg(
+        total_siniestros=("siniestro_id", "count"),
+        monto_total=("monto_reclamado", "sum"),
+        prima_promedio=("prima_mensual", "mean")
+    ).reset_index()
+
+    resumen = pd.merge(total_pol, resumen_sin, on="producto", how="left").fillna(0)
+    resumen["total_polizas"] = resumen["total_polizas"].astype(int)
+    resumen["total_siniestros"] = resumen["total_siniestros"].astype(int)
+    resumen["monto_total"] = resumen["monto_total"].astype(float)
+    resumen["prima_promedio"] = resumen["prima_promedio"].astype(float).round(2)
+
+    return resumen
+
+
+def test_resumen_sin_join_igual_al_original(tmp_path, monkeypatch):
+    from scripts import transformaciones
+    pol = pd.DataFrame({
+        "poliza_id": ["p1", "p1", "p2", None, "p4", "p5"],
+        "producto": ["AUTO", "AUTO", "VIDA", "VIDA", None, "HOGAR"],
+        "suma_asegurada": [1.0, 1.0, 2.0, 3.0, 4.0, 5.0],
+        "prima_mensual": [100.10, 100.10, 200.25, 50.5, 10.0, None],
+    })
+    sin = pd.DataFrame({
+        "siniestro_id": ["s1", None, "s3", "s4", "s5", "s6"],
+        "poliza_id": ["p1", "p1", None, "huerfana", "p4", "p2"],
+        "monto_reclamado": [1000.01, 5.5, 20.0, 99.0, 1.0, None],
+    })
+    pol_path, sin_path = generar_csvs(str(tmp_path), seed=13, n_polizas=20_000, n_siniestros=6000)
+    casos = [(pol, sin), (pd.read_csv(pol_path), pd.read_csv(sin_path))]
+
+    for bits in (transformaciones.MAX_BITS_DISTINTAS, 0):  # 0: conteo de pólizas distintas por hash
+        monkeypatch.setattr(transformaciones, "MAX_BITS_DISTINTAS", bits)
+        for p, s in casos:
+            esperado = _resumen_original(p, s)
+            pd.testing.assert_frame_equal(resumen_por_producto(p, s), esperado, check_exact=True)
+            pd.testing.assert_frame_equal(transformaciones.resumen_por_producto_merge(p, s), esperado,
+                                          check_exact=True)
+
+
+def test_motor_desconocido_y_estado_solo_pandas(tmp_path):
+    import pytest
+    from scripts import transformaciones
+    with pytest.raises(ValueError):
+        transformaciones.motor("duckdb")
+    with pytest.raises(ValueError):
+        transformaciones.main("pol.csv", "sin.csv", str(tmp_path), estado_dir=str(tmp_path), engine="spark")
+
+
+def test_motor_spark_genera_el_mismo_csv(tmp_path):
+    import pytest
+    pytest.importorskip("pyspark")
+    from scripts import transformaciones
+    from scripts.generar_datos import generar_csvs
+
+    pol, sin = generar_csvs(str(tmp_path), seed=3, n_polizas=2000, n_siniestros=600, err_rate=0.05)
+    salidas = {}
+    for motor in transformaciones.MOTORES:
+        path = transformaciones.main(pol, sin, str(tmp_path / motor), fecha_tag="20250101", engine=motor)
+        with open(path, "rb") as f:
+            salidas[motor] = f.read()
+    assert salidas["spark"] == salidas["pandas"]
@@ -0,0 +1,59 @@
+import multiprocessing as mp
+import threading
+import pandas as pd
+from scripts import utils_auditoria
+from scripts.utils_auditoria import registrar_evento_auditoria, vaciar_auditoria, leer_auditoria
+
+
+def _registrar_muchos(destino, n, etapa):
+    utils_auditoria.configurar_auditoria(destino)
+    for i in range(n):
+        registrar_evento_auditoria(etapa, archivo=f"f{i}", registros=i)
+
+
+def test_escritura_diferida_y_concurrente_csv(tmp_path, monkeypatch):
+    destino = str(tmp_path / "audit" / "auditoria.csv")
+    monkeypatch.setattr(utils_auditoria, "AUDITORIA_FILE", destino)
+    hilos = [threading.Thread(target=_registrar_muchos, args=(destino, 200, f"hilo{h}")) for h in range(4)]
+    for h in hilos:
+        h.start()
+    for h in hilos:
+        h.join()
+    # varios procesos agregando al mismo CSV
+    ctx = mp.get_context("fork")
+    procs = [ctx.Process(target=_registrar_muchos, args=(destino, 300, f"proc{p}")) for p in range(2)]
+    for p in procs:
+        p.start()
+    for p in procs:
+        p.join()
+    vaciar_auditoria()
+
+    df = pd.read_csv(destino)  # un solo encabezado
+    assert len(df) == 4 * 200 + 2 * 300
+    assert df.groupby("etapa")["registros"].apply(list).map(lambda r: r == sorted(r)).all()
+
+
+def test_backends_jsonl_y_sqlite(tmp_path, monkeypatch):
+    for nombre in ("auditoria.jsonl", "auditoria.db"):
+        destino = str(tmp_path / nombre)
+        monkeypatch.setattr(utils_auditoria, "AUDITORIA_FILE", destino)
+        registrar_evento_auditoria("etapa_a", archivo="x.csv", registros=10, mensaje="hola")
+        registrar_evento_auditoria("etapa_b", estado="ERROR")
+        df = leer_auditoria()
+        assert df["etapa"].tolist() == ["etapa_a", "etapa_b"]
+        assert df["registros"].tolist() == [10, 0]
+        assert list(df.columns) == utils_auditoria.CAMPOS
+
+
+def test_destino_roto_descarta_tras_reintentos(tmp_path, monkeypatch, capsys):
+    destino = tmp_path / "no_es_directorio"
+    destino.write_text("")
+    monkeypatch.setattr(utils_auditoria, "AUDITORIA_FILE", str(destino / "auditoria.csv"))
+    monkeypatch.setattr(utils_auditoria, "REINTENTOS_MAX", 2)
+    registrar_evento_auditoria("etapa_a", registros=1)
+    registrar_evento_auditoria("etapa_a", registros=2)
+
+    vaciar_auditoria()  # primer fallo: vuelven a la cola
+    vaciar_auditoria()
+    assert utils_auditoria._cola == []
+    assert "se descartan 2 eventos" in capsys.readouterr().err
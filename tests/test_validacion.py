@@ -34,3 +34,37 @@ def test_validar_siniestros():
 
     assert len(validos) == 1
     assert len(invalidos) == 2
+
+
+def test_validar_archivos_streaming_coincide(tmp_path):
+    from scripts.generar_datos import generar_csvs
+    from scripts.validacion import validar_archivos, validar_archivos_streaming
+
+    pol, sin = generar_csvs(str(tmp_path), seed=7, n_polizas=3000, n_siniestros=800)
+    completo = validar_archivos(pol, sin)
+    streaming = validar_archivos_streaming(pol, sin, str(tmp_path / "out"), chunksize=500)
+
+    for clave in ["estado", "pol_total", "pol_invalidos", "sin_total", "sin_invalidos"]:
+        assert streaming[clave] == completo[clave]
+    assert len(pd.read_csv(streaming["valid_sin_path"])) == len(completo["valid_sin_df"])
+    assert len(pd.read_csv(streaming["invalid_pol_path"])) == completo["pol_invalidos"]
+
+
+def test_entrega_de_validos_a_transformaciones(tmp_path):
+    from scripts import esquema, transformaciones
+    from scripts.generar_datos import generar_csvs
+    from scripts.validacion import validar_archivos
+
+    pol, sin = generar_csvs(str(tmp_path), seed=11, n_polizas=2000, n_siniestros=500, err_rate=0.05)
+    res = validar_archivos(pol, sin, validos_dir=str(tmp_path / "validos"))
+    assert esquema.es_arrow(res["valid_pol_path"]) and esquema.es_arrow(res["valid_sin_path"])
+    pd.testing.assert_frame_equal(esquema.leer_arrow(res["valid_sin_path"]),
+                                  res["valid_sin_df"].reset_index(drop=True))
+
+    path = transformaciones.main(res["valid_pol_path"], res["valid_sin_path"], str(tmp_path / "out"),
+                                 fecha_tag="20250101")
+    esperado = transformaciones.resumen_por_producto(res["valid_pol_df"], res["valid_sin_df"])
+    esperado.to_csv(tmp_path / "esperado.csv", index=False)
+    assert open(path, "rb").read() == open(tmp_path / "esperado.csv", "rb").read()
+    # los rechazados (primas no positivas, huérfanos...) ya no cuentan
+    assert esperado["total_polizas"].sum() == len(res["valid_pol_df"]["poliza_id"].unique())
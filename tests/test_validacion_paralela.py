@@ -0,0 +1,55 @@
+from datetime import date
+
+import pandas as pd
+from scripts import esquema, utils_auditoria, validacion_paralela
+from scripts.generar_datos import generar_csvs
+from scripts.validacion import validar_archivos
+
+
+def _comparar(serie, paralelo):
+    for clave, valor in serie.items():
+        if clave.endswith("_df"):
+            pd.testing.assert_frame_equal(paralelo[clave], valor)
+        elif clave not in ("cuarentena", "valid_pol_path", "valid_sin_path"):  # directorios distintos
+            assert paralelo[clave] == valor, clave
+
+
+def test_tramos_cubren_el_archivo_por_filas(tmp_path):
+    pol, _ = generar_csvs(str(tmp_path), date=date(2025, 10, 27), seed=1, n_polizas=1000, n_siniestros=10)
+    contenido = open(pol, "rb").read()
+    rangos = validacion_paralela.tramos(pol, 7)
+    assert len(rangos) == 7
+    assert rangos[0][0] == contenido.index(b"\n") + 1 and rangos[-1][1] == len(contenido)
+    assert all(fin == ini for (_, fin), (ini, _) in zip(rangos, rangos[1:]))
+    assert all(contenido[ini - 1:ini] == b"\n" for ini, _ in rangos)
+    assert validacion_paralela.tramos(pol, 5000)[-1][1] == len(contenido)  # más tramos que filas
+
+
+def test_paralelo_igual_que_en_serie(tmp_path, monkeypatch):
+    monkeypatch.setattr(validacion_paralela, "MIN_BYTES_TRAMO", 1)
+    pol, sin = generar_csvs(str(tmp_path), date=date(2025, 10, 27), seed=2, n_polizas=5000, n_siniestros=2000,
+                            err_rate=0.05)
+    serie = validar_archivos(pol, sin, cuarentena_dir=str(tmp_path / "q1"), validos_dir=str(tmp_path / "v1"))
+    paralelo = validar_archivos(pol, sin, cuarentena_dir=str(tmp_path / "q2"), validos_dir=str(tmp_path / "v2"),
+                                workers=3)
+
+    _comparar(serie, paralelo)
+    assert paralelo["sin_motivos"]["poliza_inexistente"] > 0
+    for tabla in ("polizas", "siniestros"):
+        assert paralelo["cuarentena"][tabla]["conteos"] == serie["cuarentena"][tabla]["conteos"]
+    pd.testing.assert_frame_equal(esquema.leer_arrow(paralelo["valid_sin_path"]),
+                                  esquema.leer_arrow(serie["valid_sin_path"]))
+    utils_auditoria.vaciar_auditoria()
+    eventos = pd.read_csv(tmp_path / "auditoria.csv")
+    assert eventos["mensaje"][eventos["etapa"] == "validacion_paralela"].str.contains("tramos pol:6 sin:6").all()
+
+
+def test_valores_no_convertibles_validan_en_serie(tmp_path, monkeypatch):
+    monkeypatch.setattr(validacion_paralela, "MIN_BYTES_TRAMO", 1)
+    pol, sin = generar_csvs(str(tmp_path), date=date(2025, 10, 27), seed=3, n_polizas=500, n_siniestros=100)
+    df = pd.read_csv(pol, dtype=str)
+    df.loc[400, "suma_asegurada"] = "abc"
+    df.to_csv(pol, index=False)
+
+    assert validacion_paralela.validar(pol, sin, 2, 4) is None
+    _comparar(validar_archivos(pol, sin), validar_archivos(pol, sin, workers=2))